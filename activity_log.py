@@ -0,0 +1,287 @@
+import bisect
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from array import array
+
+ACTIVITY_FILE = "activity.log"
+SCAN_DEPTH = 500  # unfiltered pages this shallow read an unindexed file backwards instead
+
+
+class ActivityLog:
+    # Newest `capacity` entries live in a fixed ring; every entry is also appended to a
+    # rotating jsonl file, which backs pages older than the ring. Entries carry a sequence
+    # number, and a per-symbol list of sequence numbers answers symbol filters without a scan.
+    # Each spill file has an index of every line's sequence number, timestamp and byte offset,
+    # plus each symbol's line positions, so pages from disk (deep, time-bounded or filtered)
+    # are bisects and seeks rather than scans. Files left by an earlier session are indexed
+    # by one pass the first time a page reaches them.
+    # Timestamps only grow, so time ranges are a binary search.
+    def __init__(self, capacity=2000, path=ACTIVITY_FILE, max_bytes=4 << 20, backups=3, flush_every=1.0):
+        self.capacity = capacity
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._ring = [None] * capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._next = 0  # sequence number of the next entry; the ring holds [_next - len, _next)
+        self._len = 0
+        self._by_symbol = {}
+        self._file = None
+        self._size = 0
+        self._last_flush = 0.0
+        self._disk = [None] * (backups + 1)  # spill file i -> _FileIndex, None until indexed
+        self._rotations = 0
+        # Continue the sequence of the previous session so disk pages stay ordered. Right
+        # after a rotation the current file is empty, so this is the newest file with an entry.
+        for i in range(backups + 1) if path else ():
+            if self._next or not os.path.exists(self._file_path(i)): continue
+            with open(self._file_path(i), "rb") as f:
+                for line in _reverse_lines(f):
+                    try: self._next = json.loads(line)["n"] + 1
+                    except (ValueError, KeyError): continue
+                    break
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def first_seq(self):
+        return self._next - self._len
+
+    def add(self, symbol, msg, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            seq = self._next
+            slot = seq % self.capacity
+            entry = (seq, ts, symbol, msg)
+            self._ring[slot] = entry
+            self._ts[slot] = ts
+            self._next += 1
+            self._len = min(self._len + 1, self.capacity)
+            seqs = self._by_symbol.get(symbol)
+            if seqs is None: seqs = self._by_symbol[symbol] = array("q")
+            seqs.append(seq)
+            if len(seqs) > 2 * self.capacity: self._trim(symbol)
+            if self.path: self._spill(entry)
+        return entry
+
+    def _trim(self, symbol):
+        seqs = self._by_symbol[symbol]
+        del seqs[:bisect.bisect_left(seqs, self.first_seq)]
+        if not seqs: del self._by_symbol[symbol]
+
+    def _spill(self, entry):
+        try:
+            if self._file is None:
+                # No newline translation, so _size is the byte offset of the next line
+                self._file = open(self.path, "a", encoding="utf-8", newline="\n")
+                self._size = self._file.tell()
+                if not self._size: self._disk[0] = _FileIndex()
+            line = json.dumps({"n": entry[0], "t": entry[1], "s": entry[2], "m": entry[3]}) + "\n"
+            if self._disk[0] is not None: self._disk[0].add(entry[0], entry[1], entry[2], self._size)
+            self._file.write(line)
+            self._size += len(line)
+            if self._size >= self.max_bytes: self._rotate()
+            elif entry[1] - self._last_flush >= self.flush_every:
+                self._file.flush()
+                self._last_flush = entry[1]
+        except Exception as e:
+            print(f"Activity log write error: {e}")
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"): os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1" if self.backups else self.path + ".old")
+        self._disk = [None] + self._disk[:self.backups]
+        self._rotations += 1
+
+    def flush(self):
+        with self._lock:
+            if self._file: self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file: self._file.close()
+            self._file = None
+
+    def _time_bounds(self, since, until):
+        # Ring positions [lo, hi) (0 = oldest) whose timestamps fall in [since, until]
+        base, n, cap = self.first_seq, self._len, self.capacity
+        def first_at_or_after(t):
+            lo, hi = 0, n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._ts[(base + mid) % cap] < t: lo = mid + 1
+                else: hi = mid
+            return lo
+        lo = first_at_or_after(since) if since is not None else 0
+        hi = first_at_or_after(until + 1e-9) if until is not None else n
+        return base + lo, base + hi
+
+    def _memory(self, symbol, since, until):
+        # Newest-first sequence numbers from the ring matching the filters
+        lo, hi = self._time_bounds(since, until)
+        if not symbol: return range(hi - 1, lo - 1, -1)
+        lists = []
+        for key in [k for k in self._by_symbol if k.startswith(symbol)]:
+            seqs = self._by_symbol[key]
+            a, b = bisect.bisect_left(seqs, lo), bisect.bisect_left(seqs, hi)
+            if b > a: lists.append(seqs[b - 1:a - 1 if a else None:-1])
+        return heapq.merge(*lists, reverse=True)
+
+    def page(self, offset=0, limit=50, symbol="", since=None, until=None):
+        # Returns (entries newest first, more_available)
+        symbol = (symbol or "").upper()
+        out, skipped = [], 0
+        with self._lock:
+            for seq in self._memory(symbol, since, until):
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                if len(out) > limit: break
+                out.append(self._ring[seq % self.capacity])
+            oldest = self.first_seq
+            if self._file and len(out) <= limit: self._file.flush()
+        if len(out) <= limit and oldest > 0 and self.path:
+            for entry in self._from_disk(oldest, symbol, since, until, offset - skipped):
+                out.append(entry)
+                if len(out) > limit: break
+        return out[:limit], len(out) > limit
+
+    def _file_path(self, i):
+        return f"{self.path}.{i}" if i else self.path
+
+    def _spills(self):
+        # Read handles on the spill files, newest first, with their indexes as of now. The
+        # handles keep reading the same files if a rotation renames them meanwhile.
+        files = []
+        with self._lock:
+            if self._file: self._file.flush()
+            for i in range(self.backups + 1):
+                try: files.append((i, open(self._file_path(i), "rb"), self._disk[i]))
+                except OSError: continue
+            return files, self._rotations, self._size if self._file else None
+
+    def _build_index(self, i, f, rotations, size):
+        # One pass over a file not indexed yet, outside the lock; lines appended to the
+        # current file meanwhile are caught up under it before the index is kept
+        index, end = _index_file(f, end=size if i == 0 else None)
+        with self._lock:
+            if rotations == self._rotations and self._disk[i] is None:
+                if i == 0 and self._file:
+                    self._file.flush()
+                    _index_file(f, index, start=end)
+                self._disk[i] = index
+        return index
+
+    def _from_disk(self, before_seq, symbol, since, until, skip=0):
+        # Entries that fell out of the ring, newest first from the rotated files, after
+        # skipping `skip` matches; only the lines returned are read
+        files, rotations, size = self._spills()
+        try:
+            for i, f, index in files:
+                if index is None and not symbol and since is None and until is None and skip < SCAN_DEPTH:
+                    # Near the top of an unfiltered log a few lines from the end will do;
+                    # the one-pass index build waits for a page that needs it
+                    for line in _reverse_lines(f):
+                        try: rec = json.loads(line)
+                        except ValueError: continue
+                        if rec["n"] >= before_seq: continue
+                        if skip:
+                            skip -= 1
+                            continue
+                        yield rec["n"], rec["t"], rec["s"], rec["m"]
+                    continue
+                if index is None: index = self._build_index(i, f, rotations, size)
+                lo, hi = index.window(before_seq, since, until)
+                positions = index.positions(lo, hi, symbol)
+                if skip >= len(positions):
+                    skip -= len(positions)
+                else:
+                    for pos in itertools.islice(positions, skip, None):
+                        f.seek(index.offsets[pos])
+                        try: rec = json.loads(f.readline())
+                        except ValueError: continue
+                        yield rec["n"], rec["t"], rec["s"], rec["m"]
+                    skip = 0
+                # Older files hold only older entries
+                if since is not None and lo > 0: return
+        finally:
+            for _, f, _ in files: f.close()
+
+
+class _FileIndex:
+    # One spill file: every line's sequence number, timestamp and byte offset in file order,
+    # and per symbol the positions of its lines. All ascending, so filters are bisects.
+    __slots__ = ("seqs", "ts", "offsets", "by_symbol")
+
+    def __init__(self):
+        self.seqs, self.ts, self.offsets = array("q"), array("d"), array("q")
+        self.by_symbol = {}
+
+    def add(self, seq, ts, symbol, offset):
+        # seqs last: a reader bounded by seqs only sees lines whose other columns are there
+        self.offsets.append(offset)
+        self.ts.append(ts)
+        self.seqs.append(seq)
+        positions = self.by_symbol.get(symbol)
+        if positions is None: positions = self.by_symbol[symbol] = array("q")
+        positions.append(len(self.seqs) - 1)
+
+    def window(self, before_seq, since, until):
+        # Line positions [lo, hi) older than before_seq with since <= ts <= until
+        hi = bisect.bisect_left(self.seqs, before_seq)
+        if until is not None: hi = bisect.bisect_right(self.ts, until, 0, hi)
+        lo = bisect.bisect_left(self.ts, since, 0, hi) if since is not None else 0
+        return lo, hi
+
+    def positions(self, lo, hi, symbol):
+        # Newest first, positions in [lo, hi) of lines whose symbol starts with `symbol`
+        if not symbol: return range(hi - 1, lo - 1, -1)
+        lists = []
+        for key, positions in list(self.by_symbol.items()):
+            if not key.startswith(symbol): continue
+            a, b = bisect.bisect_left(positions, lo), bisect.bisect_left(positions, hi)
+            if b > a: lists.append(positions[b - 1:a - 1 if a else None:-1])
+        if len(lists) == 1: return lists[0]
+        return list(heapq.merge(*lists, reverse=True))
+
+
+def _index_file(f, index=None, start=0, end=None):
+    # Adds the lines of an open spill file from byte `start` (to `end`) to its index;
+    # returns the index and the offset it stopped at
+    index = _FileIndex() if index is None else index
+    f.seek(start)
+    offset = start
+    for line in f:
+        if end is not None and offset >= end: break
+        if not line.endswith(b"\n"): break  # half-written last line
+        try:
+            rec = json.loads(line)
+            index.add(rec["n"], rec["t"], rec["s"], offset)
+        except (ValueError, KeyError): pass
+        offset += len(line)
+    return index, offset
+
+
+def _reverse_lines(f, block=1 << 16):
+    # Lines of an open binary file, last first
+    f.seek(0, os.SEEK_END)
+    pos, tail = f.tell(), b""
+    while pos > 0:
+        step = min(block, pos)
+        pos -= step
+        f.seek(pos)
+        lines = (f.read(step) + tail).split(b"\n")
+        tail = lines.pop(0)
+        for line in reversed(lines):
+            if line: yield line.decode("utf-8", "replace")
+    if tail: yield tail.decode("utf-8", "replace")
@@ -0,0 +1,143 @@
+import bisect
+import threading
+
+from rules import RuleBook, parse
+
+
+class AlertIndex:
+    # Alerts bucketed by token; each side keeps parallel (prices, alerts) lists sorted by price
+    # for nearest() and firing, and a hashed (token, price, side) count answers contains().
+    # ABOVE/BELOW alerts are levels: one fires on the first price at or beyond it, however the
+    # price got there (a gap, a pause, a reconnect), so a tick takes a prefix of the ABOVE list
+    # and a suffix of the BELOW one. Condition "RULE" alerts carry an expression (see
+    # rules.parse) with the symbol -> token map it was written against and fire through a
+    # RuleBook, on crossings as the expression defines them.
+    def __init__(self, alerts=None, wc=None):
+        self._lock = threading.Lock()
+        self._books = {}
+        self._by_id = {}
+        self._keys = {}
+        self.rules = RuleBook(wc)
+        self.add_many(alerts or [])
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        with self._lock: return iter(list(self._by_id.values()))
+
+    def _side(self, book, condition):
+        return (book[0], book[1]) if condition == "ABOVE" else (book[2], book[3])
+
+    def add(self, alert):
+        with self._lock: self._add(alert)
+
+    def add_many(self, alerts):
+        # Stored alerts go through here: a rule the parser no longer accepts is skipped, not fatal
+        with self._lock:
+            for alert in alerts:
+                try: self._add(alert)
+                except ValueError as e: print(f"Skipping alert {alert.get('id')}: {e}")
+
+    def _add(self, alert):
+        # Re-adding an id replaces that alert, as RuleBook.add does for its rule; a rule that
+        # does not parse leaves the old one in place
+        if alert["condition"] == "RULE": tree, leaves, options = parse(alert["expr"], alert.get("tokens", {}).get)
+        old = self._by_id.pop(alert["id"], None)
+        if old is not None: self._unlist(old)
+        token = str(alert["token"])
+        if alert["condition"] == "RULE":
+            self.rules.add(alert["id"], alert, tree, leaves, **options)
+            self._by_id[alert["id"]] = alert
+            return
+        book = self._books.get(token)
+        if book is None: book = self._books[token] = ([], [], [], [])
+        prices, alerts = self._side(book, alert["condition"])
+        i = bisect.bisect_right(prices, alert["price"])
+        prices.insert(i, alert["price"])
+        alerts.insert(i, alert)
+        key = (token, alert["price"], alert["condition"])
+        self._keys[key] = self._keys.get(key, 0) + 1
+        self._by_id[alert["id"]] = alert
+
+    def remove(self, uid):
+        with self._lock:
+            alert = self._by_id.pop(uid, None)
+            if alert is None: return None
+            self._unlist(alert)
+            return alert
+
+    def _unlist(self, alert):
+        if alert["condition"] == "RULE":
+            self.rules.remove(alert["id"])
+            return
+        token = str(alert["token"])
+        book = self._books[token]
+        prices, alerts = self._side(book, alert["condition"])
+        i = bisect.bisect_left(prices, alert["price"])
+        while alerts[i] is not alert: i += 1
+        del prices[i]
+        del alerts[i]
+        if not book[0] and not book[2]: del self._books[token]
+        self._forget(token, alert)
+
+    def _forget(self, token, alert):
+        key = (token, alert["price"], alert["condition"])
+        if self._keys[key] > 1: self._keys[key] -= 1
+        else: del self._keys[key]
+
+    def contains(self, token, price, condition=None):
+        token, keys = str(token), self._keys
+        with self._lock:
+            if condition: return (token, price, condition) in keys
+            return (token, price, "ABOVE") in keys or (token, price, "BELOW") in keys
+
+    def nearest(self, token, ltp):
+        # Pending level closest to ltp on either side, or None
+        with self._lock:
+            book = self._books.get(str(token))
+            if book is None: return None
+            best, gap = None, float("inf")
+            for prices in (book[0], book[2]):
+                i = bisect.bisect_left(prices, ltp)
+                if i < len(prices) and prices[i] - ltp < gap: best, gap = prices[i], prices[i] - ltp
+                if i and ltp - prices[i - 1] < gap: best, gap = prices[i - 1], ltp - prices[i - 1]
+            return best
+
+    def pop_triggered(self, token, ltp):
+        # Alerts this price fires: levels at or beyond it and rules it fires. Levels are
+        # one-shot and leave the index, as do rules marked once.
+        return [alert for _, alert in self.pop_triggered_batch(((token, ltp),))]
+
+    def pop_triggered_batch(self, ticks):
+        # (token, alert) for every alert a batch of (token, ltp) ticks fires, under one lock
+        ticks = [(str(token), ltp) for token, ltp in ticks]
+        with self._lock:
+            fired, books = [], self._books
+            for token, ltp in ticks:
+                book = books.get(token)
+                if book is None or ltp <= 0: continue
+                i, j = bisect.bisect_right(book[0], ltp), bisect.bisect_left(book[2], ltp)
+                if not i and j == len(book[2]): continue
+                hit = book[1][:i] + book[3][j:]
+                del book[0][:i], book[1][:i], book[2][j:], book[3][j:]
+                if not book[0] and not book[2]: del books[token]
+                for alert in hit:
+                    del self._by_id[alert["id"]]
+                    self._forget(token, alert)
+                    fired.append((token, alert))
+            for token, alert in self.rules.evaluate_batch(ticks):
+                if alert["id"] not in self.rules: self._by_id.pop(alert["id"], None)
+                fired.append((token, alert))
+            return fired
+
+    def retarget(self, token):
+        # The token's weekly close changed; pct_up/pct_down levels move with it
+        with self._lock: self.rules.retarget(token)
+
+    def clear(self):
+        with self._lock:
+            self._books.clear()
+            self._by_id.clear()
+            self._keys.clear()
+            self.rules.clear()
@@ -0,0 +1,206 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+
+import metrics
+
+PRIORITY_USER, PRIORITY_NORMAL, PRIORITY_BULK, PRIORITY_BACKGROUND = 0, 5, 10, 20
+
+# Angel One SmartAPI limits as (requests, seconds) windows per endpoint
+RATE_LIMITS = {
+    "candle": [(3, 1), (180, 60), (5000, 3600)],
+    "ltp": [(10, 1), (500, 60), (5000, 3600)],
+    "quote": [(10, 1), (500, 60), (5000, 3600)],
+    "order": [(20, 1), (500, 60), (1000, 3600)],
+}
+TRANSIENT_ERRORS = ("Couldn't parse", "timed out", "exceeding access rate", "Max retries exceeded", "Connection aborted")
+
+
+class TransientApiError(Exception):
+    pass
+
+
+def is_transient(error):
+    return isinstance(error, TransientApiError) or any(s in str(error) for s in TRANSIENT_ERRORS)
+
+
+class TokenBucket:
+    def __init__(self, capacity, per):
+        self.capacity = self.tokens = float(capacity)
+        self.fill = capacity / per
+        self.stamp = time.monotonic()
+
+    def wait_time(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.fill)
+        self.stamp = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.fill
+
+
+class RateLimiter:
+    def __init__(self, limits=RATE_LIMITS):
+        self._lock = threading.Lock()
+        self._buckets = {ep: [TokenBucket(n, per) for n, per in windows] for ep, windows in limits.items()}
+
+    def acquire(self, endpoint):
+        buckets = self._buckets.get(endpoint)
+        if not buckets: return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(b.wait_time(now) for b in buckets)
+                if wait <= 0:
+                    for b in buckets: b.tokens -= 1
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+
+class Job:
+    __slots__ = ("func", "args", "priority", "key", "endpoint", "page", "attempts", "queued_at", "done")
+
+    def __init__(self, func, args, priority, key, endpoint, page):
+        self.func, self.args, self.priority, self.key, self.endpoint, self.page = func, args, priority, key, endpoint, page
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+        self.done = False
+
+
+class ApiScheduler:
+    def __init__(self, workers=3, limiter=None, max_retries=4, backoff=1.0, update_interval=0.5):
+        self.limiter = limiter or RateLimiter()
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.update_interval = update_interval
+        self._cv = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._pending = {}
+        self._dirty_pages = set()
+        self._completions = deque()
+        self._started = False
+        self._stopping = False
+        self.queued = self.running = self.backing_off = 0
+        self.completed = self.failed = self.retried = self.coalesced = 0
+
+    def submit(self, func, *args, priority=PRIORITY_NORMAL, key=None, endpoint="default", page=None):
+        with self._cv:
+            self._start()
+            job = self._pending.get(key) if key is not None else None
+            if job is not None:
+                # Same work already queued: keep one copy, at the more urgent priority
+                self.coalesced += 1
+                if priority < job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), job))
+                    self._cv.notify()
+                return False
+            job = Job(func, args, priority, key, endpoint, page)
+            if key is not None: self._pending[key] = job
+            self.queued += 1
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._cv.notify()
+            return True
+
+    def _start(self):
+        if self._started: return
+        self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"api-worker-{i}", daemon=True).start()
+        threading.Thread(target=self._flusher, name="api-ui-flush", daemon=True).start()
+
+    def _next_job(self):
+        with self._cv:
+            while True:
+                while self._heap:
+                    priority, _, job = heapq.heappop(self._heap)
+                    if job.done or priority != job.priority: continue
+                    job.done = True
+                    if job.key is not None: self._pending.pop(job.key, None)
+                    self.queued -= 1
+                    self.running += 1
+                    return job
+                if self._stopping: return None
+                self._cv.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None: return
+            started = time.monotonic()
+            metrics.API_WAIT.labels(job.endpoint).observe(started - job.queued_at)
+            try:
+                job.attempts += 1
+                job.func(*job.args)
+                metrics.API_RUN.labels(job.endpoint).observe(time.monotonic() - started)
+                self._finish(job, ok=True)
+            except Exception as e:
+                if is_transient(e) and job.attempts <= self.max_retries:
+                    delay = min(30.0, self.backoff * 2 ** (job.attempts - 1)) * random.uniform(0.5, 1.5)
+                    print(f"Retrying {getattr(job.func, '__name__', 'job')} in {delay:.1f}s: {e}")
+                    self._finish(job, ok=None)
+                    timer = threading.Timer(delay, self._requeue, (job,))
+                    timer.daemon = True
+                    timer.start()
+                else:
+                    print(f"Worker Error: {e}")
+                    self._finish(job, ok=False)
+
+    def _requeue(self, job):
+        with self._cv:
+            self.backing_off -= 1
+            job.done = False
+            job.queued_at = time.monotonic()
+            if job.key is not None:
+                if job.key in self._pending: return
+                self._pending[job.key] = job
+            self.queued += 1
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+            self._cv.notify()
+
+    def _finish(self, job, ok):
+        with self._cv:
+            self.running -= 1
+            if ok is None:
+                self.retried += 1
+                self.backing_off += 1
+            elif ok:
+                self.completed += 1
+                self._completions.append(time.monotonic())
+            else: self.failed += 1
+            if job.page is not None: self._dirty_pages.add(job.page)
+
+    def _flusher(self):
+        # One page.update per interval however many jobs finished in it
+        while not self._stopping:
+            time.sleep(self.update_interval)
+            with self._cv:
+                pages, self._dirty_pages = self._dirty_pages, set()
+            for page in pages:
+                try: page.update()
+                except: pass
+
+    def stats(self):
+        with self._cv:
+            now = time.monotonic()
+            while self._completions and now - self._completions[0] > 60: self._completions.popleft()
+            return {"depth": self.queued, "running": self.running, "backing_off": self.backing_off,
+                    "completed": self.completed, "failed": self.failed, "retried": self.retried,
+                    "coalesced": self.coalesced, "per_min": len(self._completions)}
+
+    def join(self, timeout=None):
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            s = self.stats()
+            if s["depth"] == 0 and s["running"] == 0 and s["backing_off"] == 0: return True
+            if end is not None and time.monotonic() > end: return False
+            time.sleep(0.05)
+
+    def stop(self):
+        with self._cv:
+            self._stopping = True
+            self._cv.notify_all()
@@ -0,0 +1,306 @@
+import datetime
+import threading
+import time
+from array import array
+
+from tick_decoder import MODE_QUOTE
+
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+_IST_OFFSET = 19800
+DAY = 86400
+WEEK = 7 * DAY
+_MONDAY = 4 * DAY  # the epoch fell on a Thursday
+# timeframe -> (bucket seconds, candle store interval, bars kept in memory)
+TIMEFRAMES = {"1m": (60, "ONE_MINUTE", 400), "5m": (300, "FIVE_MINUTE", 150), "15m": (900, "FIFTEEN_MINUTE", 125),
+              "1D": (DAY, "ONE_DAY", 250), "1W": (WEEK, "ONE_WEEK", 104)}
+INTRADAY = ("1m", "5m", "15m")
+SESSION_CLOSE = 15 * 3600 + 29 * 60  # a day bar with a tick after 15:29 IST saw the close
+FLUSH_EVERY = 5.0
+SETTLE = 5.0  # seconds past a bucket's end before its bar is closed without a newer tick
+
+
+def bucket(ts, tf):
+    size = TIMEFRAMES[tf][0]
+    if tf == "1W": return ts - (ts + _IST_OFFSET - _MONDAY) % WEEK
+    return ts - (ts + _IST_OFFSET) % size
+
+
+def bar_time(start):
+    # Candle store timestamp (IST, as getCandleData returns them, offset dropped)
+    return datetime.datetime.fromtimestamp(start, IST).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def parse_time(value):
+    dt = datetime.datetime.fromisoformat(str(value)[:19])
+    return dt.replace(tzinfo=IST).timestamp()
+
+
+class BarRing:
+    # Completed bars of one token and timeframe in parallel arrays; once full, the oldest
+    # slot is overwritten
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._columns = (array("d"), array("d"), array("d"), array("d"), array("d"), array("q"))
+        self.head = 0
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def append(self, bar):
+        if len(self) < self.capacity:
+            for column, value in zip(self._columns, bar): column.append(value)
+        else:
+            for column, value in zip(self._columns, bar): column[self.head] = value
+            self.head = (self.head + 1) % self.capacity
+
+    def bars(self, since=None):
+        n = len(self)
+        order = [(self.head + i) % n for i in range(n)] if n == self.capacity else range(n)
+        start, o, h, l, c, v = self._columns
+        return [(start[i], o[i], h[i], l[i], c[i], v[i]) for i in order if since is None or start[i] >= since]
+
+    def last(self):
+        n = len(self)
+        if not n: return None
+        i = (self.head - 1) % n if n == self.capacity else n - 1
+        return tuple(column[i] for column in self._columns)
+
+    def replace(self, bars):
+        self._columns = tuple(array(column.typecode) for column in self._columns)
+        self.head = 0
+        for bar in bars[-self.capacity:]: self.append(bar)
+
+
+class BarBuilder:
+    # Folds feed ticks into 1m/5m/15m/1D/1W bars per token (slot = the decoder's token id).
+    # Intraday bars come from the traded prices and the change in cumulative day volume; the
+    # day bar takes the exchange's day OHLC when the feed carries it, and the week bar is
+    # folded from day bars. Completed bars go to an in-memory ring per token and timeframe
+    # and are written to the candle store every FLUSH_EVERY seconds without replacing rows
+    # already there, so REST candles stay authoritative. merge() takes REST candles the
+    # other way, replacing local bars to repair gaps.
+    def __init__(self, tokens, store=None, flush_every=FLUSH_EVERY):
+        self.tokens = tokens  # TokenTable shared with the decoder
+        self._store = store   # callable returning the CandleStore
+        self.flush_every = flush_every
+        self._rings = {tf: {} for tf in TIMEFRAMES}
+        self._forming = {tf: {} for tf in TIMEFRAMES}  # slot -> [start, o, h, l, c, v, last tick ts]
+        self._volume = {}  # slot -> (day start, cumulative volume)
+        self._last_tick = {}
+        self._pending = []  # (slot, tf, bar, replace)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.ticks = self.completed = self.flushed = 0
+
+    # Tick path
+
+    def on_tick(self, tick):
+        ltp = tick.ltp
+        if ltp <= 0: return
+        ts = tick.exchange_ts / 1000.0 if tick.exchange_ts else time.time()
+        slot = tick.token_id
+        with self._lock:
+            self.ticks += 1
+            self._last_tick[slot] = ts
+            day = bucket(ts, "1D")
+            traded = 0
+            quote = tick.mode >= MODE_QUOTE
+            if quote:
+                prev = self._volume.get(slot)
+                if prev and prev[0] == day and tick.volume >= prev[1]: traded = tick.volume - prev[1]
+                self._volume[slot] = (day, tick.volume)
+            for tf in INTRADAY: self._fold(tf, slot, bucket(ts, tf), ltp, traded, ts)
+            if quote and tick.open:
+                self._set_day(slot, day, tick.open, tick.high, tick.low, ltp, tick.volume, ts)
+            else:
+                self._fold("1D", slot, day, ltp, traded, ts)
+        if self._thread is None: self.start()
+
+    def _fold(self, tf, slot, start, ltp, traded, ts):
+        forming = self._forming[tf]
+        bar = forming.get(slot)
+        if bar is not None and bar[0] == start:
+            if ltp > bar[2]: bar[2] = ltp
+            if ltp < bar[3]: bar[3] = ltp
+            bar[4] = ltp
+            bar[5] += traded
+            bar[6] = ts
+            return
+        if bar is not None:
+            if start < bar[0]: return  # late tick for a bar already closed
+            self._complete(tf, slot, bar)
+        forming[slot] = [start, ltp, ltp, ltp, ltp, traded, ts]
+        if tf == "1D": self._start_day(slot, start)
+
+    def _set_day(self, slot, day, o, h, l, c, volume, ts):
+        bar = self._forming["1D"].get(slot)
+        if bar is not None and bar[0] != day:
+            if day < bar[0]: return
+            self._complete("1D", slot, bar)
+            bar = None
+        self._forming["1D"][slot] = [day, o, h, l, c, volume, ts]
+        if bar is None: self._start_day(slot, day)
+
+    def _start_day(self, slot, day):
+        # A day in a new week closes the forming week bar
+        week = self._forming["1W"].get(slot)
+        if week is not None and bucket(day, "1W") > week[0]:
+            self._complete("1W", slot, week)
+            del self._forming["1W"][slot]
+
+    def _complete(self, tf, slot, bar):
+        record = tuple(bar[:6])
+        ring = self._rings[tf].get(slot)
+        if ring is None: ring = self._rings[tf][slot] = BarRing(TIMEFRAMES[tf][2])
+        ring.append(record)
+        self.completed += 1
+        # A day bar that stopped before the close has the wrong close; it stays in memory only
+        if tf != "1D" or bar[6] - bar[0] >= SESSION_CLOSE: self._pending.append((slot, tf, record, False))
+        if tf == "1D":
+            week = self._forming["1W"].get(slot)
+            if week is None or week[0] != bucket(bar[0], "1W"):
+                self._forming["1W"][slot] = [bucket(bar[0], "1W")] + list(record[1:]) + [bar[6]]
+            else:
+                week[2], week[3] = max(week[2], record[2]), min(week[3], record[3])
+                week[4], week[6] = record[4], bar[6]
+                week[5] += record[5]
+
+    def close_stale(self, now=None):
+        # Closes bars whose bucket has ended when no later tick arrived to do it
+        now = time.time() if now is None else now
+        with self._lock:
+            for tf in INTRADAY + ("1D",):
+                size, forming = TIMEFRAMES[tf][0], self._forming[tf]
+                for slot, bar in list(forming.items()):
+                    if bar[0] + size + SETTLE <= now:
+                        del forming[slot]
+                        self._complete(tf, slot, bar)
+            for slot, week in list(self._forming["1W"].items()):
+                if week[0] + WEEK <= now and slot not in self._forming["1D"]:
+                    del self._forming["1W"][slot]
+                    self._complete("1W", slot, week)
+
+    # Persistence
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None: return self
+            self._thread = threading.Thread(target=self._run, name="bar-flush", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_every):
+            self.close_stale()
+            self.flush()
+
+    def flush(self):
+        with self._lock: pending, self._pending = self._pending, []
+        if not pending or self._store is None: return 0
+        groups = {}
+        for slot, tf, bar, replace in pending:
+            groups.setdefault((self.tokens.token(slot), TIMEFRAMES[tf][1], replace), []).append((bar_time(bar[0]),) + bar[1:])
+        store = self._store()
+        try:
+            for (token, interval, replace), rows in groups.items(): store.put(token, interval, rows, replace=replace)
+        except Exception as e:
+            print(f"Bar flush error: {e}")
+            with self._lock: self._pending[:0] = pending
+            return 0
+        self.flushed += len(pending)
+        return len(pending)
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    # Queries
+
+    def bars(self, token, tf, since=None, forming=True):
+        # Bars held in memory, oldest first, as (start epoch, open, high, low, close, volume);
+        # the forming bar is last when forming=True
+        slot = self.tokens.find(token)
+        if slot is None: return []
+        with self._lock:
+            ring = self._rings[tf].get(slot)
+            out = ring.bars(since) if ring else []
+            bar = self._forming[tf].get(slot)
+            if tf == "1W": bar = self._week_so_far(slot, bar)
+            if forming and bar is not None and (since is None or bar[0] >= since): out.append(tuple(bar[:6]))
+        return out
+
+    def _week_so_far(self, slot, week):
+        # The forming week bar only holds completed days; fold in today's
+        day = self._forming["1D"].get(slot)
+        if day is None: return week
+        if week is None or bucket(day[0], "1W") != week[0]: return [bucket(day[0], "1W")] + day[1:6]
+        return [week[0], week[1], max(week[2], day[2]), min(week[3], day[3]), day[4], week[5] + day[5]]
+
+    def history(self, token, tf, start, end=None):
+        # Candle store rows for [start, end] (epoch seconds) with the in-memory bars laid over
+        # any the store does not have
+        merged = {}
+        if self._store is not None:
+            for row in self._store().candles(token, TIMEFRAMES[tf][1], bar_time(start), bar_time(end) if end else None):
+                merged[parse_time(row[0])] = (parse_time(row[0]),) + tuple(row[1:])
+        for bar in self.bars(token, tf, start):
+            if end is None or bar[0] <= end: merged.setdefault(bar[0], bar)
+        return [merged[k] for k in sorted(merged)]
+
+    def last_tick(self, token):
+        slot = self.tokens.find(token)
+        return self._last_tick.get(slot) if slot is not None else None
+
+    def weekly_close(self, token, today=None):
+        # Previous week's close from local bars, or None when they can't vouch for it: the
+        # last day bar before this Monday must be a Friday, and day bars built from ticks only
+        # reach the store once they have seen the session close
+        if self._store is None: return None
+        self.flush()
+        today = today or datetime.datetime.now(IST).date()
+        monday = today - datetime.timedelta(days=today.weekday())
+        friday = datetime.datetime.combine(monday - datetime.timedelta(days=3), datetime.time(), IST).timestamp()
+        row = self._store().last_close_before(token, monday)
+        return row[1] if row and parse_time(row[0]) == friday else None
+
+    # REST repair
+
+    def merge(self, token, tf, candles):
+        # getCandleData rows replace local bars with the same start, in memory and on disk;
+        # 1-minute rows are rolled up into the 5m and 15m bars they cover
+        slot = self.tokens.register(token)
+        rows = sorted((parse_time(c[0]), float(c[1]), float(c[2]), float(c[3]), float(c[4]), int(c[5]) if len(c) > 5 else 0)
+                      for c in candles)
+        if not rows: return 0
+        with self._lock:
+            forming = self._forming[tf].get(slot)
+            rows = [r for r in rows if forming is None or r[0] < forming[0]]
+            if not rows: return 0
+            self._replace(slot, tf, rows)
+            if tf == "1m":
+                for coarse in ("5m", "15m"):
+                    touched = {bucket(row[0], coarse) for row in rows}
+                    minutes = {bar[0]: bar for bar in self._rings["1m"][slot].bars(min(touched))}
+                    minutes.update((row[0], row) for row in rows)
+                    buckets = {}
+                    for start in sorted(minutes):
+                        if bucket(start, coarse) in touched: buckets.setdefault(bucket(start, coarse), []).append(minutes[start])
+                    current = self._forming[coarse].get(slot)
+                    self._replace(slot, coarse, [(start, group[0][1], max(b[2] for b in group), min(b[3] for b in group), group[-1][4], sum(b[5] for b in group))
+                                                 for start, group in sorted(buckets.items()) if current is None or start < current[0]])
+        return len(rows)
+
+    def _replace(self, slot, tf, rows):
+        if not rows: return
+        ring = self._rings[tf].get(slot)
+        if ring is None: ring = self._rings[tf][slot] = BarRing(TIMEFRAMES[tf][2])
+        bars = {bar[0]: bar for bar in ring.bars()}
+        bars.update((row[0], row) for row in rows)
+        ring.replace([bars[k] for k in sorted(bars)])
+        self._pending.extend((slot, tf, row, True) for row in rows)
+
+    def stats(self):
+        with self._lock:
+            return {"ticks": self.ticks, "completed": self.completed, "flushed": self.flushed, "pending": len(self._pending),
+                    "tokens": len(self._rings["1m"])}
@@ -0,0 +1,68 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alert_index import AlertIndex
+
+SYMBOLS = 200
+
+
+def make_alerts(total):
+    per_side = max(1, total // (SYMBOLS * 2))
+    alerts, base = [], {}
+    for t in range(SYMBOLS):
+        token = str(1000 + t)
+        base[token] = price = random.uniform(100, 5000)
+        step = price * 0.002
+        for k in range(1, per_side + 1):
+            alerts.append({"id": f"{token}-A{k}", "symbol": token, "token": token, "price": round(price + k * step, 2), "condition": "ABOVE"})
+            alerts.append({"id": f"{token}-B{k}", "symbol": token, "token": token, "price": round(price - k * step, 2), "condition": "BELOW"})
+    return alerts, base
+
+
+def legacy_check(alerts, stock):
+    # The pre-index check_alerts loop, minus the logging/Telegram side effects
+    for alert in list(alerts):
+        if str(alert["token"]) == str(stock["token"]):
+            triggered = False
+            if alert["condition"] == "ABOVE" and stock["ltp"] >= alert["price"]: triggered = True
+            elif alert["condition"] == "BELOW" and stock["ltp"] <= alert["price"]: triggered = True
+            if triggered and alert in alerts: alerts.remove(alert)
+
+
+def ticks(base, n):
+    tokens = list(base)
+    return [(tok, base[tok] * (1 + random.uniform(-0.003, 0.003))) for tok in (random.choice(tokens) for _ in range(n))]
+
+
+def bench(total, n_ticks):
+    random.seed(total)
+    alerts, base = make_alerts(total)
+    stream = ticks(base, n_ticks)
+
+    index = AlertIndex(alerts)
+    start = time.perf_counter()
+    for token, ltp in stream: index.pop_triggered(token, ltp)
+    idx_us = (time.perf_counter() - start) / len(stream) * 1e6
+
+    legacy = list(alerts)
+    legacy_stream = stream[:max(20, n_ticks // (total // 1000 or 1))]
+    start = time.perf_counter()
+    for token, ltp in legacy_stream: legacy_check(legacy, {"token": token, "ltp": ltp})
+    legacy_us = (time.perf_counter() - start) / len(legacy_stream) * 1e6
+
+    extra = [dict(a, id=a["id"] + "x", price=a["price"] + 0.01) for a in random.sample(alerts, 1000)]
+    start = time.perf_counter()
+    for a in extra: index.add(a)
+    for a in extra: index.remove(a["id"])
+    edit_us = (time.perf_counter() - start) / (2 * len(extra)) * 1e6
+
+    print(f"{total:>7} alerts | index {idx_us:8.2f} us/tick | legacy scan {legacy_us:10.1f} us/tick | add/delete {edit_us:6.2f} us/op | live {len(index)}")
+
+
+if __name__ == "__main__":
+    for total in (10_000, 100_000):
+        bench(total, 50_000)
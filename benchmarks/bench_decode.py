@@ -0,0 +1,44 @@
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tick_decoder import TickDecoder, encode_frame
+
+
+def legacy_decode(message):
+    # The old bytes branch of on_data
+    token = message[2:27].replace(b'\x00', b'').decode('utf-8')
+    return token, struct.unpack('<q', message[43:51])[0] / 100.0
+
+
+def rate(fn, frames, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(frames)
+        took = time.perf_counter() - start
+        best = took if best is None else min(best, took)
+    return len(frames) / best
+
+
+if __name__ == "__main__":
+    random.seed(1)
+    tokens = [str(1000 + i) for i in range(200)]
+    frames = [encode_frame(random.choice(tokens), random.uniform(100, 5000), volume=random.randint(1, 10**7),
+                           ohlc=(1.0, 2.0, 0.5, 1.5), depth=[(1, 100.0, 10, 1)] * 5 + [(0, 100.5, 10, 1)] * 5)
+              for _ in range(100_000)]
+    decoder = TickDecoder()
+    for t in tokens: decoder.tokens.register(t)
+    results = {
+        "legacy ltp-only slice decode": rate(lambda fs: [legacy_decode(f) for f in fs], frames),
+        "decode_ltp": rate(lambda fs: [decoder.decode_ltp(f) for f in fs], frames),
+        "decode (quote fields)": rate(lambda fs: [decoder.decode(f, with_depth=False) for f in fs], frames),
+        "decode (snap quote + depth)": rate(lambda fs: [decoder.decode(f) for f in fs], frames),
+        "decode_batch": rate(decoder.decode_batch, frames),
+    }
+    for name, per_sec in results.items():
+        print(f"{name:32} {per_sec / 1e6:6.2f} M frames/s  {1e6 / per_sec:6.2f} us/frame")
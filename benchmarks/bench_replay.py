@@ -0,0 +1,53 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import generate_369_levels
+from tick_decoder import MODE_QUOTE, encode_frame
+from tick_recorder import TickRecorder, replay_session, format_report
+
+SESSION_START = 1_760_000_000.0  # any 09:15; only the spacing matters
+
+
+def record_session(path, symbols, seconds, ticks_per_sec):
+    # Random-walk prices, ticks spread evenly over the session, quote-mode frames
+    random.seed(11)
+    tokens = [str(1000 + i) for i in range(symbols)]
+    price = {t: random.uniform(100, 5000) for t in tokens}
+    rec = TickRecorder(path)
+    total = int(symbols * seconds * ticks_per_sec)
+    step = seconds / total
+    for i in range(total):
+        token = tokens[i % symbols]
+        price[token] *= 1 + random.gauss(0, 0.0004)
+        p = price[token]
+        rec.write(encode_frame(token, p, mode=MODE_QUOTE, volume=i, ohlc=(p, p, p, p)), SESSION_START + i * step)
+    rec.close()
+    return tokens, price
+
+
+if __name__ == "__main__":
+    symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 6.25
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+    path = os.path.join(tempfile.mkdtemp(), "session.ticks")
+    start = time.perf_counter()
+    tokens, _ = record_session(path, symbols, hours * 3600, rate)
+    print(f"recorded {symbols} symbols x {hours} h at {rate}/s per symbol: {os.path.getsize(path) / 1e6:.0f} MB "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    # Levels around each symbol's opening price, the way generate_alerts_ui builds them from the weekly close
+    random.seed(11)
+    opening = {t: random.uniform(100, 5000) for t in tokens}
+    watchlist = [{"symbol": f"SYM{t}-EQ", "token": t, "exch_seg": "NSE", "ltp": 0.0, "wc": opening[t]} for t in tokens]
+    alerts = [{"id": f"{t}-{i}", "symbol": f"SYM{t}-EQ", "token": t, "price": lvl["price"], "condition": lvl["type"]}
+              for t in tokens for i, lvl in enumerate(generate_369_levels(opening[t], opening[t] * 0.999))]
+    report = replay_session(path, watchlist, alerts)
+    lines = format_report(report).splitlines()
+    print("\n".join(lines[:2] + lines[2:8] + (["  ..."] if len(lines) > 8 else [])))
+    print(f"  {report['frames'] / report['elapsed_s'] / 1e3:.0f}k frames/s, {report['notifications']} dry-run notifications")
+    os.remove(path)
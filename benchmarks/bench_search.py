@@ -0,0 +1,56 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrip_master import ScripTable, write_cache
+from scrip_search import ScripSearch
+
+SYLLABLES = ["RE", "LI", "AN", "CE", "TA", "TA", "IN", "FO", "SYS", "HD", "FC", "BA", "NK", "SB", "IN",
+             "MA", "RU", "TI", "WI", "PRO", "BHA", "RTI", "AIR", "TEL", "ADA", "NI", "PO", "WER", "GR", "ID"]
+
+
+def make_instruments(n):
+    random.seed(7)
+    seen = set()
+    while len(seen) < n:
+        seen.add("".join(random.choice(SYLLABLES) for _ in range(random.randint(2, 5))))
+    for i, base in enumerate(sorted(seen)):
+        yield {"token": str(10000 + i), "symbol": base + ("-EQ" if i % 3 else "25NOVFUT"), "name": base + " LIMITED",
+               "exch_seg": "NSE" if i % 3 else "NFO", "lotsize": "1", "instrumenttype": "", "expiry": ""}
+
+
+def legacy(scrips, q):
+    return [s for s in scrips if s['symbol'].startswith(q)][:15]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 120_000
+    path = os.path.join(tempfile.mkdtemp(), "scripmaster.bin")
+    os.replace(write_cache(path, make_instruments(n), {"segments": ["NSE", "NFO"]}), path)
+    table = ScripTable(path)
+    start = time.perf_counter()
+    index = ScripSearch(table)
+    print(f"{len(index)} instruments, index build {time.perf_counter() - start:.2f} s")
+
+    scrips = list(table)
+    queries = ["R", "RE", "REL", "RELI", "RELIA", "BANK", "POWER", "TELAIR", "ADANIPO", "SBINFO", "XYZ", "RELAINCE"]
+    for q in queries:
+        start = time.perf_counter()
+        for _ in range(200): index._last = None; index.search_ids(q)
+        cold = (time.perf_counter() - start) / 200 * 1e6
+        start = time.perf_counter()
+        for _ in range(5): legacy(scrips, q)
+        scan = (time.perf_counter() - start) / 5 * 1e6
+        print(f"{q:10} index {cold:8.1f} us | legacy startswith scan {scan:9.0f} us | top: {[table.field(i, 'symbol') for i in index.search_ids(q, 3)]}")
+
+    # Typing "ADANIPOWER" one key at a time reuses the previous result set
+    word = "ADANIPOWER"
+    start = time.perf_counter()
+    for _ in range(200):
+        index._last = None
+        for j in range(1, len(word) + 1): index.search_ids(word[:j])
+    print(f"incremental typing of {word!r}: {(time.perf_counter() - start) / (200 * len(word)) * 1e6:.1f} us/keystroke")
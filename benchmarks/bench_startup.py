@@ -0,0 +1,80 @@
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, "benchmarks", "startup_results.jsonl")
+HEAVY = ("flet", "SmartApi", "websocket", "pyotp", "requests", "logzero", "sqlite3")
+
+# Runs in a fresh interpreter so every import is cold. The page stands in for the Flet
+# session: the first frame is the first page.update() once a view has been added.
+CHILD = r"""
+import json, sys, time
+sys.path.insert(0, ROOT)
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter() - t0
+
+class Page:
+    route = "/"
+    def __init__(self):
+        self.views, self.overlay, self.first_frame = [], [], None
+        self.on_route_change = None
+    def go(self, route):
+        self.route = route
+        if self.on_route_change: self.on_route_change(None)
+    def update(self, *controls):
+        if self.first_frame is None and self.views: self.first_frame = time.perf_counter()
+
+page = Page()
+error = None
+try: main.main(page)
+except Exception as e: error = f"{type(e).__name__}: {e}"
+first = page.first_frame - t0 if page.first_frame else None
+print(json.dumps({"import_s": t_import, "first_frame_s": first, "error": error,
+                  "loaded": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+
+def measure(runs):
+    samples = []
+    with tempfile.TemporaryDirectory() as cwd:
+        for _ in range(runs):
+            code = f"ROOT = {ROOT!r}\nHEAVY = {HEAVY!r}\n" + CHILD
+            out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, timeout=120)
+            line = out.stdout.strip().splitlines()[-1] if out.stdout.strip() else ""
+            if not line.startswith("{"): raise RuntimeError(out.stderr[-2000:])
+            samples.append(json.loads(line))
+    frames = [s["first_frame_s"] for s in samples if s["first_frame_s"] is not None]
+    return {"import_ms": statistics.median(s["import_s"] for s in samples) * 1e3,
+            "first_frame_ms": statistics.median(frames) * 1e3 if frames else None,
+            "loaded_at_first_frame": samples[-1]["loaded"], "error": samples[-1]["error"], "runs": runs}
+
+
+def release_label():
+    try:
+        return subprocess.run(["git", "describe", "--tags", "--always", "--dirty"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Cold-start import time and time to first frame of main.py")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--release", default=None, help="label stored with the result (default: git describe)")
+    p.add_argument("--no-save", action="store_true", help=f"do not append to {os.path.relpath(RESULTS, ROOT)}")
+    args = p.parse_args()
+    result = measure(args.runs)
+    result.update(release=args.release or release_label(), date=datetime.date.today().isoformat(), python=sys.version.split()[0])
+    frame = f"{result['first_frame_ms']:.1f} ms" if result["first_frame_ms"] is not None else "n/a"
+    print(f"{result['release']}: import {result['import_ms']:.1f} ms | first frame {frame} | loaded: {', '.join(result['loaded_at_first_frame'])}")
+    if result["error"]: print(f"main() raised {result['error']}")
+    if not args.no_save:
+        with open(RESULTS, "a") as f: f.write(json.dumps(result) + "\n")
+        print(f"appended to {RESULTS}")
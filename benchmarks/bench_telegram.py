@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fakes import FakeTelegramServer
+from notifier import TelegramDispatcher, SEPARATOR
+
+
+if __name__ == "__main__":
+    server = FakeTelegramServer(throttle_first=3).start()
+    outbox = os.path.join(tempfile.mkdtemp(), "outbox.jsonl")
+    dispatcher = TelegramDispatcher(base_url=server.url, window=0.5, outbox=outbox)
+
+    alerts = 1000
+    start = time.perf_counter()
+    for i in range(alerts):
+        dispatcher.send("TOKEN", "chat-a" if i % 4 else "chat-b", f"🔔 <b>ALERT!</b> SYM{i} hit level {i}")
+    enqueue_us = (time.perf_counter() - start) / alerts * 1e6
+    dispatcher.flush(60)
+    took = time.perf_counter() - start
+    dispatcher.stop()
+    server.stop()
+
+    texts = [t for body in server.received for t in body["text"].split(SEPARATOR)]
+    per_chat = {}
+    for body in server.received: per_chat[body["chat_id"]] = per_chat.get(body["chat_id"], 0) + 1
+    print(f"{alerts} alerts enqueued at {enqueue_us:.1f} us each, delivered in {took:.2f} s")
+    print(f"messages per chat: {per_chat}, HTTP requests {dispatcher.requests} (429s honoured: {dispatcher.throttled})")
+    print(f"alerts received {len(texts)}, unique {len(set(texts))}, persisted {dispatcher.persisted}")
+    assert len(texts) == len(set(texts)) == alerts, "alerts lost or duplicated"
@@ -0,0 +1,223 @@
+import base64
+import datetime
+import hashlib
+import json
+import random
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tick_decoder import MODE_SNAP_QUOTE, encode_frame
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _price(token):
+    return 100.0 + (int(token) * 7919) % 4900
+
+
+class FakeSmartConnect:
+    # Local stand-in for the SmartConnect REST calls the app makes. Every call sleeps for
+    # `latency` to approximate the round trip; prices are deterministic per token.
+    def __init__(self, api_key="", latency=0.03):
+        self.api_key = api_key
+        self.latency = latency
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock: self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency: time.sleep(self.latency)
+
+    def generateSession(self, client_id, password, totp):
+        self._call("generateSession")
+        return {"status": True, "data": {"jwtToken": "jwt", "feedToken": "feed", "refreshToken": "refresh"}}
+
+    def ltpData(self, exchange, symbol, token):
+        self._call("ltpData")
+        return {"status": True, "data": {"exchange": exchange, "tradingsymbol": symbol, "symboltoken": token, "ltp": _price(token)}}
+
+    def getMarketData(self, mode, exchange_tokens):
+        self._call("getMarketData")
+        fetched = []
+        for exchange, tokens in exchange_tokens.items():
+            for token in tokens:
+                p = _price(token)
+                fetched.append({"exchange": exchange, "symbolToken": token, "ltp": p, "open": p, "high": p * 1.01,
+                                "low": p * 0.99, "close": p * 0.995})
+        return {"status": True, "data": {"fetched": fetched, "unfetched": []}}
+
+    def getCandleData(self, req):
+        self._call("getCandleData")
+        day = datetime.date.fromisoformat(req["fromdate"][:10])
+        end = datetime.date.fromisoformat(req["todate"][:10])
+        base, data = _price(req["symboltoken"]), []
+        while day <= end:
+            if day.weekday() < 5:
+                drift = base * (1 + 0.01 * ((day.toordinal() % 11) - 5) / 5)
+                data.append([f"{day}T00:00:00+05:30", drift, drift * 1.01, drift * 0.99, drift * 1.002, 100000])
+            day += datetime.timedelta(days=1)
+        return {"status": True, "data": data}
+
+
+class FakeFeedServer:
+    # Minimal SmartWebSocketV2-compatible server: accepts the websocket handshake, reads
+    # subscribe/unsubscribe JSON and heartbeats, and streams binary frames for the subscribed
+    # tokens at `rate` frames per second (0 = as fast as the socket takes them).
+    def __init__(self, rate=1000.0, mode=MODE_SNAP_QUOTE, host="127.0.0.1"):
+        self.rate = rate
+        self.mode = mode
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, 0))
+        self._sock.listen()
+        self.port = self._sock.getsockname()[1]
+        self.url = f"ws://{host}:{self.port}/smart-stream"
+        self.sent = 0
+        self.subscribed = {}
+        self._running = False
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        try: self._sock.close()
+        except OSError: pass
+
+    def _accept(self):
+        while self._running:
+            try: conn, _ = self._sock.accept()
+            except OSError: return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request: request += conn.recv(4096)
+            key = next(line.split(b":", 1)[1].strip() for line in request.split(b"\r\n") if line.lower().startswith(b"sec-websocket-key"))
+            accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest())
+            conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        except (OSError, StopIteration):
+            conn.close()
+            return
+        tokens, alive = [], [True]
+        send_lock = threading.Lock()
+        def send(opcode, payload):
+            n = len(payload)
+            head = struct.pack("!BB", 0x80 | opcode, n) if n < 126 else struct.pack("!BBH", 0x80 | opcode, 126, n)
+            with send_lock: conn.sendall(head + payload)
+        def reader():
+            buf = b""
+            try:
+                while self._running:
+                    chunk = conn.recv(65536)
+                    if not chunk: break
+                    buf += chunk
+                    while len(buf) >= 6:
+                        opcode, n, at = buf[0] & 0x0F, buf[1] & 0x7F, 2
+                        if n == 126: n, at = struct.unpack_from("!H", buf, 2)[0], 4
+                        elif n == 127: n, at = struct.unpack_from("!Q", buf, 2)[0], 10
+                        if len(buf) < at + 4 + n: break
+                        mask, body = buf[at:at + 4], buf[at + 4:at + 4 + n]
+                        buf = buf[at + 4 + n:]
+                        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(body))
+                        if opcode == 8: return
+                        if opcode == 9: send(10, payload)
+                        elif opcode == 1:
+                            if payload == b"ping": send(1, b"pong")
+                            else: self._control(json.loads(payload), tokens)
+            except (OSError, ValueError):
+                pass
+            finally:
+                alive[0] = False
+        threading.Thread(target=reader, daemon=True).start()
+        price = {}
+        interval = 1.0 / self.rate if self.rate else 0.0
+        next_at = time.perf_counter()
+        try:
+            while self._running and alive[0]:
+                if not tokens:
+                    time.sleep(0.01)
+                    continue
+                token = random.choice(tokens)
+                p = price[token] = price.get(token) or _price(token)
+                price[token] = p * (1 + random.gauss(0, 0.0005))
+                send(2, encode_frame(token, price[token], mode=self.mode, sequence=self.sent, volume=self.sent,
+                                     exchange_ts=int(time.time() * 1000), ohlc=(p, p, p, p)))
+                self.sent += 1
+                if interval:
+                    next_at += interval
+                    delay = next_at - time.perf_counter()
+                    if delay > 0: time.sleep(delay)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _control(self, msg, tokens):
+        params = msg.get("params", {})
+        for group in params.get("tokenList", []):
+            for token in group.get("tokens", []):
+                if msg.get("action") == 1 and token not in tokens:
+                    tokens.append(token)
+                    self.subscribed[token] = group.get("exchangeType")
+                elif msg.get("action") == 0 and token in tokens:
+                    tokens.remove(token)
+                    self.subscribed.pop(token, None)
+
+
+class FakeTelegramServer:
+    # Local stand-in for api.telegram.org/bot<token>/sendMessage. The first `throttle_first`
+    # requests get a 429 with `retry_after`; chats in `reject` get a 400. Accepted message
+    # bodies are kept in `received`.
+    def __init__(self, throttle_first=3, retry_after=1, reject=(), host="127.0.0.1"):
+        self.throttle_first = throttle_first
+        self.retry_after = retry_after
+        self.reject = set(reject)
+        self.received = []
+        self.requests = self.throttled = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status, payload = fake._answer(body)
+                raw = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, 0), Handler)
+        self.url = f"http://{host}:{self._server.server_port}"
+
+    def _answer(self, body):
+        with self._lock:
+            self.requests += 1
+            if self.throttle_first > 0:
+                self.throttle_first -= 1
+                self.throttled += 1
+                return 429, {"ok": False, "error_code": 429, "parameters": {"retry_after": self.retry_after}}
+            if body["chat_id"] in self.reject:
+                return 400, {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"}
+            self.received.append(body)
+        return 200, {"ok": True, "result": {}}
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,313 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+# The engine keeps its state store, activity log and candle store in the working directory;
+# main switches to this scratch directory once the command line is parsed
+WORKDIR = tempfile.mkdtemp(prefix="ty-bench-")
+
+import engine
+from engine import state
+from fakes import FakeSmartConnect, FakeFeedServer
+from bars import BarBuilder
+from tick_decoder import TickDecoder, encode_frame
+
+
+def metric(out, name, value, unit, better="lower"):
+    out[name] = {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def watchlist(n, offset=0):
+    return [{"symbol": f"SYM{1000 + i}-EQ", "token": str(1000 + i), "exch_seg": "NSE", "ltp": 0.0, "wc": 0.0}
+            for i in range(offset, offset + n)]
+
+
+def bench_decode(out, quick):
+    random.seed(1)
+    frames = [encode_frame(str(1000 + random.randrange(200)), random.uniform(100, 5000), volume=i) for i in range(20_000 if quick else 100_000)]
+    decoder = TickDecoder()
+    for with_depth in (False, True):
+        start = time.perf_counter()
+        for f in frames: decoder.decode(f, with_depth)
+        metric(out, f"decode.{'full' if with_depth else 'quote'}", len(frames) / (time.perf_counter() - start), "frames/s", "higher")
+    ticks = [decoder.decode(f, False) for f in frames]
+    bars = BarBuilder(decoder.tokens)
+    start = time.perf_counter()
+    for t in ticks: bars.on_tick(t)
+    metric(out, "bars.on_tick", (time.perf_counter() - start) / len(ticks) * 1e6, "us/tick")
+    bars.stop()
+
+    # End to end: fake feed server -> SmartWebSocketV2 -> start_websocket's pipeline
+    from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+    server = FakeFeedServer(rate=0).start()
+    SmartWebSocketV2.ROOT_URI = server.url
+    state.watchlist = state.book.load(watchlist(200))
+    state.jwt_token, state.feed_token, state.api_key, state.client_id = "jwt", "feed", "key", "client"
+    engine.start_websocket(None)
+    deadline = time.monotonic() + 10
+    while not server.sent and time.monotonic() < deadline: time.sleep(0.05)
+    before, start = state.pipeline.stats()["received"], time.perf_counter()
+    time.sleep(1.0 if quick else 3.0)
+    stats = state.pipeline.stats()
+    metric(out, "feed.received", (stats["received"] - before) / (time.perf_counter() - start), "frames/s", "higher")
+    metric(out, "feed.lag_avg", stats["lag_avg_ms"], "ms")
+    metric(out, "feed.conflated", stats["conflated"] / max(1, stats["received"]), "ratio")
+    engine.stop_websocket()
+    server.stop()
+
+
+def bench_check_alerts(out, quick):
+    from alert_index import AlertIndex
+    for total in ((1_000, 10_000) if quick else (1_000, 10_000, 100_000)):
+        random.seed(total)
+        stocks = state.book.load(watchlist(200))
+        slots = [state.book.slot(s["token"]) for s in stocks]
+        alerts = []
+        for s, slot in zip(stocks, slots):
+            base = random.uniform(100, 5000)
+            state.book.set_ltp(slot, base)
+            for k in range(1, total // 400 + 1):
+                alerts.append({"id": f"{s['token']}-A{k}", "symbol": s["symbol"], "token": s["token"], "price": round(base * (1 + 0.002 * k), 2), "condition": "ABOVE"})
+                alerts.append({"id": f"{s['token']}-B{k}", "symbol": s["symbol"], "token": s["token"], "price": round(base * (1 - 0.002 * k), 2), "condition": "BELOW"})
+        state.alerts = AlertIndex(alerts)
+        state.is_paused = False
+        ltp = state.book.ltp
+        base = {slot: ltp[slot] for slot in slots}
+        # One evaluator batch is every slot ticking once, as the pipeline delivers them
+        calls = 50_000
+        start = time.perf_counter()
+        for _ in range(calls // 200):
+            for slot in slots: ltp[slot] = base[slot] * (1 + random.uniform(-0.003, 0.003))
+            engine.check_alerts_batch(slots, None)
+        metric(out, f"check_alerts.{total}", (time.perf_counter() - start) / calls * 1e6, "us/tick")
+    engine.get_store().flush()
+
+
+def bench_search(out, quick):
+    from bench_search import make_instruments
+    from scrip_master import ScripTable, write_cache
+    from scrip_search import ScripSearch
+    path = os.path.join(WORKDIR, "scripmaster.bin")
+    os.replace(write_cache(path, make_instruments(30_000 if quick else 120_000), {"segments": ["NSE", "NFO"]}), path)
+    table = ScripTable(path)
+    start = time.perf_counter()
+    index = ScripSearch(table)
+    metric(out, "search.build", time.perf_counter() - start, "s")
+    queries = ["RE", "REL", "RELI", "BANK", "POWER", "TELAIR", "ADANIPO", "SBINFO", "XYZ", "RELAINCE"]
+    start = time.perf_counter()
+    for _ in range(20):
+        for q in queries:
+            index._last = None
+            index.search(q, 15)
+    metric(out, "search.query", (time.perf_counter() - start) / (20 * len(queries)) * 1e6, "us")
+
+
+def bench_refresh(out, quick):
+    # Rate limits are real, so the cold run is bounded by the candle endpoint's 3 req/s
+    n = 6 if quick else 20
+    state.smart_api = FakeSmartConnect(latency=0.03)
+    state.candles = None
+    state.watchlist = state.book.load(watchlist(n, offset=500))
+    for label in ("cold", "warm"):
+        calls = dict(state.smart_api.calls)
+        start = time.perf_counter()
+        engine.refresh_all_data(None)
+        engine.scheduler.join()
+        metric(out, f"refresh_all_data.{label}", time.perf_counter() - start, "s")
+        metric(out, f"refresh_all_data.{label}_calls", sum(state.smart_api.calls.values()) - sum(calls.values()), "calls")
+
+
+def bench_render(out, quick):
+    from watchlist_view import WatchlistRows
+    book = state.book
+    stocks = book.load(watchlist(500))
+    for s in stocks:
+        slot = book.slot(s["token"])
+        book.set_ltp(slot, random.uniform(100, 5000))
+        book.set_wc(slot, random.uniform(100, 5000))
+    rows = WatchlistRows(on_remove=lambda t: None, book=book)
+    start = time.perf_counter()
+    rows.set_order(stocks, update=False)
+    metric(out, "render.first", (time.perf_counter() - start) * 1e3, "ms")
+    start = time.perf_counter()
+    rows.set_order(book.sorted(stocks, "ltp"), update=False)
+    metric(out, "render.resort", (time.perf_counter() - start) * 1e3, "ms")
+    for slot in book.slots(): book.ltp[slot] *= 1.001
+    dirty = {s["token"] for s in stocks}
+    start = time.perf_counter()
+    changed = rows.flush(dirty)
+    metric(out, "render.flush", (time.perf_counter() - start) * 1e3, "ms")
+    metric(out, "render.flush_controls", len(changed), "controls")
+
+
+def bench_rank(out, quick):
+    # Incremental ranked views vs re-sorting the watchlist, for 1000 symbols
+    from alert_index import AlertIndex
+    from ranked_views import RankedViews
+    random.seed(5)
+    book = state.book
+    stocks = book.load(watchlist(1000))
+    slots = [book.slot(s["token"]) for s in stocks]
+    alerts = AlertIndex()
+    for slot, s in zip(slots, stocks):
+        book.set_ltp(slot, random.uniform(100, 5000))
+        book.set_wc(slot, book.ltp[slot] * random.uniform(0.95, 1.05))
+        for k in (-2, -1, 1, 2):
+            alerts.add({"id": f"{s['token']}{k}", "token": s["token"], "price": round(book.ltp[slot] * (1 + 0.01 * k), 2),
+                        "condition": "ABOVE" if k > 0 else "BELOW"})
+    views = RankedViews(book, alerts)
+    for name in ("price", "pct_wc", "alert_distance"): views[name]
+    views["price"].subscribe(20, lambda top, changes: None, reverse=True)
+    ticks = [(slots[random.randrange(1000)], 1 + random.gauss(0, 0.0005)) for _ in range(20_000 if quick else 100_000)]
+    ltp = book.ltp
+    start = time.perf_counter()
+    for slot, move in ticks:
+        ltp[slot] *= move
+        views.update(slot)
+    metric(out, "rank.update_all_views", (time.perf_counter() - start) / len(ticks) * 1e6, "us/tick")
+    views.release("pct_wc")
+    views.release("alert_distance")
+    start = time.perf_counter()
+    for slot, move in ticks:
+        ltp[slot] *= move
+        views.update(slot)
+    metric(out, "rank.update_one_view", (time.perf_counter() - start) / len(ticks) * 1e6, "us/tick")
+    start = time.perf_counter()
+    for _ in range(20): sorted(stocks, key=lambda s: book.ltp_of(s["token"]))
+    metric(out, "rank.full_sort", (time.perf_counter() - start) / 20 * 1e3, "ms")
+    start = time.perf_counter()
+    views.order("price", stocks, reverse=True)
+    metric(out, "rank.order", (time.perf_counter() - start) * 1e3, "ms")
+
+
+def bench_rules(out, quick):
+    # 50k rules on 1000 tokens: level price alerts plus expression rules mixing tokens,
+    # weekly-close percent moves, hysteresis and cooldown; a batch is 1000 ticks
+    from alert_index import AlertIndex
+    random.seed(7)
+    tokens = [str(3000 + i) for i in range(1000)]
+    base = {t: random.uniform(100, 5000) for t in tokens}
+    alerts = []
+    for i in range(45_000):
+        t = tokens[i % 1000]
+        k = 1 + i // 2000
+        up = i % 2 == 0
+        alerts.append({"id": f"p{i}", "symbol": t, "token": t, "price": round(base[t] * (1 + (0.001 if up else -0.001) * k), 2),
+                       "condition": "ABOVE" if up else "BELOW"})
+    for i in range(5_000):
+        a, b = random.sample(tokens, 2)
+        expr = (f"{a} cross_up {base[a] * 1.002:.2f} AND ({b} pct_up 0.1 OR {b} below {base[b] * 0.99:.2f}) "
+                f"hysteresis 0.1 cooldown 60")
+        alerts.append({"id": f"r{i}", "symbol": a, "token": a, "price": 0.0, "condition": "RULE", "expr": expr, "tokens": {}, "repeat": True})
+    start = time.perf_counter()
+    index = AlertIndex(alerts, wc=base.get)
+    metric(out, "rules.compile_50k", (time.perf_counter() - start) * 1e3, "ms")
+    for t in tokens: index.pop_triggered(t, base[t])
+    batches = [[(t, base[t] * (1 + random.gauss(0, 0.002))) for t in random.sample(tokens, 1000)] for _ in range(20 if quick else 100)]
+    start = time.perf_counter()
+    for batch in batches: index.pop_triggered_batch(batch)
+    elapsed = time.perf_counter() - start
+    metric(out, "rules.batch_50k", elapsed / len(batches) * 1e3, "ms/1000 ticks")
+
+
+def bench_levels(out, quick):
+    # 3-6-9 generation for a 2000-stock watchlist: first run, re-run with nothing changed,
+    # and after 5% of prices moved
+    from alert_index import AlertIndex
+    from levels import LevelGenerator
+    random.seed(9)
+    book = state.book
+    state.watchlist = book.load(watchlist(2000))
+    for s in state.watchlist:
+        slot = book.slot(s["token"])
+        book.set_wc(slot, random.uniform(50, 6000))
+        book.set_ltp(slot, round(book.wc[slot] * random.uniform(0.97, 1.03), 2))
+    state.alerts, state.levels = AlertIndex(), LevelGenerator()
+    start = time.perf_counter()
+    engine.generate_alerts()
+    metric(out, "levels.generate_2000", (time.perf_counter() - start) * 1e3, "ms")
+    start = time.perf_counter()
+    engine.generate_alerts()
+    metric(out, "levels.unchanged_2000", (time.perf_counter() - start) * 1e3, "ms")
+    for s in random.sample(state.watchlist, 100):
+        slot = book.slot(s["token"])
+        book.set_ltp(slot, round(book.ltp[slot] * 1.02, 2))
+    start = time.perf_counter()
+    engine.generate_alerts()
+    metric(out, "levels.moved_100", (time.perf_counter() - start) * 1e3, "ms")
+    engine.get_store().flush()
+
+
+SCENARIOS = {"decode": bench_decode, "check_alerts": bench_check_alerts, "search": bench_search,
+             "refresh": bench_refresh, "render": bench_render, "rank": bench_rank, "rules": bench_rules,
+             "levels": bench_levels}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def compare(base_path, new_path, threshold):
+    with open(base_path) as f: base = json.load(f)
+    with open(new_path) as f: new = json.load(f)
+    print(f"{base['commit']} -> {new['commit']}")
+    regressions = 0
+    for name, m in new["metrics"].items():
+        old = base["metrics"].get(name)
+        if not old or not old["value"]:
+            print(f"  {name:32} {m['value']:>14.4f} {m['unit']}")
+            continue
+        change = (m["value"] - old["value"]) / old["value"]
+        worse = change > threshold if m["better"] == "lower" else change < -threshold
+        regressions += worse
+        print(f"  {name:32} {old['value']:>14.4f} -> {m['value']:>14.4f} {m['unit']:10} {change:+7.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Scenario benchmarks against local fake SmartAPI endpoints")
+    p.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    p.add_argument("--quick", action="store_true", help="smaller inputs for a fast smoke run")
+    p.add_argument("--out", help="result file (default: benchmarks/results/<commit>.json)")
+    p.add_argument("--compare", nargs="+", metavar="RESULT", help="compare BASE [NEW] result files instead of running")
+    p.add_argument("--threshold", type=float, default=0.10, help="relative change flagged as a regression")
+    args = p.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown: p.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    # Paths given on the command line are relative to where the command was run
+    if args.out: args.out = os.path.abspath(args.out)
+    if args.compare: args.compare = [os.path.abspath(path) for path in args.compare]
+    os.chdir(WORKDIR)
+    if args.compare:
+        new = args.compare[1] if len(args.compare) > 1 else os.path.join(RESULTS_DIR, f"{git_commit()}.json")
+        raise SystemExit(1 if compare(args.compare[0], new, args.threshold) else 0)
+
+    result = {"commit": git_commit(), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+              "python": sys.version.split()[0], "quick": args.quick, "metrics": {}, "errors": {}}
+    for name in args.scenarios or SCENARIOS:
+        print(f"running {name}...", flush=True)
+        try: SCENARIOS[name](result["metrics"], args.quick)
+        except Exception as e:
+            result["errors"][name] = f"{type(e).__name__}: {e}"
+            print(f"  {name} failed: {result['errors'][name]}")
+    engine.shutdown()
+    for name, m in result["metrics"].items(): print(f"  {name:32} {m['value']:>14.4f} {m['unit']}")
+    out = args.out or os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f: json.dump(result, f, indent=2)
+    print(f"wrote {out}")
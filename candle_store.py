@@ -0,0 +1,112 @@
+import datetime
+import sqlite3
+import threading
+
+CANDLE_DB = "candles.db"
+# Longest date span getCandleData accepts per request, by interval
+MAX_DAYS = {"ONE_MINUTE": 30, "THREE_MINUTE": 60, "FIVE_MINUTE": 100, "TEN_MINUTE": 100, "FIFTEEN_MINUTE": 200,
+            "THIRTY_MINUTE": 200, "ONE_HOUR": 400, "ONE_DAY": 2000}
+MARKET_CLOSE = datetime.time(15, 30)
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def _date(value):
+    return value if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime) else datetime.date.fromisoformat(str(value)[:10])
+
+
+class CandleStore:
+    # Candles keyed by (token, interval, ts) plus the date ranges already fetched for each
+    # token/interval, so holidays and empty days are not requested twice.
+    def __init__(self, path=CANDLE_DB):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._db.executescript("""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                CREATE TABLE IF NOT EXISTS candles (
+                    token TEXT, interval TEXT, ts TEXT, open REAL, high REAL, low REAL, close REAL, volume INTEGER,
+                    PRIMARY KEY (token, interval, ts)) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS coverage (
+                    token TEXT, interval TEXT, start TEXT, end TEXT,
+                    PRIMARY KEY (token, interval, start)) WITHOUT ROWID;
+            """)
+
+    def close(self):
+        with self._lock: self._db.close()
+
+    def put(self, token, interval, candles, replace=True):
+        # replace=False keeps rows already stored, so locally built bars never overwrite REST ones
+        rows = [(str(token), interval, str(c[0])[:19], c[1], c[2], c[3], c[4], c[5] if len(c) > 5 else 0) for c in candles]
+        if not rows: return 0
+        with self._lock, self._db:
+            self._db.executemany(f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def candles(self, token, interval, start=None, end=None):
+        lo = str(start)[:10] if start else ""
+        hi = (str(end)[:10] + "\uffff") if end else "\uffff"
+        with self._lock:
+            return self._db.execute("SELECT ts, open, high, low, close, volume FROM candles WHERE token = ? AND interval = ? "
+                                    "AND ts >= ? AND ts <= ? ORDER BY ts", (str(token), interval, lo, hi)).fetchall()
+
+    def covered(self, token, interval):
+        with self._lock:
+            rows = self._db.execute("SELECT start, end FROM coverage WHERE token = ? AND interval = ? ORDER BY start",
+                                    (str(token), interval)).fetchall()
+        return [(_date(s), _date(e)) for s, e in rows]
+
+    def missing(self, token, interval, start, end):
+        start, end = _date(start), _date(end)
+        gaps, cursor = [], start
+        for s, e in self.covered(token, interval):
+            if e < cursor: continue
+            if s > end: break
+            if s > cursor: gaps.append((cursor, s - ONE_DAY))
+            cursor = max(cursor, e + ONE_DAY)
+        if cursor <= end: gaps.append((cursor, end))
+        return gaps
+
+    def mark_covered(self, token, interval, start, end):
+        start, end = _date(start), _date(end)
+        if end < start: return
+        with self._lock, self._db:
+            rows = self._db.execute("SELECT start, end FROM coverage WHERE token = ? AND interval = ? AND start <= ? AND end >= ?",
+                                    (str(token), interval, (end + ONE_DAY).isoformat(), (start - ONE_DAY).isoformat())).fetchall()
+            for s, e in rows:
+                start, end = min(start, _date(s)), max(end, _date(e))
+            self._db.execute("DELETE FROM coverage WHERE token = ? AND interval = ? AND start >= ? AND start <= ?",
+                             (str(token), interval, start.isoformat(), end.isoformat()))
+            self._db.execute("INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)", (str(token), interval, start.isoformat(), end.isoformat()))
+
+    def sync(self, token, exchange, interval, start, end, fetch):
+        # Fetches only the uncovered parts of [start, end]; returns the number of API calls made
+        start, end = _date(start), _date(end)
+        now = datetime.datetime.now()
+        last_complete = now.date() if now.time() >= MARKET_CLOSE else now.date() - ONE_DAY
+        span = datetime.timedelta(days=MAX_DAYS.get(interval, 30) - 1)
+        calls = 0
+        for gap_start, gap_end in self.missing(token, interval, start, end):
+            s = gap_start
+            while s <= gap_end:
+                e = min(gap_end, s + span)
+                resp = fetch({"exchange": exchange, "symboltoken": str(token), "interval": interval,
+                              "fromdate": f"{s} 09:15", "todate": f"{e} 15:30"})
+                calls += 1
+                if not resp or not resp.get('status'): return calls
+                self.put(token, interval, resp.get('data') or [])
+                # Today's session is still forming, so it stays uncovered until the close
+                self.mark_covered(token, interval, s, min(e, last_complete))
+                s = e + ONE_DAY
+        return calls
+
+    def last_close_before(self, token, day, interval="ONE_DAY"):
+        with self._lock:
+            row = self._db.execute("SELECT ts, close FROM candles WHERE token = ? AND interval = ? AND ts < ? ORDER BY ts DESC LIMIT 1",
+                                   (str(token), interval, _date(day).isoformat())).fetchone()
+        return row
+
+    def weekly_close(self, token, today=None):
+        today = _date(today or datetime.date.today())
+        row = self.last_close_before(token, today - datetime.timedelta(days=today.weekday()))
+        return row[1] if row else None
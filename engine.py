@@ -0,0 +1,540 @@
+import threading
+import time
+import uuid
+import datetime
+import os
+from alert_index import AlertIndex
+from rules import parse
+from levels import LevelGenerator, DEFAULT_PATTERNS, DEFAULT_STEPS
+from tick_decoder import TickDecoder, MODE_QUOTE
+from scrip_master import ScripTable, sync_scrip_master, latest_cache, prune_caches, EXCHANGE_TYPES
+from scrip_search import ScripSearch
+from api_scheduler import ApiScheduler, TransientApiError, is_transient, PRIORITY_USER, PRIORITY_NORMAL, PRIORITY_BULK, PRIORITY_BACKGROUND
+from tick_pipeline import TickPipeline, ltp_tick
+from notifier import TelegramDispatcher
+from store import StateStore, STATE_DB
+from activity_log import ActivityLog
+from price_book import PriceBook
+from ranked_views import RankedViews
+from bars import BarBuilder, IST
+import metrics
+
+CONFIG_FILE = "config.json"
+SCRIPMASTER_FILE = "scripmaster.bin"
+QUOTE_BATCH_SIZE = 50  # max tokens per getMarketData request
+WC_LOOKBACK_DAYS = 45
+CANDLE_WARMUP_DAYS = 400
+
+scheduler = ApiScheduler(workers=3)
+telegram = TelegramDispatcher()
+store = None  # StateStore, opened on first use by get_store()
+_store_lock = threading.Lock()
+_levels_lock = threading.Lock()  # serialises generate_alerts
+alert_listeners = []  # extra callbacks (stock, alert) run for every fired alert
+
+class AppState:
+    def __init__(self):
+        self.api_key = ""
+        self.client_id = ""
+        self.jwt_token = None
+        self.feed_token = None
+        self.refresh_token = None
+        self.smart_api = None
+        self.feed = None
+        self.decoder = TickDecoder()
+        self.book = PriceBook(self.decoder.tokens)
+        self.pipeline = None
+        self.bars = BarBuilder(self.decoder.tokens, lambda: get_candle_store())
+        self.recorder = None
+        self.metrics_port = metrics.METRICS_PORT
+        self.current_view = "watchlist"
+        self.scrips = []
+        self.segments = ["NSE"]
+        self.search = None
+        self.candles = None
+        self.live_feed_status = "DISCONNECTED"
+        self.master_loaded = False
+        self.master_loading = False
+        self.watchlist = []
+        self.alerts = AlertIndex(wc=lambda token: state.book.wc_of(token))
+        self.views = RankedViews(self.book, self.alerts)
+        self.levels = LevelGenerator()
+        self.activity = ActivityLog()
+        self.is_paused = False
+        self.connected = False
+        self.telegram_bot_token = ""
+        self.telegram_chat_id = ""
+        self.filter_symbol = ""
+        self.filter_min_price = ""
+        self.filter_max_price = ""
+        self.sort_by = "none"
+        self.dirty_tokens = set()
+
+state = AppState()
+
+metrics.registry.gauge("ty_feed_connected", "1 while the websocket feed is connected", lambda: state.live_feed_status == "CONNECTED")
+metrics.registry.gauge("ty_subscribed_tokens", "Tokens subscribed on the feed", lambda: len(state.feed.subscribed) if state.feed else 0)
+metrics.registry.gauge("ty_feed_connections", "Feed sessions open", lambda: state.feed.stats()["connected"] if state.feed else 0)
+metrics.registry.gauge("ty_feed_reconnects", "Feed sessions re-established since start", lambda: state.feed.reconnects if state.feed else 0)
+metrics.registry.gauge("ty_bars_pending", "Completed bars waiting to be written", lambda: state.bars.stats()["pending"])
+metrics.registry.gauge("ty_watchlist_size", "Stocks on the watchlist", lambda: len(state.watchlist))
+metrics.registry.gauge("ty_alerts_armed", "Alerts waiting to trigger", lambda: len(state.alerts))
+metrics.registry.gauge("ty_api_queue_depth", "API jobs queued", lambda: scheduler.stats()["depth"])
+metrics.registry.gauge("ty_tick_pipeline_pending", "Tokens waiting for the evaluator", lambda: state.pipeline.stats()["pending"] if state.pipeline else 0)
+metrics.registry.gauge("ty_telegram_queue_depth", "Alerts waiting for the Telegram dispatcher", lambda: telegram.stats()["queued"])
+metrics.registry.gauge("ty_state_write_queue_depth", "Writes waiting for the state store", lambda: store.pending() if store else 0)
+
+def start_metrics_server():
+    if state.metrics_port: return metrics.serve(state.metrics_port)
+
+def send_telegram_alert(message):
+    # Only enqueues; the dispatcher batches, retries and persists on its own thread
+    telegram.send(state.telegram_bot_token, state.telegram_chat_id, message)
+
+def load_config():
+    # config.json is only read once, to seed the state store on first run
+    if get_store().import_config(CONFIG_FILE): print(f"Migrated {CONFIG_FILE} into {STATE_DB}")
+    data = {"api_key": "", "client_id": "", "telegram_bot_token": "", "telegram_chat_id": "", "segments": ["NSE"]}
+    data.update(get_store().load_settings())
+    data["watchlist"] = get_store().load_watchlist()
+    return data
+
+def save_settings(**values):
+    for key, value in values.items(): get_store().put_setting(key, value)
+
+def load_alerts(page=None):
+    # Alert book is filled off the UI thread; it is not needed to draw the login screen
+    def _background_load():
+        state.alerts.add_many(get_store().load_alerts())
+        rerank_all()
+        print(f"Loaded {len(state.alerts)} alerts")
+        if page:
+            try: page.update()
+            except: pass
+    threading.Thread(target=_background_load, daemon=True).start()
+
+def load_scrips(page=None):
+    if state.master_loading: return
+    state.master_loading = True
+    def _background_load():
+        def _ready():
+            state.search = ScripSearch(state.scrips)
+            state.master_loaded = True
+            print(f"Master Data Ready: {len(state.scrips)} symbols loaded.")
+            if page:
+                try: page.update()
+                except: pass
+        current = None
+        cached = latest_cache(SCRIPMASTER_FILE)
+        if cached:
+            try:
+                print("Loading Scrips from cache...")
+                current = state.scrips = ScripTable(cached)
+                _ready()
+            except Exception as e:
+                print(f"Scrip cache unreadable: {e}")
+        try:
+            print("Revalidating Scrip Master...")
+            table, changed = sync_scrip_master(SCRIPMASTER_FILE, state.segments, current)
+            if changed:
+                state.scrips = table
+                _ready()
+                # Only now nothing points at the old mapping any more
+                if current is not None: current.close()
+                prune_caches(SCRIPMASTER_FILE, table.path)
+        except Exception as e:
+            print(f"Failed to load scrips: {e}")
+    threading.Thread(target=_background_load, daemon=True).start()
+
+def angel_login(api_key, client_id, password, totp_secret):
+    try:
+        # SmartApi pulls in logzero, requests and a public-IP lookup, so it loads on first login
+        import pyotp
+        from SmartApi import SmartConnect
+        smartApi = SmartConnect(api_key=api_key)
+        totp_val = pyotp.TOTP(totp_secret).now()
+        data = smartApi.generateSession(client_id, password, totp_val)
+        if data.get('status'):
+            state.smart_api = smartApi
+            state.jwt_token = data['data']['jwtToken']
+            state.feed_token = data['data']['feedToken']
+            state.refresh_token = data['data']['refreshToken']
+            return True, "Login Successful"
+        else:
+            return False, data.get('message', 'Unknown Login Error')
+    except Exception as e:
+        return False, str(e)
+
+def fetch_bulk_quotes(stocks, mode="OHLC"):
+    if not state.smart_api or not stocks: return 0
+    by_key = {(s.get('exch_seg', 'NSE'), str(s['token'])): s for s in stocks}
+    keys = list(by_key)
+    pending = set(keys)
+    for i in range(0, len(keys), QUOTE_BATCH_SIZE):
+        exchange_tokens = {}
+        for seg, token in keys[i:i + QUOTE_BATCH_SIZE]: exchange_tokens.setdefault(seg, []).append(token)
+        try:
+            scheduler.limiter.acquire("quote")
+            resp = state.smart_api.getMarketData(mode, exchange_tokens)
+            if not resp or not resp.get('status'):
+                print(f"Quote fetch failed: {resp.get('message') if resp else 'empty response'}")
+                continue
+            for q in resp['data'].get('fetched') or []:
+                key = (q.get('exchange'), str(q.get('symbolToken')))
+                stock = by_key.get(key)
+                if stock is None: continue
+                slot = state.book.slot(stock['token'])
+                if mode == "LTP": state.book.set_ltp(slot, float(q['ltp']))
+                else: state.book.set_quote(slot, float(q['ltp']), (q.get('open'), q.get('high'), q.get('low'), q.get('close')), q.get('close'))
+                rerank(slot)
+                state.dirty_tokens.add(stock['token'])
+                pending.discard(key)
+        except Exception as e:
+            print(f"Quote fetch error: {e}")
+    # Anything the bulk endpoint skipped falls back to a single-symbol request
+    for key in pending:
+        stock = by_key[key]
+        try:
+            scheduler.limiter.acquire("ltp")
+            ltp_data = state.smart_api.ltpData(key[0], stock['symbol'], stock['token'])
+            if ltp_data and ltp_data.get('status'):
+                slot = state.book.slot(stock['token'])
+                state.book.set_ltp(slot, float(ltp_data['data']['ltp']))
+                rerank(slot)
+                state.dirty_tokens.add(stock['token'])
+        except Exception as e:
+            print(f"LTP fetch error for {stock['symbol']}: {e}")
+    print(f"Quotes: {len(keys) - len(pending)} bulk, {len(pending)} individual")
+    return len(keys)
+
+def fetch_initial_ltp():
+    if not state.smart_api or not state.watchlist:
+        return
+    scheduler.submit(fetch_bulk_quotes, list(state.watchlist), priority=PRIORITY_USER, key="quotes", endpoint="quote")
+
+def smart_candle_fetch(req):
+    # Transient failures are retried by the scheduler with jittered backoff
+    scheduler.limiter.acquire("candle")
+    try:
+        return state.smart_api.getCandleData(req)
+    except Exception as e:
+        if is_transient(e): raise TransientApiError(str(e)) from e
+        raise
+
+def fetch_historical_data_task(stock_item):
+    if not state.smart_api: return
+    slot = state.book.slot(stock_item['token'])
+    try:
+        state.book.set_loading(slot, True)
+        need_fetch = True
+        if state.book.wc[slot] and stock_item.get('wc_fetched_at'):
+            try:
+                last_fetch = datetime.datetime.fromisoformat(stock_item['wc_fetched_at'])
+                if last_fetch.isocalendar()[:2] == datetime.datetime.now().isocalendar()[:2]:
+                    need_fetch = False
+            except: pass
+        if need_fetch:
+            try:
+                # Only days missing from the local store are requested; the close is read back locally
+                today = datetime.date.today()
+                current_week_monday = today - datetime.timedelta(days=today.weekday())
+                candles = get_candle_store()
+                # Last Friday's day bar, when the bar builder saw that session close, saves the call
+                wc = state.bars.weekly_close(stock_item['token'], today)
+                if wc is None:
+                    candles.sync(stock_item['token'], stock_item.get('exch_seg', 'NSE'), "ONE_DAY",
+                                 current_week_monday - datetime.timedelta(days=WC_LOOKBACK_DAYS),
+                                 current_week_monday - datetime.timedelta(days=1), smart_candle_fetch)
+                    wc = candles.weekly_close(stock_item['token'], today)
+                if wc:
+                    state.book.set_wc(slot, wc)
+                    state.alerts.retarget(stock_item['token'])
+                    rerank(slot)
+                    stock_item['wc_fetched_at'] = datetime.datetime.now().isoformat()
+                    state.dirty_tokens.add(stock_item['token'])
+                    get_store().upsert_stock(state.book.record(stock_item))
+                    print(f"Found Prev Week Close for {stock_item['symbol']}: {wc}")
+                else: print(f"No prev week candle found for {stock_item['symbol']}")
+            except TransientApiError: raise
+            except Exception as e:
+                print(f"Candle Error {stock_item['symbol']}: {e}")
+    except TransientApiError: raise
+    except Exception as e:
+        print(f"Task Failed for {stock_item['symbol']}: {e}")
+    finally:
+        state.book.set_loading(slot, False)
+
+def get_store():
+    # The state database is only created once something reads or writes it, not on import
+    global store
+    if store is None:
+        with _store_lock:
+            if store is None: store = StateStore(STATE_DB)
+    return store
+
+def get_candle_store():
+    if state.candles is None:
+        from candle_store import CandleStore, CANDLE_DB
+        state.candles = CandleStore(CANDLE_DB)
+    return state.candles
+
+def sync_candles(stock, interval, start, end):
+    get_candle_store().sync(stock['token'], stock.get('exch_seg', 'NSE'), interval, start, end, smart_candle_fetch)
+
+def warm_up_candle_store(stocks, days=CANDLE_WARMUP_DAYS, interval="ONE_DAY"):
+    # Background fill; the scheduler's worker pool and candle bucket bound the concurrency
+    end = datetime.date.today() - datetime.timedelta(days=1)
+    start = end - datetime.timedelta(days=days)
+    for stock in stocks:
+        scheduler.submit(sync_candles, stock, interval, start, end, priority=PRIORITY_BACKGROUND,
+                         key=("warmup", interval, stock['token']), endpoint="candle")
+
+def refresh_all_data(page):
+    scheduler.submit(fetch_bulk_quotes, list(state.watchlist), priority=PRIORITY_NORMAL, key="quotes", endpoint="quote", page=page)
+    for stock in state.watchlist:
+        state.book.set_loading(state.book.slot(stock['token']), True)
+        scheduler.submit(fetch_historical_data_task, stock, priority=PRIORITY_BULK, key=("candles", stock['token']), endpoint="candle", page=page)
+    if page:
+        try: page.update()
+        except: pass
+
+def jobs_status():
+    s = scheduler.stats()
+    if not (s['depth'] or s['running'] or s['backing_off']): return ""
+    return f"Jobs: {s['depth']} queued, {s['running']} running · {s['per_min']}/min"
+
+def add_stock(item, page=None):
+    if any(s['token'] == item['token'] for s in state.watchlist): return None
+    new_stock = state.book.add({"symbol": item['symbol'], "token": item['token'], "exch_seg": item['exch_seg'], "loading": True})
+    state.watchlist.append(new_stock)
+    get_store().upsert_stock(state.book.record(new_stock))
+    scheduler.submit(fetch_bulk_quotes, [new_stock], priority=PRIORITY_USER, endpoint="quote", page=page)
+    scheduler.submit(fetch_historical_data_task, new_stock, priority=PRIORITY_USER, key=("candles", new_stock['token']), endpoint="candle", page=page)
+    if state.feed: state.feed.add(new_stock['token'], EXCHANGE_TYPES.get(new_stock['exch_seg'], 1))
+    return new_stock
+
+def remove_stock(token):
+    state.watchlist = [s for s in state.watchlist if s['token'] != token]
+    get_store().delete_stock(token)
+    slot = state.book.slot_of(token)
+    if slot is not None and state.views: state.views.discard(slot)
+    state.book.remove(token)
+    state.levels.forget(token)
+    if state.feed: state.feed.remove(token)
+
+def feed_tokens(stocks):
+    return [(str(s['token']), EXCHANGE_TYPES.get(s.get('exch_seg', 'NSE'), 1)) for s in stocks]
+
+def backfill_quotes(tokens):
+    # Quotes for tokens whose session dropped, pushed through the pipeline so alerts crossed
+    # during the gap are evaluated on the evaluator thread like any tick
+    wanted = set(tokens)
+    stocks = [s for s in state.watchlist if str(s['token']) in wanted]
+    fetch_bulk_quotes(stocks)
+    if state.pipeline:
+        for stock in stocks:
+            slot = state.book.slot_of(stock['token'])
+            if slot is not None and state.book.ltp[slot]: state.pipeline.push(ltp_tick(slot, state.book.ltp[slot]))
+
+def repair_bars(stock, since):
+    # 1-minute candles for the stretch a dropped session missed, merged over the local bars;
+    # the 5m and 15m bars they cover are rebuilt from them
+    if not state.smart_api: return
+    now = datetime.datetime.now(IST)
+    start = datetime.datetime.fromtimestamp(since, IST).replace(second=0, microsecond=0)
+    if (now - start).total_seconds() < 120: return
+    resp = smart_candle_fetch({"exchange": stock.get('exch_seg', 'NSE'), "symboltoken": str(stock['token']), "interval": "ONE_MINUTE",
+                               "fromdate": start.strftime("%Y-%m-%d %H:%M"), "todate": now.strftime("%Y-%m-%d %H:%M")})
+    if resp and resp.get('status'): state.bars.merge(stock['token'], "1m", resp.get('data') or [])
+
+def stop_websocket():
+    if state.feed:
+        state.feed.stop()
+        state.feed = None
+    if state.pipeline:
+        state.pipeline.stop()
+        state.pipeline = None
+    state.live_feed_status = "DISCONNECTED"
+
+def rerank(slot):
+    if state.views: state.views.update(slot)
+
+def rerank_all():
+    if state.views: state.views.rebuild()
+
+def make_tick_evaluator(page=None):
+    # Pipeline handler, run on the evaluator thread with the newest tick per token. Tick
+    # token ids are price book slots; ticks for tokens no longer on the book are dropped.
+    # Bars are folded here too, off the websocket reader: a tick conflated away under load
+    # only costs its bar a high/low it touched between evaluator batches.
+    book, bars = state.book, state.bars
+    def evaluate(ticks):
+        started = time.perf_counter()
+        slots = []
+        for tick in ticks:
+            slot = tick.token_id
+            if not book.active(slot): continue
+            if tick.mode >= MODE_QUOTE:
+                book.update_tick(slot, tick.ltp, tick.volume, tick.open, tick.high, tick.low, tick.close, tick.last_trade_ts)
+            else: book.set_ltp(slot, tick.ltp)
+            bars.on_tick(tick)
+            state.dirty_tokens.add(book.stocks[slot]['token'])
+            slots.append(slot)
+        # The whole batch goes through the rule book at once, before ranking sees the
+        # alerts it used up
+        check_alerts_batch(slots, page)
+        for slot in slots: rerank(slot)
+        metrics.EVALUATE.since(started)
+    return evaluate
+
+def start_websocket(page):
+    if not all([state.jwt_token, state.api_key, state.client_id, state.feed_token]):
+        print("Websocket: Missing tokens")
+        return
+    from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+    from subscriptions import SubscriptionManager
+    stop_websocket()
+    state.pipeline = TickPipeline(state.decoder, make_tick_evaluator(page)).start()
+    def on_frame(message):
+        try:
+            received = time.perf_counter()
+            if state.recorder: state.recorder.write(message)
+            state.pipeline.push_frame(message, received)
+            metrics.FRAME_DECODE.since(received)
+            metrics.TICKS.inc()
+            metrics.TICK_RATE.mark()
+        except Exception as e:
+            print(f"Tick decode error: {e}")
+    def on_status(status):
+        state.live_feed_status = status
+    def on_reconnect(tokens):
+        scheduler.submit(backfill_quotes, tokens, priority=PRIORITY_USER, endpoint="quote", page=page)
+        wanted = set(tokens)
+        for stock in [s for s in state.watchlist if str(s['token']) in wanted]:
+            since = state.bars.last_tick(stock['token'])
+            if since: scheduler.submit(repair_bars, stock, since, priority=PRIORITY_BACKGROUND, key=("bars", stock['token']), endpoint="candle")
+    def connect():
+        # The manager owns reconnects, so the library's own retry loop is turned off
+        return SmartWebSocketV2(state.jwt_token, state.api_key, state.client_id, state.feed_token, max_retry_attempt=0)
+    state.feed = SubscriptionManager(connect, on_frame, on_status, on_reconnect)
+    state.feed.set_desired(feed_tokens(state.watchlist))
+    print("Websocket: Connecting...")
+    state.feed.start()
+
+def check_alerts(slot, page):
+    check_alerts_batch((slot,), page)
+
+def check_alerts_batch(slots, page):
+    # Fires the alerts these book slots' current prices trigger
+    if state.is_paused: return
+    book = state.book
+    by_token = {str(book.stocks[slot]["token"]): slot for slot in slots if book.stocks[slot] is not None}
+    if not by_token: return
+    for token, alert in state.alerts.pop_triggered_batch([(token, book.ltp[slot]) for token, slot in by_token.items()]):
+        slot = by_token[token]
+        stock, ltp = book.stocks[slot], book.ltp[slot]
+        if alert['condition'] == "RULE":
+            msg, detail = f"{alert['symbol']}: {alert['expr']}", f"Rule: {alert['expr']}"
+        else:
+            msg, detail = f"{stock['symbol']} hit {alert['price']} ({alert['condition']})", f"Target: ₹{alert['price']}\nCondition: {alert['condition']}"
+        metrics.ALERTS_FIRED.inc()
+        get_store().record_trigger(alert, ltp)
+        state.activity.add(stock['symbol'], msg)
+        for listener in alert_listeners: listener(stock, alert)
+        telegram_msg = f"🔔 <b>ALERT!</b>\n\nSymbol: <b>{stock['symbol']}</b>\nPrice: ₹{ltp:.2f}\n{detail}\nTime: {datetime.datetime.now().strftime('%H:%M:%S')}"
+        send_telegram_alert(telegram_msg)
+
+def generate_alerts(stocks=None, changed_only=True):
+    # 3-6-9 alerts for the watchlist (or these stocks), skipping levels already armed on the
+    # same side. changed_only skips stocks whose weekly close and price band are the same
+    # as on the previous run, so levels deleted since then are not put back.
+    # One run at a time: two overlapping runs would both find a level missing and add it twice
+    with _levels_lock:
+        tokens = [str(s['token']) for s in (state.watchlist if stocks is None else stocks)]
+        batch, new = uuid.uuid4().hex[:12], []
+        for token, above, below in state.levels.levels(state.book, tokens, changed_only):
+            stock = state.book.stocks[state.book.slot_of(token)]
+            for condition, prices in (("ABOVE", above), ("BELOW", below)):
+                for price in prices:
+                    if state.alerts.contains(token, price, condition): continue
+                    new.append({"id": f"{batch}-{len(new)}", "symbol": stock['symbol'], "token": stock['token'], "price": price, "condition": condition})
+        if not new: return 0
+        state.alerts.add_many(new)
+        get_store().add_alerts(new)
+        for token in {a['token'] for a in new}: rerank(state.book.slot(token))
+        state.activity.add("AUTO", f"Generated {len(new)} alerts")
+        return len(new)
+
+def generate_alerts_background(page=None, done=None):
+    # Same as generate_alerts, on a worker thread so a large watchlist doesn't block the UI;
+    # repeated clicks queue behind the run in progress and only add what it did not
+    def _generate():
+        count = generate_alerts()
+        print(f"Generated {count} alerts")
+        if done: done(count)
+        elif page:
+            try: page.update()
+            except: pass
+    threading.Thread(target=_generate, daemon=True).start()
+
+def add_rule(expr, name=None):
+    # Expression alert (see rules.parse), e.g. "RELIANCE-EQ cross_up 2950 AND TCS-EQ pct_up 0.5".
+    # Symbols resolve against the watchlist; raises ValueError for a rule that won't parse.
+    by_symbol = {s['symbol'].upper(): str(s['token']) for s in state.watchlist}
+    tokens = {}
+    def resolve(symbol):
+        token = by_symbol.get(symbol.upper())
+        if token: tokens[symbol] = token
+        return token
+    tree, leaves, options = parse(expr, resolve)
+    token, op, value = leaves[0]
+    stock = state.book.stocks[state.book.slot(token)]
+    symbol = name or (stock['symbol'] if stock else token)
+    alert = {"id": str(uuid.uuid4()), "symbol": symbol, "token": token, "price": value, "condition": "RULE", "expr": expr, "tokens": tokens, "repeat": not options["once"]}
+    state.alerts.add(alert)
+    get_store().add_alert(alert)
+    rerank(state.book.slot(token))
+    return alert
+
+def delete_alert(uid):
+    alert = state.alerts.remove(uid)
+    if alert: rerank(state.book.slot(alert['token']))
+    get_store().delete_alert(uid)
+
+def apply_config(config):
+    state.api_key = config.get("api_key", "")
+    state.client_id = config.get("client_id", "")
+    state.watchlist = state.book.load(config.get("watchlist", []))
+    rerank_all()
+    state.levels.configure(config.get("level_patterns", DEFAULT_PATTERNS), config.get("level_steps", DEFAULT_STEPS))
+    state.segments = config.get("segments", ["NSE"])
+    state.telegram_bot_token = config.get("telegram_bot_token", "")
+    state.telegram_chat_id = config.get("telegram_chat_id", "")
+    state.metrics_port = config.get("metrics_port", metrics.METRICS_PORT)
+
+def reload_state(page=None):
+    # Re-reads settings, watchlist and alerts from the store (e.g. after another process
+    # edited them); prices of stocks still on the list stay on the price book
+    get_store().flush()
+    apply_config(load_config())
+    state.alerts.clear()
+    state.alerts.add_many(get_store().load_alerts())
+    rerank_all()
+    if state.feed:
+        # Same sessions; only the changed tokens are re-sent
+        state.feed.set_desired(feed_tokens(state.watchlist))
+    print(f"Reloaded: {len(state.watchlist)} stocks, {len(state.alerts)} alerts")
+
+def shutdown():
+    stop_websocket()
+    scheduler.stop()
+    telegram.flush()
+    telegram.stop()
+    state.bars.stop()
+    if store: store.flush()
+    state.activity.close()
+    if state.recorder: state.recorder.close()
+
+def generate_369_levels(ltp, weekly_close):
+    above, below = state.levels.for_price(ltp, weekly_close)
+    return [{"price": p, "type": "ABOVE"} for p in above] + [{"price": p, "type": "BELOW"} for p in below]
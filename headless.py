@@ -0,0 +1,92 @@
+# Trade Yantra alert engine without the Flet UI: login, live feed, alert checks and Telegram
+# delivery as a long-lived process, sharing the app's state store. SIGINT/SIGTERM shut down
+# cleanly; SIGHUP reloads settings, watchlist and alerts from the store.
+#
+#   TY_PASSWORD=... TY_TOTP_SECRET=... python headless.py --warm-up --generate-levels
+import argparse
+import os
+import signal
+import threading
+import time
+
+import engine
+from engine import state
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Run the Trade Yantra alert engine without a UI.")
+    p.add_argument("--api-key", help="SmartAPI key (default: saved setting)")
+    p.add_argument("--client-id", help="Angel One client ID (default: saved setting)")
+    p.add_argument("--password", default=os.environ.get("TY_PASSWORD"), help="login PIN (default: $TY_PASSWORD)")
+    p.add_argument("--totp-secret", default=os.environ.get("TY_TOTP_SECRET"), help="TOTP secret (default: $TY_TOTP_SECRET)")
+    p.add_argument("--warm-up", action="store_true", help="fill the local candle store in the background")
+    p.add_argument("--generate-levels", action="store_true", help="create 3-6-9 alerts once weekly closes are known")
+    p.add_argument("--record", metavar="PATH", help="append raw feed frames to a tick log for later replay")
+    p.add_argument("--metrics-port", type=int, help="Prometheus endpoint port on 127.0.0.1, 0 to disable (default: saved setting or 9108)")
+    p.add_argument("--status-every", type=float, default=60.0, help="seconds between status lines (0 to disable)")
+    return p.parse_args(argv)
+
+
+def status_line():
+    p = state.pipeline.stats() if state.pipeline else {}
+    t = engine.telegram.stats()
+    return (f"feed={state.live_feed_status} stocks={len(state.watchlist)} alerts={len(state.alerts)} "
+            f"ticks={p.get('received', 0)} lag_max={p.get('lag_max_ms', 0.0):.1f}ms "
+            f"telegram_sent={t['sent_alerts']} queued={t['queued']}")
+
+
+def run(args):
+    stop = threading.Event()
+    reload = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    if hasattr(signal, "SIGHUP"): signal.signal(signal.SIGHUP, lambda *_: reload.set())
+
+    engine.apply_config(engine.load_config())
+    state.alerts.add_many(engine.get_store().load_alerts())
+    state.api_key = args.api_key or state.api_key
+    state.client_id = args.client_id or state.client_id
+    if args.metrics_port is not None: state.metrics_port = args.metrics_port
+    engine.start_metrics_server()
+    if not (state.api_key and state.client_id and args.password and args.totp_secret):
+        print("Missing credentials: need API key, client ID, password and TOTP secret")
+        return 2
+
+    started = time.monotonic()
+    success, msg = engine.angel_login(state.api_key, state.client_id, args.password, args.totp_secret)
+    if not success:
+        print(f"Login failed: {msg}")
+        return 1
+    state.connected = True
+    if args.record:
+        from tick_recorder import TickRecorder
+        state.recorder = TickRecorder(args.record)
+    engine.start_websocket(None)
+    engine.refresh_all_data(None)
+    if args.warm_up: engine.warm_up_candle_store(list(state.watchlist))
+    print(f"Engine running in {time.monotonic() - started:.2f}s: {len(state.watchlist)} stocks, {len(state.alerts)} alerts")
+
+    if args.generate_levels:
+        def _generate():
+            # Levels need the weekly closes and prices the refresh jobs are fetching
+            while not stop.is_set() and state.book.any_loading(): time.sleep(0.5)
+            print(f"Generated {engine.generate_alerts()} alerts")
+        threading.Thread(target=_generate, daemon=True).start()
+
+    last_status = time.monotonic()
+    while not stop.is_set():
+        stop.wait(1.0)
+        if reload.is_set():
+            reload.clear()
+            engine.reload_state()
+        if args.status_every and time.monotonic() - last_status >= args.status_every:
+            last_status = time.monotonic()
+            print(status_line())
+
+    print("Shutting down...")
+    engine.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run(parse_args()))
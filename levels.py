@@ -0,0 +1,68 @@
+import bisect
+import itertools
+from array import array
+
+DEFAULT_STEPS = 10
+# (weekly close above which it applies, step pattern); the first match wins
+DEFAULT_PATTERNS = ((3333, (30, 60, 90)), (0, (3, 6, 9)))
+
+
+class LevelGenerator:
+    # 3-6-9 style levels for a whole watchlist. Each pattern's cumulative offsets from the
+    # weekly close are built once per configuration, so a stock's levels are wc + offsets
+    # past its ltp: one bisect per side and a slice. The (wc, pattern, band) behind each
+    # token's last levels is kept, and changed_only runs skip tokens where that is the same,
+    # i.e. whose weekly close is unchanged and whose ltp has not crossed a level since.
+    def __init__(self, patterns=DEFAULT_PATTERNS, steps=DEFAULT_STEPS):
+        self.configure(patterns, steps)
+
+    def configure(self, patterns=DEFAULT_PATTERNS, steps=DEFAULT_STEPS):
+        self.patterns = sorted(((float(floor), tuple(pattern)) for floor, pattern in patterns), reverse=True)
+        self.steps = int(steps)
+        self._offsets = {pattern: array("d", itertools.accumulate(pattern[i % len(pattern)] for i in range(self.steps)))
+                         for _, pattern in self.patterns}
+        self._seen = {}
+
+    def pattern(self, wc):
+        for floor, pattern in self.patterns:
+            if wc > floor: return pattern
+        return self.patterns[-1][1]
+
+    def _band(self, ltp, wc):
+        pattern = self.pattern(wc)
+        offsets = self._offsets[pattern]
+        # Offsets past ltp on each side: wc + o > ltp and wc - o < ltp, judged on the rounded
+        # level so a price sitting exactly on one is not given it again
+        up, down, n = bisect.bisect_right(offsets, ltp - wc), bisect.bisect_right(offsets, wc - ltp), len(offsets)
+        while up < n and round(wc + offsets[up], 2) <= ltp: up += 1
+        while up and round(wc + offsets[up - 1], 2) > ltp: up -= 1
+        while down < n and round(wc - offsets[down], 2) >= ltp: down += 1
+        while down and round(wc - offsets[down - 1], 2) < ltp: down -= 1
+        return pattern, offsets, up, down
+
+    def for_price(self, ltp, wc):
+        # (above, below) level prices for one stock
+        if wc <= 0: return [], []
+        pattern, offsets, up, down = self._band(ltp, wc)
+        return [round(wc + o, 2) for o in offsets[up:]], [round(wc - o, 2) for o in offsets[down:]]
+
+    def levels(self, book, tokens, changed_only=False):
+        # (token, above, below) for every token on the book with a weekly close, reading
+        # ltp and wc straight from the price book's arrays
+        out = []
+        ltp, wc = book.ltp, book.wc
+        for token in tokens:
+            slot = book.slot_of(token)
+            if slot is None or wc[slot] <= 0: continue
+            pattern, offsets, up, down = self._band(ltp[slot], wc[slot])
+            key = (wc[slot], pattern, up, down)
+            if changed_only and self._seen.get(token) == key: continue
+            self._seen[token] = key
+            base = wc[slot]
+            out.append((token, [round(base + o, 2) for o in offsets[up:]], [round(base - o, 2) for o in offsets[down:]]))
+        return out
+
+    def forget(self, token=None):
+        # The next changed_only run regenerates this token (or every token)
+        if token is None: self._seen.clear()
+        else: self._seen.pop(str(token), None)
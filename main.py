@@ -1,322 +1,20 @@
-import websocket  
 import flet as ft
-import requests
-import pyotp
 import threading
 import time
-import uuid
 import datetime
-import json
-import os
-import queue
-import struct
-from SmartApi import SmartConnect
-from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+from engine import (state, load_config, apply_config, save_settings, load_alerts, load_scrips, angel_login,
+                    fetch_initial_ltp, warm_up_candle_store, refresh_all_data, jobs_status, start_websocket,
+                    send_telegram_alert, generate_alerts_background, add_stock as engine_add_stock, remove_stock as engine_remove_stock,
+                    delete_alert as engine_delete_alert, add_rule as engine_add_rule, start_metrics_server)
+import metrics
+from watchlist_view import WatchlistRows
 
-CONFIG_FILE = "config.json"
-SCRIPMASTER_FILE = "scripmaster.json"
-
-api_job_queue = queue.Queue()
-
-def api_worker_thread():
-    while True:
-        try:
-            task = api_job_queue.get()
-            if task is None: break
-            func, args, page_ref = task
-            func(*args)
-            if page_ref:
-                try: page_ref.update()
-                except: pass
-        except Exception as e:
-            print(f"Worker Error: {e}")
-        finally:
-            if 'task' in locals() and task is not None:
-                api_job_queue.task_done()
-            time.sleep(2.0)
-
-threading.Thread(target=api_worker_thread, daemon=True).start()
-
-class AppState:
-    def __init__(self):
-        self.api_key = ""
-        self.client_id = ""
-        self.jwt_token = None
-        self.feed_token = None
-        self.refresh_token = None
-        self.smart_api = None
-        self.sws = None
-        self.current_view = "watchlist"
-        self.scrips = []
-        self.live_feed_status = "DISCONNECTED"
-        self.master_loaded = False
-        self.watchlist = []
-        self.alerts = []
-        self.logs = []
-        self.is_paused = False
-        self.connected = False
-        self.telegram_bot_token = ""
-        self.telegram_chat_id = ""
-        self.filter_symbol = ""
-        self.filter_min_price = ""
-        self.filter_max_price = ""
-        self.sort_by = "none"
-
-state = AppState()
-
-def send_telegram_alert(message):
-    if not state.telegram_bot_token or not state.telegram_chat_id:
-        return
-    def _send():
-        try:
-            url = f"https://api.telegram.org/bot{state.telegram_bot_token}/sendMessage"
-            data = {"chat_id": state.telegram_chat_id, "text": message, "parse_mode": "HTML"}
-            requests.post(url, json=data, timeout=5)
-        except Exception as e:
-            print(f"Telegram error: {e}")
-    threading.Thread(target=_send, daemon=True).start()
-
-def load_config():
-    default = {"api_key": "", "client_id": "", "watchlist": [], "telegram_bot_token": "", "telegram_chat_id": ""}
-    if not os.path.exists(CONFIG_FILE): return default
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            data = json.load(f)
-            if "watchlist" not in data: data["watchlist"] = []
-            if "telegram_bot_token" not in data: data["telegram_bot_token"] = ""
-            if "telegram_chat_id" not in data: data["telegram_chat_id"] = ""
-            return data
-    except: return default
-
-def save_config():
-    clean_watchlist = []
-    for stock in state.watchlist:
-        clean_stock = {k: v for k, v in stock.items() if not k.endswith('_control')}
-        clean_watchlist.append(clean_stock)
-    data = {
-        "api_key": state.api_key,
-        "client_id": state.client_id,
-        "watchlist": clean_watchlist,
-        "telegram_bot_token": state.telegram_bot_token,
-        "telegram_chat_id": state.telegram_chat_id
-    }
-    try:
-        with open(CONFIG_FILE, 'w') as f: json.dump(data, f, indent=4)
-    except Exception as e:
-        print(f"Error saving config: {e}")
-
-def load_scrips(page=None):
-    def _background_load():
-        try:
-            if not os.path.exists(SCRIPMASTER_FILE) or (time.time() - os.path.getmtime(SCRIPMASTER_FILE) > 86400):
-                print("Downloading Scrip Master...")
-                r = requests.get("https://margincalculator.angelone.in/OpenAPI_File/files/OpenAPIScripMaster.json")
-                data = r.json()
-                state.scrips = [s for s in data if s.get('exch_seg') == 'NSE' and '-EQ' in s.get('symbol', '')]
-                with open(SCRIPMASTER_FILE, 'w') as f: json.dump(state.scrips, f)
-            else:
-                print("Loading Scrips from cache...")
-                with open(SCRIPMASTER_FILE, 'r') as f: state.scrips = json.load(f)
-            state.master_loaded = True
-            print(f"Master Data Ready: {len(state.scrips)} symbols loaded.")
-            if page:
-                try: page.update()
-                except: pass
-        except Exception as e:
-            print(f"Failed to load scrips: {e}")
-    threading.Thread(target=_background_load, daemon=True).start()
-
-def angel_login(api_key, client_id, password, totp_secret):
-    try:
-        smartApi = SmartConnect(api_key=api_key)
-        totp_val = pyotp.TOTP(totp_secret).now()
-        data = smartApi.generateSession(client_id, password, totp_val)
-        if data.get('status'):
-            state.smart_api = smartApi
-            state.jwt_token = data['data']['jwtToken']
-            state.feed_token = data['data']['feedToken']
-            state.refresh_token = data['data']['refreshToken']
-            return True, "Login Successful"
-        else:
-            return False, data.get('message', 'Unknown Login Error')
-    except Exception as e:
-        return False, str(e)
-
-def fetch_initial_ltp():
-    if not state.smart_api or not state.watchlist:
-        return
-    def _fetch():
-        for stock in state.watchlist:
-            try:
-                ltp_data = state.smart_api.ltpData("NSE", stock['symbol'], stock['token'])
-                if ltp_data and ltp_data.get('status'):
-                    stock['ltp'] = ltp_data['data']['ltp']
-                    print(f"Fetched LTP for {stock['symbol']}: ₹{stock['ltp']:.2f}")
-                time.sleep(0.3)  # Prevent rate limit
-            except Exception as e:
-                print(f"LTP fetch error for {stock['symbol']}: {e}")
-                time.sleep(0.5)  # Longer delay on error
-    threading.Thread(target=_fetch, daemon=True).start()
-
-def smart_candle_fetch(req):
-    retries = 3
-    for i in range(retries):
-        try:
-            return state.smart_api.getCandleData(req)
-        except Exception as e:
-            err_msg = str(e)
-            if "Couldn't parse" in err_msg or "timed out" in err_msg:
-                time.sleep(2 * (i + 1))
-                continue
-            raise e
-    return None
-
-def fetch_historical_data_task(stock_item):
-    if not state.smart_api: return
-    try:
-        stock_item['loading'] = True
-        try:
-            ltp_data = state.smart_api.ltpData("NSE", stock_item['symbol'], stock_item['token'])
-            if ltp_data and ltp_data.get('status'):
-                stock_item['ltp'] = ltp_data['data']['ltp']
-        except: pass
-        need_fetch = True
-        if stock_item.get('wc') and stock_item.get('wc_fetched_at'):
-            try:
-                last_fetch = datetime.datetime.fromisoformat(stock_item['wc_fetched_at'])
-                if last_fetch.isocalendar()[:2] == datetime.datetime.now().isocalendar()[:2]:
-                    need_fetch = False
-            except: pass
-        if need_fetch:
-            try:
-                to_date_str = datetime.datetime.now().strftime('%Y-%m-%d 15:30')
-                from_date_str = (datetime.datetime.now() - datetime.timedelta(days=45)).strftime('%Y-%m-%d 09:15')
-                historic_req = {
-                    "exchange": "NSE",
-                    "symboltoken": stock_item['token'],
-                    "interval": "ONE_DAY",
-                    "fromdate": from_date_str,
-                    "todate": to_date_str
-                }
-                hist_data = smart_candle_fetch(historic_req)
-                if hist_data and hist_data.get('status') and hist_data.get('data'):
-                    candles = hist_data['data']
-                    today = datetime.date.today()
-                    current_week_monday = today - datetime.timedelta(days=today.weekday())
-                    found = False
-                    for c in reversed(candles):
-                        try:
-                            c_date_str = c[0].split('T')[0]
-                            c_date = datetime.datetime.strptime(c_date_str, "%Y-%m-%d").date()
-                            if c_date < current_week_monday:
-                                stock_item['wc'] = c[4]
-                                stock_item['wc_fetched_at'] = datetime.datetime.now().isoformat()
-                                found = True
-                                print(f"Found Prev Week Close for {stock_item['symbol']}: {stock_item['wc']}")
-                                break
-                        except: continue
-                    if not found: print(f"No prev week candle found for {stock_item['symbol']}")
-            except Exception as e:
-                print(f"Candle Error {stock_item['symbol']}: {e}")
-    except Exception as e:
-        print(f"Task Failed for {stock_item['symbol']}: {e}")
-    finally:
-        stock_item['loading'] = False
-
-def refresh_all_data(page):
-    for stock in state.watchlist:
-        stock['loading'] = True
-        api_job_queue.put((fetch_historical_data_task, [stock], page))
-    try: page.update()
-    except: pass
-
-def start_websocket(page):
-    if not all([state.jwt_token, state.api_key, state.client_id, state.feed_token]):
-        print("Websocket: Missing tokens")
-        return
-    try:
-        state.sws = SmartWebSocketV2(state.jwt_token, state.api_key, state.client_id, state.feed_token)
-    except Exception as e:
-        print(f"Websocket Init Error: {e}")
-        return
-    token_map = {str(s['token']): s for s in state.watchlist}
-    def on_data(wsapp, message):
-        try:
-            if isinstance(message, (list, dict)):
-                if isinstance(message, dict): message = [message]
-                for tick in message:
-                    token = tick.get('token') or tick.get('tk')
-                    raw_price = tick.get('last_traded_price') or tick.get('ltp') or tick.get('c')
-                    if token and raw_price is not None:
-                        stock = token_map.get(str(token))
-                        if stock:
-                            stock['ltp'] = float(raw_price) / 100.0 if 'last_traded_price' in tick else float(raw_price)
-                            check_alerts(stock, page)
-            elif isinstance(message, bytes) and len(message) > 50:
-                try:
-                    token_bytes = message[2:27]
-                    token = token_bytes.replace(b'\x00', b'').decode('utf-8')
-                    ltp_bytes = message[43:51]
-                    ltp_paise = struct.unpack('<q', ltp_bytes)[0]
-                    real_price = ltp_paise / 100.0
-                    stock = token_map.get(str(token))
-                    if stock:
-                        stock['ltp'] = real_price
-                        check_alerts(stock, page)
-                except: pass
-        except: pass
-    def on_open(wsapp):
-        print("Websocket: Connected")
-        state.live_feed_status = "CONNECTED"
-        time.sleep(1)
-        token_map.update({str(s['token']): s for s in state.watchlist})
-        token_list_str = [str(item['token']) for item in state.watchlist]
-        if token_list_str:
-            try:
-                state.sws.subscribe("watchlist", 3, [{"exchangeType": 1, "tokens": token_list_str}])
-                print(f"Websocket: Subscribed to {len(token_list_str)} tokens")
-            except Exception as e:
-                print(f"Subscribe error: {e}")
-    def on_close(wsapp, code, reason):
-        print(f"Websocket: Closed {code} {reason}")
-        state.live_feed_status = "DISCONNECTED"
-    def on_error(wsapp, error):
-        print(f"Websocket Error: {error}")
-        state.live_feed_status = "ERROR"
-    state.sws.on_data = on_data
-    state.sws.on_open = on_open
-    state.sws.on_close = on_close
-    state.sws.on_error = on_error
-    print("Websocket: Connecting...")
-    threading.Thread(target=state.sws.connect, daemon=True).start()
-
-def check_alerts(stock, page):
-    if state.is_paused: return
-    for alert in list(state.alerts):
-        if str(alert["token"]) == str(stock["token"]):
-            triggered = False
-            if alert["condition"] == "ABOVE" and stock["ltp"] >= alert["price"]: triggered = True
-            elif alert["condition"] == "BELOW" and stock["ltp"] <= alert["price"]: triggered = True
-            if triggered:
-                msg = f"{stock['symbol']} hit {alert['price']} ({alert['condition']})"
-                state.logs.insert(0, {"time": datetime.datetime.now().strftime("%H:%M:%S"), "symbol": stock['symbol'], "msg": msg})
-                telegram_msg = f"🔔 <b>ALERT!</b>\n\nSymbol: <b>{stock['symbol']}</b>\nPrice: ₹{stock['ltp']:.2f}\nTarget: ₹{alert['price']}\nCondition: {alert['condition']}\nTime: {datetime.datetime.now().strftime('%H:%M:%S')}"
-                send_telegram_alert(telegram_msg)
-                if alert in state.alerts: state.alerts.remove(alert)
-
-def generate_369_levels(ltp, weekly_close):
-    if weekly_close <= 0: return []
-    levels = []
-    pattern = [30, 60, 90] if weekly_close > 3333 else [3, 6, 9]
-    curr = weekly_close
-    for i in range(10):
-        curr += pattern[i % 3]
-        if curr > ltp: levels.append({"price": round(curr, 2), "type": "ABOVE"})
-    curr = weekly_close
-    for i in range(10):
-        curr -= pattern[i % 3]
-        if curr < ltp: levels.append({"price": round(curr, 2), "type": "BELOW"})
-    return levels
+UI_MAX_FPS = 5
+LOG_PAGE_SIZE = 50
+LOG_RANGES = {"all": None, "15m": 900, "1h": 3600, "today": "today"}
+# Sort options served by the engine's ranked views: (view, descending)
+RANKED_SORTS = {"price_low": ("price", False), "price_high": ("price", True), "pct_high": ("pct_wc", True),
+                "pct_low": ("pct_wc", False), "alert_near": ("alert_distance", False)}
 
 def main(page: ft.Page):
     page.title = "Trade Yantra"
@@ -324,13 +22,7 @@ def main(page: ft.Page):
     page.padding = 0
     page.window_width = 400
     page.window_height = 800
-    config = load_config()
-    state.api_key = config.get("api_key", "")
-    state.client_id = config.get("client_id", "")
-    state.watchlist = config.get("watchlist", [])
-    state.telegram_bot_token = config.get("telegram_bot_token", "")
-    state.telegram_chat_id = config.get("telegram_chat_id", "")
-    load_scrips(page)
+    apply_config(load_config())
     
     api_input = ft.TextField(label="API Key", password=True, value=state.api_key)
     client_input = ft.TextField(label="Client ID", value=state.client_id)
@@ -344,7 +36,7 @@ def main(page: ft.Page):
     def test_telegram(e):
         state.telegram_bot_token = telegram_token_input.value
         state.telegram_chat_id = telegram_chat_input.value
-        save_config()
+        save_settings(telegram_bot_token=state.telegram_bot_token, telegram_chat_id=state.telegram_chat_id)
         send_telegram_alert("🔔 <b>Test Alert</b>\n\nTelegram is working!")
         login_status.value = "Test sent! Check Telegram."
         login_status.color = "green"
@@ -353,14 +45,17 @@ def main(page: ft.Page):
     def handle_login(e):
         login_progress.visible = True
         page.update()
+        # Scrip master is only needed by search in the app view; load it while login runs
+        load_scrips(page)
         success, msg = angel_login(api_input.value, client_input.value, pass_input.value, totp_input.value)
         if success:
             state.api_key = api_input.value
             state.client_id = client_input.value
-            save_config()
+            save_settings(api_key=state.api_key, client_id=state.client_id)
             state.connected = True
             start_websocket(page)
             fetch_initial_ltp()
+            warm_up_candle_store(list(state.watchlist))
             page.go("/app")
         else:
             login_status.value = f"Error: {msg}"
@@ -383,48 +78,35 @@ def main(page: ft.Page):
     ], alignment="center", horizontal_alignment="center", spacing=15)
     
     body_container = ft.Container(expand=True, padding=10)
+    jobs_text = ft.Text("", size=10, color="#A0AEC0")
+    feed_text = ft.Text("", size=12, weight="bold")
+    search_btn = ft.IconButton("search", on_click=lambda e: open_search_bs(e), disabled=True, icon_color="#667EEA")
+    rows = WatchlistRows(on_remove=lambda t: remove_stock(t), book=state.book)
+    watchlist_view = None
+    logs_view = None
+    debug_list = ft.ListView(expand=True, spacing=2)
+    debug_painted = 0.0
+    flush_started = False
+    rank_sub = None
+    order_dirty = False
     
-    def get_watchlist_view():
-        controls = []
-        status_color = "#48BB78" if state.live_feed_status == "CONNECTED" else "#F56565"
-        controls.append(ft.Row([
-            ft.Text(f"Feed: {state.live_feed_status}", color=status_color, size=12, weight="bold"),
-            ft.Row([
-                ft.IconButton("search", on_click=open_search_bs, disabled=not state.master_loaded, icon_color="#667EEA"),
-                ft.IconButton("refresh", on_click=lambda e: refresh_all_data(page), icon_color="#667EEA")
-            ])
-        ], alignment="spaceBetween"))
-        
-        # Filter and Sort Controls
-        def on_filter_change(e):
-            state.filter_symbol = e.control.value.upper() if e.control.value else ""
-            update_view()
-        def on_sort_change(e):
-            state.sort_by = e.control.value
-            update_view()
-        def clear_filters(e):
-            state.filter_symbol = ""
-            update_view()
-        
-        controls.append(ft.Container(
-            content=ft.Row([
-                ft.TextField(label="Filter Symbol", value=state.filter_symbol, dense=True, 
-                            on_change=on_filter_change, expand=True, border_color="#2D3748"),
-                ft.Dropdown(label="Sort", value=state.sort_by, dense=True, width=120,
-                           on_change=on_sort_change, border_color="#2D3748",
-                           options=[
-                               ft.dropdown.Option("none", "Default"),
-                               ft.dropdown.Option("sym_az", "A-Z"),
-                               ft.dropdown.Option("sym_za", "Z-A"),
-                               ft.dropdown.Option("price_low", "Low"),
-                               ft.dropdown.Option("price_high", "High"),
-                           ]),
-                ft.IconButton("clear", on_click=clear_filters, icon_size=20, icon_color="#667EEA")
-            ]),
-            padding=8, bgcolor="#222844", border_radius=8, border=ft.border.all(1, "#2D3748")
-        ))
-        
-        # Apply filters and sorting
+    def paint_header():
+        changed = []
+        feed_val = f"Feed: {state.live_feed_status}"
+        if feed_text.value != feed_val:
+            feed_text.value = feed_val
+            feed_text.color = "#48BB78" if state.live_feed_status == "CONNECTED" else "#F56565"
+            changed.append(feed_text)
+        jobs_val = jobs_status()
+        if jobs_text.value != jobs_val:
+            jobs_text.value = jobs_val
+            changed.append(jobs_text)
+        if search_btn.disabled == state.master_loaded:
+            search_btn.disabled = not state.master_loaded
+            changed.append(search_btn)
+        return changed
+    
+    def apply_watchlist_order(update=True):
         filtered_list = state.watchlist
         if state.filter_symbol:
             filtered_list = [s for s in filtered_list if state.filter_symbol in s['symbol']]
@@ -432,34 +114,84 @@ def main(page: ft.Page):
             filtered_list = sorted(filtered_list, key=lambda x: x['symbol'])
         elif state.sort_by == "sym_za":
             filtered_list = sorted(filtered_list, key=lambda x: x['symbol'], reverse=True)
-        elif state.sort_by == "price_low":
-            filtered_list = sorted(filtered_list, key=lambda x: x.get('ltp', 0))
-        elif state.sort_by == "price_high":
-            filtered_list = sorted(filtered_list, key=lambda x: x.get('ltp', 0), reverse=True)
-        
-        lv = ft.ListView(expand=True, spacing=10)
-        for stock in filtered_list:
-            if 'ltp_control' not in stock:
-                stock['ltp_control'] = ft.Text("", weight="bold", color="#48BB78", size=15)
-                stock['wc_control'] = ft.Text("", size=10, color="#A0AEC0")
-            stock['ltp_control'].value = f"₹{stock.get('ltp', 0):.2f}"
-            stock['wc_control'].value = f"WC: {stock.get('wc', 0):.2f}"
-            lv.controls.append(ft.Container(
-                content=ft.Row([
-                    ft.Column([ft.Text(stock['symbol'], weight="bold", size=14), ft.Text(stock['token'], size=10, color="#A0AEC0")]),
+        elif state.sort_by in RANKED_SORTS:
+            view, reverse = RANKED_SORTS[state.sort_by]
+            filtered_list = state.views.order(view, filtered_list, reverse)
+        rows.set_order(filtered_list, update)
+    
+    def watch_ranks():
+        # Ranked sorts reorder live: the view reports changes inside the visible rows and the
+        # flush loop re-applies the order on its next frame
+        nonlocal rank_sub
+        if rank_sub: rank_sub()
+        rank_sub = None
+        view = RANKED_SORTS.get(state.sort_by, (None,))[0]
+        for name in set(v for v, _ in RANKED_SORTS.values()) - {view}: state.views.release(name)
+        if view:
+            reverse = RANKED_SORTS[state.sort_by][1]
+            rank_sub = state.views[view].subscribe(lambda: len(state.watchlist) if state.filter_symbol else rows.window_end(),
+                                                   on_rank_change, reverse)
+    
+    def on_rank_change(top, changes):
+        nonlocal order_dirty
+        order_dirty = True
+    
+    def get_watchlist_view():
+        # Built once; filter, sort and ticks only touch the cached row controls
+        nonlocal watchlist_view
+        if watchlist_view is None:
+            def on_filter_change(e):
+                state.filter_symbol = e.control.value.upper() if e.control.value else ""
+                apply_watchlist_order()
+            def on_sort_change(e):
+                state.sort_by = e.control.value
+                watch_ranks()
+                apply_watchlist_order()
+            def clear_filters(e):
+                state.filter_symbol = ""
+                filter_field.value = ""
+                filter_field.update()
+                apply_watchlist_order()
+            filter_field = ft.TextField(label="Filter Symbol", value=state.filter_symbol, dense=True,
+                                        on_change=on_filter_change, expand=True, border_color="#2D3748")
+            watchlist_view = ft.Column([
+                ft.Row([
+                    ft.Column([feed_text, jobs_text], spacing=2),
                     ft.Row([
-                        ft.Column([stock['ltp_control'], stock['wc_control']], alignment="end"),
-                        ft.IconButton("delete", icon_color="#F56565", on_click=lambda e, t=stock['token']: remove_stock(t))
+                        search_btn,
+                        ft.IconButton("refresh", on_click=lambda e: refresh_all_data(page), icon_color="#667EEA")
                     ])
                 ], alignment="spaceBetween"),
-                padding=12, bgcolor="#222844", border_radius=8, border=ft.border.all(1, "#2D3748")
-            ))
-        controls.append(lv)
-        return ft.Column(controls, expand=True)
+                # Filter and Sort Controls
+                ft.Container(
+                    content=ft.Row([
+                        filter_field,
+                        ft.Dropdown(label="Sort", value=state.sort_by, dense=True, width=120,
+                                   on_change=on_sort_change, border_color="#2D3748",
+                                   options=[
+                                       ft.dropdown.Option("none", "Default"),
+                                       ft.dropdown.Option("sym_az", "A-Z"),
+                                       ft.dropdown.Option("sym_za", "Z-A"),
+                                       ft.dropdown.Option("price_low", "Low"),
+                                       ft.dropdown.Option("price_high", "High"),
+                                       ft.dropdown.Option("pct_high", "Gainers"),
+                                       ft.dropdown.Option("pct_low", "Losers"),
+                                       ft.dropdown.Option("alert_near", "Near Alert"),
+                                   ]),
+                        ft.IconButton("clear", on_click=clear_filters, icon_size=20, icon_color="#667EEA")
+                    ]),
+                    padding=8, bgcolor="#222844", border_radius=8, border=ft.border.all(1, "#2D3748")
+                ),
+                rows.list_view
+            ], expand=True)
+            watch_ranks()
+        paint_header()
+        apply_watchlist_order(update=False)
+        return watchlist_view
     
     def remove_stock(token):
-        state.watchlist = [s for s in state.watchlist if s['token'] != token]
-        save_config()
+        rows.forget(token)
+        engine_remove_stock(token)
         update_view()
     
     def get_alerts_view():
@@ -468,6 +200,7 @@ def main(page: ft.Page):
             content=ft.Column([
                 ft.Text("Strategy: 3-6-9 Logic", weight="bold"),
                 ft.ElevatedButton("Auto-Generate Levels", on_click=generate_alerts_ui, bgcolor="#667EEA", color="white"),
+                ft.Row([rule_input, ft.IconButton("add", icon_color="#667EEA", on_click=add_rule_ui)]),
                 ft.Switch(label="Pause Monitoring", value=state.is_paused, on_change=toggle_pause, active_color="#667EEA")
             ], spacing=10),
             padding=12, bgcolor="#222844", border_radius=10, border=ft.border.all(1, "#2D3748")
@@ -476,13 +209,14 @@ def main(page: ft.Page):
         if not state.alerts:
             lv.controls.append(ft.Text("No active alerts", color="#A0AEC0"))
         for alert in state.alerts:
-            col = "#48BB78" if alert['condition'] == "ABOVE" else "#F56565"
-            icon = "trending_up" if alert['condition'] == "ABOVE" else "trending_down"
+            col = "#48BB78" if alert['condition'] == "ABOVE" else "#667EEA" if alert['condition'] == "RULE" else "#F56565"
+            icon = "trending_up" if alert['condition'] == "ABOVE" else "rule" if alert['condition'] == "RULE" else "trending_down"
+            target = alert['expr'] if alert['condition'] == "RULE" else f"Target: ₹{alert['price']}"
             lv.controls.append(ft.Container(
                 content=ft.Row([
                     ft.Row([
                         ft.Icon(icon, color=col, size=20),
-                        ft.Column([ft.Text(alert['symbol'], weight="bold"), ft.Text(f"Target: ₹{alert['price']}", size=12, color="#A0AEC0")], spacing=2)
+                        ft.Column([ft.Text(alert['symbol'], weight="bold"), ft.Text(target, size=12, color="#A0AEC0")], spacing=2)
                     ], spacing=10),
                     ft.IconButton("delete", icon_color="#F56565", on_click=lambda e, uid=alert['id']: delete_alert(uid))
                 ], alignment="spaceBetween"),
@@ -491,49 +225,115 @@ def main(page: ft.Page):
         controls.append(lv)
         return ft.Column(controls, expand=True)
     
-    def generate_alerts_ui(e):
-        count = 0
-        for stock in state.watchlist:
-            if stock.get('wc', 0) > 0:
-                lvls = generate_369_levels(stock.get('ltp', 0), stock['wc'])
-                for l in lvls:
-                    if not any(a['token'] == stock['token'] and a['price'] == l['price'] for a in state.alerts):
-                        state.alerts.append({"id": str(uuid.uuid4()), "symbol": stock['symbol'], "token": stock['token'], "price": l['price'], "condition": l['type']})
-                        count += 1
-        if count > 0: state.logs.insert(0, {"time": "SYS", "symbol": "AUTO", "msg": f"Generated {count} alerts"})
+    rule_input = ft.TextField(hint_text="e.g. RELIANCE-EQ cross_up 2950 AND TCS-EQ pct_up 0.5 cooldown 300", expand=True, dense=True)
+
+    def add_rule_ui(e):
+        if not rule_input.value: return
+        try:
+            engine_add_rule(rule_input.value)
+            rule_input.value = ""
+        except ValueError as ex:
+            rule_input.error_text = str(ex)
+            page.update()
+            return
+        rule_input.error_text = None
         update_view()
+
+    def generate_alerts_ui(e):
+        generate_alerts_background(page, done=lambda count: update_view())
     
     def delete_alert(uid):
-        state.alerts = [a for a in state.alerts if a['id'] != uid]
+        engine_delete_alert(uid)
         update_view()
     
     def toggle_pause(e): state.is_paused = e.control.value
     
     def get_logs_view():
-        lv = ft.ListView(expand=True)
-        for log in state.logs: lv.controls.append(ft.Container(content=ft.Row([ft.Text(log['time'], size=10, color="grey"), ft.Text(log['symbol'], weight="bold", width=80), ft.Text(log['msg'], expand=True)]), padding=5, border=ft.border.only(bottom=ft.BorderSide(1, "#333333"))))
-        return ft.Column([ft.Text("Activity Log", size=20), ft.Divider(), lv], expand=True)
+        # Built once; a fixed pool of rows is refilled one page at a time from the activity log
+        nonlocal logs_view
+        if logs_view is None:
+            log_rows = [ft.Container(content=ft.Row([ft.Text("", size=10, color="grey"), ft.Text("", weight="bold", width=80), ft.Text("", expand=True)]),
+                                     padding=5, border=ft.border.only(bottom=ft.BorderSide(1, "#333333")), visible=False) for _ in range(LOG_PAGE_SIZE)]
+            page_text = ft.Text("", size=12, color="#A0AEC0")
+            prev_btn = ft.IconButton("chevron_left", on_click=lambda e: show_page(log_page["n"] - 1), icon_color="#667EEA")
+            next_btn = ft.IconButton("chevron_right", on_click=lambda e: show_page(log_page["n"] + 1), icon_color="#667EEA")
+            symbol_field = ft.TextField(label="Symbol", dense=True, expand=True, border_color="#2D3748",
+                                        on_change=lambda e: show_page(0))
+            range_dd = ft.Dropdown(label="Time", value="all", dense=True, width=110, border_color="#2D3748",
+                                   on_change=lambda e: show_page(0),
+                                   options=[ft.dropdown.Option("all", "All"), ft.dropdown.Option("15m", "15 min"),
+                                            ft.dropdown.Option("1h", "1 hour"), ft.dropdown.Option("today", "Today")])
+            log_page = {"n": 0}
+            def show_page(n, update=True):
+                span = LOG_RANGES.get(range_dd.value)
+                if span == "today": since = datetime.datetime.combine(datetime.date.today(), datetime.time()).timestamp()
+                else: since = time.time() - span if span else None
+                n = max(0, n)
+                entries, more = state.activity.page(n * LOG_PAGE_SIZE, LOG_PAGE_SIZE, symbol_field.value, since)
+                log_page["n"] = n
+                for i, row in enumerate(log_rows):
+                    entry = entries[i] if i < len(entries) else None
+                    row.visible = entry is not None
+                    if entry:
+                        stamp, label, text = row.content.controls
+                        stamp.value = datetime.datetime.fromtimestamp(entry[1]).strftime("%H:%M:%S")
+                        label.value = entry[2]
+                        text.value = entry[3]
+                page_text.value = f"Page {n + 1}" if entries else "No activity"
+                prev_btn.disabled = n == 0
+                next_btn.disabled = not more
+                if update:
+                    try: logs_view.update()
+                    except: pass
+            logs_view = ft.Column([
+                ft.Text("Activity Log", size=20),
+                ft.Row([symbol_field, range_dd]),
+                ft.Row([prev_btn, page_text, next_btn], alignment="center"),
+                ft.Divider(),
+                ft.ListView(log_rows, expand=True)
+            ], expand=True)
+            logs_view.data = show_page
+        logs_view.data(0, update=False)
+        return logs_view
+    
+    def refresh_debug(update=True):
+        # Same series the /metrics endpoint serves, summarised
+        entries = metrics.registry.snapshot()
+        while len(debug_list.controls) < len(entries):
+            debug_list.controls.append(ft.Row([ft.Text("", size=11, width=190, color="#A0AEC0"), ft.Text("", size=11, expand=True)]))
+        for i, row in enumerate(debug_list.controls):
+            entry = entries[i] if i < len(entries) else None
+            row.visible = entry is not None
+            if entry:
+                name, labels, summary = entry
+                row.controls[0].value = f"{name[3:]}{f' [{labels}]' if labels else ''}"
+                row.controls[1].value = summary
+        if update:
+            try: debug_list.update()
+            except: pass
+    
+    def get_debug_view():
+        refresh_debug(update=False)
+        port = f"http://127.0.0.1:{state.metrics_port}/metrics" if state.metrics_port else "endpoint disabled"
+        return ft.Column([ft.Text("Diagnostics", size=20), ft.Text(port, size=10, color="grey"), ft.Divider(), debug_list], expand=True)
     
     def open_search_bs(e):
         search_field = ft.TextField(label="Symbol", autofocus=True, on_change=lambda e: run_search(e.data))
-        results_list = ft.ListView(expand=True)
+        result_tiles = [ft.ListTile(title=ft.Text(""), subtitle=ft.Text("", size=10, color="#A0AEC0"), visible=False,
+                                    on_click=lambda e: add_stock(e.control.data)) for _ in range(15)]
+        results_list = ft.ListView(result_tiles, expand=True)
         def run_search(q):
-            q = q.upper()
-            results_list.controls.clear()
-            if len(q) > 2:
-                matches = [s for s in state.scrips if s['symbol'].startswith(q)][:15]
-                for m in matches:
-                    results_list.controls.append(ft.ListTile(title=ft.Text(m['symbol']), on_click=lambda e, item=m: add_stock(item)))
-            bs.update()
+            matches = state.search.search(q, len(result_tiles)) if state.search and len(q.strip()) > 1 else []
+            for i, tile in enumerate(result_tiles):
+                m = matches[i] if i < len(matches) else None
+                tile.visible = m is not None
+                if m:
+                    tile.data = m
+                    tile.title.value = m['symbol']
+                    tile.subtitle.value = f"{m['name']} · {m['exch_seg']}"
+            results_list.update()
         def add_stock(item):
-            if not any(s['token'] == item['token'] for s in state.watchlist):
-                new_stock = {"symbol": item['symbol'], "token": item['token'], "exch_seg": item['exch_seg'], "ltp": 0.0, "wc": 0.0, "loading": True}
-                state.watchlist.append(new_stock)
-                save_config()
-                api_job_queue.put((fetch_historical_data_task, [new_stock], page))
-                if state.sws and state.live_feed_status == "CONNECTED":
-                     try: state.sws.subscribe("add", 3, [{"exchangeType": 1, "tokens": [item['token']]}])
-                     except: pass
+            engine_add_stock(item, page)
             page.close(bs)
             update_view()
         bs = ft.BottomSheet(ft.Container(ft.Column([search_field, results_list], expand=True), padding=20, height=500), open=True)
@@ -544,6 +344,7 @@ def main(page: ft.Page):
         if state.current_view == "watchlist": body_container.content = get_watchlist_view()
         elif state.current_view == "alerts": body_container.content = get_alerts_view()
         elif state.current_view == "logs": body_container.content = get_logs_view()
+        elif state.current_view == "debug": body_container.content = get_debug_view()
         try: page.update()
         except: pass
     
@@ -554,10 +355,12 @@ def main(page: ft.Page):
     nav_row = ft.Row([
         ft.IconButton("list", data="watchlist", on_click=nav_change),
         ft.IconButton("notifications", data="alerts", on_click=nav_change),
-        ft.IconButton("history", data="logs", on_click=nav_change)
+        ft.IconButton("history", data="logs", on_click=nav_change),
+        ft.IconButton("insights", data="debug", on_click=nav_change)
     ], alignment="spaceAround")
     
     def route_change(e):
+        nonlocal flush_started
         page.views.clear()
         page.views.append(ft.View("/", [ft.Container(content=login_view, alignment=ft.alignment.center, expand=True)]))
         if page.route == "/app":
@@ -567,24 +370,38 @@ def main(page: ft.Page):
                 ft.Container(content=nav_row, bgcolor="#1A1F3A", padding=10)
             ]))
             update_view()
-            def refresh_timer():
-                while True:
-                    time.sleep(1)
-                    if state.current_view == "watchlist" and page.route == "/app":
+            def flush_loop():
+                nonlocal flush_started, debug_painted, order_dirty
+                # Pushes only the controls that changed since the last frame, capped at UI_MAX_FPS
+                interval = 1.0 / UI_MAX_FPS
+                while page.route == "/app":
+                    started = time.perf_counter()
+                    if state.current_view == "watchlist":
                         try:
-                            for stock in state.watchlist:
-                                if 'ltp_control' in stock and stock.get('ltp'):
-                                    new_val = f"₹{stock['ltp']:.2f}"
-                                    if stock['ltp_control'].value != new_val:
-                                        stock['ltp_control'].value = new_val
-                            page.update()
-                        except:
-                            break
-            threading.Thread(target=refresh_timer, daemon=True).start()
+                            if order_dirty:
+                                order_dirty = False
+                                apply_watchlist_order()
+                            changed = paint_header() + rows.flush(state.dirty_tokens)
+                            if changed: page.update(*changed)
+                            metrics.UI_FLUSH.since(started)
+                        except Exception as e:
+                            # One bad frame must not stop the watchlist updating for the session
+                            print(f"UI flush error: {e}")
+                    elif state.current_view == "debug" and started - debug_painted >= 1.0:
+                        debug_painted = started
+                        refresh_debug()
+                    time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+                flush_started = False
+            if not flush_started:
+                flush_started = True
+                threading.Thread(target=flush_loop, daemon=True).start()
         page.update()
     
     page.on_route_change = route_change
     page.go(page.route)
+    # Deferred until the login screen has painted
+    load_alerts(page)
+    start_metrics_server()
 
 if __name__ == "__main__":
     ft.app(target=main)
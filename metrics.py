@@ -0,0 +1,205 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = 9108
+# Latency buckets in seconds: 10 us doubling up to ~42 s
+LATENCY_BUCKETS = tuple(1e-5 * 2 ** k for k in range(23))
+
+
+def _labels(names, values):
+    if not names: return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+class Histogram:
+    # Fixed buckets, so observe() is a bisect and two increments under a lock
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def since(self, start):
+        self.observe(time.perf_counter() - start)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        with self._lock: counts, total = list(self.counts), self.count
+        if not total: return 0.0
+        rank, seen = q * total, 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= rank: return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Counter:
+    # Bumped from the feed, evaluator and API worker threads; += alone can lose increments
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock: self.value += n
+
+
+class Gauge:
+    # Either set() directly or computed from a callback at read time
+    def __init__(self, func=None):
+        self.func = func
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        if self.func is None: return self._value
+        try: return float(self.func())
+        except Exception: return float("nan")
+
+
+class Meter:
+    # Events in the last complete second, for "ticks per second" style gauges
+    def __init__(self):
+        self._second = int(time.monotonic())
+        self._current = self._last = 0
+
+    def mark(self, n=1):
+        second = int(time.monotonic())
+        if second != self._second:
+            self._last = self._current if second == self._second + 1 else 0
+            self._second, self._current = second, 0
+        self._current += n
+
+    def rate(self):
+        second = int(time.monotonic())
+        if second == self._second: return self._last
+        return self._current if second == self._second + 1 else 0
+
+
+class Family:
+    # One metric name, one child per label value tuple
+    def __init__(self, kind, name, help, labelnames, factory):
+        self.kind, self.name, self.help, self.labelnames = kind, name, help, tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames: self._children[()] = factory()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock: child = self._children.setdefault(values, self._factory())
+        return child
+
+    def children(self):
+        return list(self._children.items())
+
+
+class Registry:
+    def __init__(self):
+        self._families = {}
+
+    def _family(self, kind, name, help, labelnames, factory):
+        family = self._families.get(name)
+        if family is None: family = self._families[name] = Family(kind, name, help, labelnames, factory)
+        return family
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._family("histogram", name, help, labelnames, lambda: Histogram(buckets))
+
+    def counter(self, name, help, labelnames=()):
+        return self._family("counter", name, help, labelnames, Counter)
+
+    def gauge(self, name, help, func=None, labelnames=()):
+        return self._family("gauge", name, help, labelnames, lambda: Gauge(func))
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for f in self._families.values():
+            lines.append(f"# HELP {f.name} {f.help}")
+            lines.append(f"# TYPE {f.name} {f.kind}")
+            for values, m in f.children():
+                labels = _labels(f.labelnames, values)
+                if f.kind == "histogram":
+                    cumulative, base = 0, labels[1:-1] + "," if labels else ""
+                    for bound, c in zip(m.buckets, m.counts):
+                        cumulative += c
+                        lines.append(f'{f.name}_bucket{{{base}le="{bound:.6g}"}} {cumulative}')
+                    lines.append(f'{f.name}_bucket{{{base}le="+Inf"}} {m.count}')
+                    lines.append(f"{f.name}_sum{labels} {m.sum:.9g}")
+                    lines.append(f"{f.name}_count{labels} {m.count}")
+                else:
+                    lines.append(f"{f.name}{labels} {m.value:.9g}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        # (name, labels, summary) rows for the in-app debug panel
+        rows = []
+        for f in self._families.values():
+            for values, m in f.children():
+                labels = ",".join(values)
+                if f.kind == "histogram":
+                    if not m.count: continue
+                    summary = (f"n={m.count} avg={m.sum / m.count * 1e3:.2f}ms p50<={m.quantile(0.5) * 1e3:.2f}ms "
+                               f"p99<={m.quantile(0.99) * 1e3:.2f}ms")
+                else:
+                    summary = f"{m.value:g}"
+                rows.append((f.name, labels, summary))
+        return rows
+
+
+registry = Registry()
+
+
+def serve(port=METRICS_PORT, host="127.0.0.1", reg=None):
+    # Serves GET /metrics on a daemon thread; returns the server, or None if the port is taken
+    reg = reg or registry
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = reg.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    try: server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# Hot-path series shared by the engine, scheduler, dispatcher and UI; unlabelled ones are
+# bound to their single child so the hot path skips the label lookup
+FRAME_DECODE = registry.histogram("ty_frame_decode_seconds", "Frame receipt to decoded tick, on the socket thread").labels()
+TICK_LAG = registry.histogram("ty_tick_lag_seconds", "Decoded tick to alert evaluation (queue wait in the tick pipeline)").labels()
+EVALUATE = registry.histogram("ty_evaluate_batch_seconds", "Evaluator time per batch of conflated ticks").labels()
+ALERT_TO_TELEGRAM = registry.histogram("ty_alert_to_telegram_seconds", "Alert fired to Telegram sendMessage accepted").labels()
+API_WAIT = registry.histogram("ty_api_queue_wait_seconds", "API job time in the scheduler queue", ("endpoint",))
+API_RUN = registry.histogram("ty_api_run_seconds", "API job run time", ("endpoint",))
+UI_FLUSH = registry.histogram("ty_ui_flush_seconds", "Watchlist paint and page.update per frame").labels()
+TICKS = registry.counter("ty_ticks_total", "Ticks received from the feed").labels()
+ALERTS_FIRED = registry.counter("ty_alerts_fired_total", "Alerts triggered").labels()
+TICK_RATE = Meter()
+registry.gauge("ty_ticks_per_second", "Ticks received in the last complete second", TICK_RATE.rate)
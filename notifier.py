@@ -0,0 +1,242 @@
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+import metrics
+
+TELEGRAM_API = "https://api.telegram.org"
+OUTBOX_FILE = "telegram_outbox.jsonl"
+MAX_MESSAGE_LEN = 4096
+SEPARATOR = "\n\n"
+# _deliver results: DROPPED is a message Telegram rejected outright (bad chat, blocked bot),
+# which no retry or redelivery will ever get through
+SENT, DROPPED, FAILED = "sent", "dropped", "failed"
+_TAG = re.compile(r"<(/?)([a-zA-Z-]+)[^>]*>")
+
+
+def truncate_html(text, limit=MAX_MESSAGE_LEN):
+    # Cuts a parse_mode=HTML message to `limit` characters. Telegram answers 400 to a broken
+    # tag or entity, so the cut never falls inside one and tags left open are closed.
+    if len(text) <= limit: return text
+    cut = limit
+    while True:
+        head = text[:cut]
+        lt = head.rfind("<")
+        if lt > head.rfind(">"): head = head[:lt]
+        amp = head.rfind("&")
+        if amp > head.rfind(";"): head = head[:amp]
+        stack = []
+        for m in _TAG.finditer(head):
+            name = m.group(2).lower()
+            if not m.group(1): stack.append(name)
+            elif name in stack: del stack[len(stack) - 1 - stack[::-1].index(name)]
+        closing = "".join(f"</{name}>" for name in reversed(stack))
+        if len(head) + len(closing) <= limit: return head + closing
+        cut = limit - len(closing)
+
+
+def pack_messages(texts, limit=MAX_MESSAGE_LEN):
+    # Joins alerts into as few Telegram messages as fit the size limit
+    out, current = [], ""
+    for text in texts:
+        text = truncate_html(text, limit)
+        if current and len(current) + len(SEPARATOR) + len(text) > limit:
+            out.append(current)
+            current = text
+        else:
+            current = current + SEPARATOR + text if current else text
+    if current: out.append(current)
+    return out
+
+
+class TelegramDispatcher:
+    # One sender thread with a keep-alive session. Callers only enqueue; alerts arriving within
+    # `window` seconds are merged into one message per chat. Messages that still fail after
+    # retries (or after `max_throttled` 429s in a row, or one asking to wait over `max_retry_after`
+    # seconds) are appended to the outbox file, which a second thread with its own session
+    # redelivers, so a backlog there never holds up live alerts.
+    def __init__(self, base_url=TELEGRAM_API, window=1.0, max_queue=5000, max_retries=5,
+                 max_throttled=10, max_retry_after=30.0, outbox=OUTBOX_FILE, redeliver_every=60.0, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.window = window
+        self.max_retries = max_retries
+        self.max_throttled = max_throttled
+        self.max_retry_after = max_retry_after
+        self.outbox = outbox
+        self.redeliver_every = redeliver_every
+        self.timeout = timeout
+        self._queue = queue.Queue(max_queue)
+        self._outbox_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = self._outbox_thread = None
+        self._running = False
+        self.enqueued = self.sent_messages = self.sent_alerts = self.requests = 0
+        self.throttled = self.persisted = self.dropped = self.dropped_alerts = self.redelivered = 0
+        self._busy = False
+
+    def send(self, bot_token, chat_id, text):
+        if not bot_token or not chat_id: return False
+        self._start()
+        item = (bot_token, str(chat_id), text, time.perf_counter())
+        try: self._queue.put_nowait(item)
+        except queue.Full:
+            self._persist([item[:3]])
+            return False
+        self._count("enqueued")
+        return True
+
+    def _start(self):
+        if self._running: return
+        with self._start_lock:
+            # Checked again under the lock so racing first sends start one sender, not two
+            if self._running: return
+            self._running = True
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="telegram-dispatcher", daemon=True)
+            self._thread.start()
+            if self.outbox:
+                self._outbox_thread = threading.Thread(target=self._run_outbox, name="telegram-outbox", daemon=True)
+                self._outbox_thread.start()
+
+    def stop(self, timeout=5.0):
+        with self._start_lock:
+            self._running = False
+            self._stopping.set()
+            threads = (self._thread, self._outbox_thread)
+        for thread in threads:
+            if thread: thread.join(timeout)
+
+    def _count(self, name, n=1):
+        # Counters are bumped from the sender, the outbox thread and callers of send()
+        with self._stats_lock: setattr(self, name, getattr(self, name) + n)
+
+    def flush(self, timeout=10.0):
+        end = time.monotonic() + timeout
+        while (self._queue.unfinished_tasks or self._busy) and time.monotonic() < end: time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def _run(self):
+        import requests
+        session = requests.Session()
+        while self._running or not self._queue.empty():
+            try: first = self._queue.get(timeout=0.5)
+            except queue.Empty: continue
+            self._busy = True
+            batch, count = {}, 1
+            batch.setdefault(first[:2], []).append(first[2:])
+            deadline = time.monotonic() + self.window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                try: item = self._queue.get(timeout=remaining)
+                except queue.Empty: break
+                batch.setdefault(item[:2], []).append(item[2:])
+                count += 1
+            for (bot_token, chat_id), items in batch.items():
+                failed = []
+                for message in pack_messages([text for text, _ in items]):
+                    result = self._deliver(session, bot_token, chat_id, message)
+                    if result == SENT: self._count("sent_alerts", message.count(SEPARATOR) + 1)
+                    elif result == DROPPED: self._count("dropped_alerts", message.count(SEPARATOR) + 1)
+                    else: failed.append((bot_token, chat_id, message))
+                if failed: self._persist(failed)
+                else:
+                    now = time.perf_counter()
+                    for _, queued_at in items: metrics.ALERT_TO_TELEGRAM.observe(now - queued_at)
+            for _ in range(count): self._queue.task_done()
+            self._busy = False
+
+    def _deliver(self, session, bot_token, chat_id, text):
+        # SENT, DROPPED or FAILED; only FAILED messages are worth keeping for redelivery
+        url = f"{self.base_url}/bot{bot_token}/sendMessage"
+        attempt = throttled = 0
+        while True:
+            attempt += 1
+            try:
+                self._count("requests")
+                r = session.post(url, json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"}, timeout=self.timeout)
+                if r.status_code == 200:
+                    self._count("sent_messages")
+                    return SENT
+                if r.status_code == 429:
+                    # Telegram says how long to back off; waiting it out does not use up a retry,
+                    # but a chat that stays throttled goes to the outbox instead of stalling the queue
+                    self._count("throttled")
+                    throttled += 1
+                    if throttled > self.max_throttled:
+                        print(f"Telegram still throttling after {self.max_throttled} waits")
+                        return FAILED
+                    try: retry_after = float(r.json().get("parameters", {}).get("retry_after"))
+                    except Exception: retry_after = float(r.headers.get("Retry-After", 1) or 1)
+                    if retry_after > self.max_retry_after:
+                        print(f"Telegram throttled for {retry_after:.0f}s, leaving the message to the outbox")
+                        return FAILED
+                    time.sleep(retry_after)
+                    attempt -= 1
+                    continue
+                if 400 <= r.status_code < 500:
+                    print(f"Telegram rejected message ({r.status_code}): {r.text[:200]}")
+                    self._count("dropped")
+                    return DROPPED
+                error = f"HTTP {r.status_code}"
+            except Exception as e:
+                error = str(e)
+            if attempt >= self.max_retries:
+                print(f"Telegram error: {error}")
+                return FAILED
+            time.sleep(min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def _persist(self, items):
+        if not self.outbox: return
+        with self._outbox_lock:
+            try:
+                with open(self.outbox, "a", encoding="utf-8") as f:
+                    for bot_token, chat_id, text in items:
+                        f.write(json.dumps({"bot": bot_token, "chat": chat_id, "text": text, "ts": time.time()}) + "\n")
+                self._count("persisted", len(items))
+            except Exception as e:
+                print(f"Telegram outbox error: {e}")
+
+    def _run_outbox(self):
+        import requests
+        session = requests.Session()
+        while True:
+            self._redeliver(session)
+            if self._stopping.wait(self.redeliver_every): break
+
+    def _redeliver(self, session):
+        with self._outbox_lock:
+            if not os.path.exists(self.outbox): return
+            try:
+                with open(self.outbox, encoding="utf-8") as f: lines = f.readlines()
+                os.remove(self.outbox)
+            except Exception as e:
+                print(f"Telegram outbox error: {e}")
+                return
+        items = []
+        for line in lines:
+            try: item = json.loads(line)
+            except ValueError: continue
+            items.append((item["bot"], item["chat"], item["text"]))
+        failed = []
+        for i, item in enumerate(items):
+            if self._stopping.is_set():
+                # Whatever is left stays in the outbox for the next session
+                failed.extend(items[i:])
+                break
+            result = self._deliver(session, *item)
+            if result == SENT: self._count("redelivered")
+            elif result == FAILED: failed.append(item)
+        if failed: self._persist(failed)
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "enqueued": self.enqueued, "sent_alerts": self.sent_alerts,
+                "sent_messages": self.sent_messages, "requests": self.requests, "throttled": self.throttled,
+                "persisted": self.persisted, "redelivered": self.redelivered, "dropped": self.dropped,
+                "dropped_alerts": self.dropped_alerts}
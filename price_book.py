@@ -0,0 +1,157 @@
+import time
+from array import array
+from collections import namedtuple
+
+Quote = namedtuple("Quote", "token ltp wc open high low close prev_close volume ltt updated loading")
+
+ACTIVE = 1
+LOADING = 2
+_DOUBLE_FIELDS = ("ltp", "wc", "open", "high", "low", "close", "prev_close", "updated")
+_INT_FIELDS = ("volume", "ltt")
+# Numbers that used to live on the watchlist dicts; load() moves them into the book
+_LIVE_KEYS = ("ltp", "wc", "loading", "volume", "ohlc", "ltt", "prev_close")
+
+
+class PriceBook:
+    # Live numbers for every watched token in parallel arrays indexed by slot. Slots are the
+    # decoder's interned token ids, so the tick path writes straight from Tick.token_id and
+    # a token keeps its slot for the life of the process. The watchlist dicts keep only the
+    # identity fields (symbol, token, exch_seg, wc_fetched_at); ~90 bytes per slot here.
+    def __init__(self, tokens, capacity=256):
+        self.tokens = tokens  # TokenTable shared with the TickDecoder
+        for name in _DOUBLE_FIELDS: setattr(self, name, array("d", bytes(8 * capacity)))
+        for name in _INT_FIELDS: setattr(self, name, array("q", bytes(8 * capacity)))
+        self.flags = bytearray(capacity)
+        self.stocks = [None] * capacity
+
+    def __len__(self):
+        return sum(1 for f in self.flags if f & ACTIVE)
+
+    def _grow(self, slot):
+        # Arrays are extended in place, so references held by the evaluator stay valid
+        extra = max(slot + 1, 2 * len(self.flags)) - len(self.flags)
+        for name in _DOUBLE_FIELDS + _INT_FIELDS: getattr(self, name).extend(array(getattr(self, name).typecode, bytes(8 * extra)))
+        self.flags.extend(bytes(extra))
+        self.stocks.extend([None] * extra)
+
+    # Membership
+
+    def slot(self, token):
+        slot = self.tokens.register(str(token))
+        if slot >= len(self.flags): self._grow(slot)
+        return slot
+
+    def slot_of(self, token):
+        # Slot of a token on the book, or None
+        slot = self.tokens.find(token)
+        return slot if slot is not None and slot < len(self.flags) and self.flags[slot] & ACTIVE else None
+
+    def active(self, slot):
+        return slot < len(self.flags) and self.flags[slot] & ACTIVE
+
+    def add(self, stock):
+        # Takes ownership of a watchlist dict: its live numbers move into the arrays
+        slot = self.slot(stock['token'])
+        if not self.flags[slot] & ACTIVE: self._clear(slot)
+        self.flags[slot] |= ACTIVE
+        self.stocks[slot] = stock
+        live = {k: stock.pop(k) for k in _LIVE_KEYS if k in stock}
+        if live.get('wc'): self.wc[slot] = float(live['wc'])
+        if live.get('ltp') and not self.ltp[slot]: self.ltp[slot] = float(live['ltp'])
+        if live.get('loading'): self.flags[slot] |= LOADING
+        return stock
+
+    def remove(self, token):
+        slot = self.slot_of(token)
+        if slot is None: return None
+        stock = self.stocks[slot]
+        self._clear(slot)
+        return stock
+
+    def load(self, stocks):
+        # Makes the book hold exactly these stocks; returns them for state.watchlist
+        keep = {str(s['token']) for s in stocks}
+        for slot in self.slots():
+            if self.tokens.token(slot) not in keep: self._clear(slot)
+        return [self.add(s) for s in stocks]
+
+    def _clear(self, slot):
+        for name in _DOUBLE_FIELDS + _INT_FIELDS: getattr(self, name)[slot] = 0
+        self.flags[slot] = 0
+        self.stocks[slot] = None
+
+    def slots(self):
+        return [i for i, f in enumerate(self.flags) if f & ACTIVE]
+
+    # Writes
+
+    def update_tick(self, slot, ltp, volume, open_, high, low, close, ltt):
+        self.ltp[slot] = ltp
+        self.volume[slot] = volume
+        self.open[slot] = open_
+        self.high[slot] = high
+        self.low[slot] = low
+        self.close[slot] = close
+        self.ltt[slot] = ltt
+        self.updated[slot] = time.time()
+
+    def set_ltp(self, slot, ltp):
+        self.ltp[slot] = ltp
+        self.updated[slot] = time.time()
+
+    def set_quote(self, slot, ltp, ohlc=None, prev_close=None):
+        self.set_ltp(slot, ltp)
+        if ohlc: self.open[slot], self.high[slot], self.low[slot], self.close[slot] = (float(v or 0) for v in ohlc)
+        if prev_close: self.prev_close[slot] = float(prev_close)
+
+    def set_wc(self, slot, wc):
+        self.wc[slot] = wc
+
+    def set_loading(self, slot, loading):
+        if loading: self.flags[slot] |= LOADING
+        else: self.flags[slot] &= ~LOADING & 0xFF
+
+    # Reads
+
+    def ltp_of(self, token):
+        slot = self.slot_of(token)
+        return self.ltp[slot] if slot is not None else 0.0
+
+    def wc_of(self, token):
+        slot = self.slot_of(token)
+        return self.wc[slot] if slot is not None else 0.0
+
+    def loading(self, token):
+        slot = self.slot_of(token)
+        return slot is not None and bool(self.flags[slot] & LOADING)
+
+    def any_loading(self):
+        return any(f & LOADING and f & ACTIVE for f in self.flags)
+
+    def quote(self, token):
+        # Snapshot of one token's numbers, or None if it is not on the book
+        slot = self.slot_of(token)
+        if slot is None: return None
+        return Quote(self.tokens.token(slot), self.ltp[slot], self.wc[slot], self.open[slot], self.high[slot], self.low[slot],
+                     self.close[slot], self.prev_close[slot], self.volume[slot], self.ltt[slot], self.updated[slot],
+                     bool(self.flags[slot] & LOADING))
+
+    def record(self, stock):
+        # What the state store persists for a stock: identity fields plus the weekly close
+        slot = self.slot_of(stock['token'])
+        return dict(stock, wc=self.wc[slot]) if slot is not None else dict(stock)
+
+    # Whole-book operations
+
+    def pct_change(self, slots=None):
+        # Percent change from the weekly close per slot; 0 where there is no close yet
+        slots = self.slots() if slots is None else slots
+        ltp, wc = self.ltp, self.wc
+        return [(ltp[i] - wc[i]) / wc[i] * 100.0 if wc[i] else 0.0 for i in slots]
+
+    def sorted(self, stocks, field="ltp", reverse=False):
+        # Orders watchlist dicts by one numeric column; the column is gathered once and the
+        # sort key is the array's own __getitem__, so no Python lambda runs per comparison
+        column = getattr(self, field)
+        keys = array(column.typecode, [column[self.slot(s['token'])] for s in stocks])
+        return [stocks[i] for i in sorted(range(len(stocks)), key=keys.__getitem__, reverse=reverse)]
@@ -0,0 +1,202 @@
+import bisect
+import threading
+
+CHUNK = 64  # target entries per chunk of the sorted list
+
+
+class RankedView:
+    # Slots ordered by a numeric key, in a chunked sorted list: parallel value and slot lists
+    # per chunk, found by bisecting the chunk maxima and then one chunk's values. A price
+    # change moves one entry in O(log n) plus a memmove of at most 2 * CHUNK pointers instead
+    # of re-sorting the whole watchlist. Equal values keep insertion order. Slots whose key
+    # is None are left out.
+    def __init__(self, key, chunk=CHUNK):
+        self.key = key
+        self.chunk = chunk
+        self._values = []  # per chunk, sorted
+        self._slots = []   # per chunk, parallel to _values
+        self._maxes = []
+        self._value = {}
+        self._subs = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._value)
+
+    def _insert(self, value, slot):
+        if not self._values:
+            self._values.append([value])
+            self._slots.append([slot])
+            self._maxes.append(value)
+            return
+        i = min(bisect.bisect_right(self._maxes, value), len(self._maxes) - 1)
+        values, slots = self._values[i], self._slots[i]
+        j = bisect.bisect_right(values, value)
+        values.insert(j, value)
+        slots.insert(j, slot)
+        if len(values) > 2 * self.chunk:
+            half = self.chunk
+            self._values.insert(i + 1, values[half:])
+            self._slots.insert(i + 1, slots[half:])
+            self._maxes.insert(i + 1, values[-1])
+            del values[half:], slots[half:]
+        self._maxes[i] = values[-1]
+
+    def _find(self, value, slot):
+        i = bisect.bisect_left(self._maxes, value)
+        j = bisect.bisect_left(self._values[i], value)
+        while self._slots[i][j] != slot:
+            j += 1
+            if j == len(self._slots[i]): i, j = i + 1, 0
+        return i, j
+
+    def _remove(self, value, slot):
+        i, j = self._find(value, slot)
+        values, slots = self._values[i], self._slots[i]
+        del values[j], slots[j]
+        if values: self._maxes[i] = values[-1]
+        else: del self._values[i], self._slots[i], self._maxes[i]
+
+    def _rank(self, value, slot):
+        i, j = self._find(value, slot)
+        return sum(len(c) for c in self._values[:i]) + j
+
+    def update(self, slot):
+        value = self.key(slot)
+        if value is not None and value != value: value = None  # NaN
+        with self._lock:
+            old = self._value.get(slot)
+            if old == value: return
+            if old is not None:
+                self._remove(old, slot)
+                del self._value[slot]
+            if value is not None:
+                self._insert(value, slot)
+                self._value[slot] = value
+            if not self._subs: return
+            pending = self._changes(old, value)
+        for callback, top, changes in pending: callback(top, changes)
+
+    def discard(self, slot):
+        with self._lock:
+            old = self._value.pop(slot, None)
+            if old is None: return
+            self._remove(old, slot)
+            pending = self._changes(old, None) if self._subs else ()
+        for callback, top, changes in pending: callback(top, changes)
+
+    def _changes(self, old, new):
+        # A full top-N can only change if the value moved from or to the inside of its last
+        # entry's value (`edge`, inclusive for ties); otherwise the top is recomputed and
+        # compared position by position
+        pending = []
+        for sub in self._subs:
+            n, reverse, callback, last, edge = sub
+            n = n()
+            if len(last) == n and edge is not None:
+                if reverse: touched = (old is not None and old >= edge) or (new is not None and new >= edge)
+                else: touched = (old is not None and old <= edge) or (new is not None and new <= edge)
+                if not touched: continue
+            top = self._top(n, reverse)
+            sub[4] = self._value[top[-1]] if top else None
+            changes = [(r, s) for r, s in enumerate(top) if r >= len(last) or last[r] != s]
+            changes += [(r, None) for r in range(len(top), len(last))]
+            if changes:
+                sub[3] = top
+                pending.append((callback, top, changes))
+        return pending
+
+    def _top(self, n, reverse=False):
+        out = []
+        for slots in (reversed(self._slots) if reverse else self._slots):
+            out.extend(reversed(slots) if reverse else slots)
+            if len(out) >= n: return out[:n]
+        return out
+
+    def top(self, n, reverse=False):
+        with self._lock: return self._top(n, reverse)
+
+    def ordered(self, reverse=False):
+        with self._lock: return self._top(len(self._value), reverse)
+
+    def rank(self, slot):
+        with self._lock:
+            value = self._value.get(slot)
+            return None if value is None else self._rank(value, slot)
+
+    def subscribe(self, n, callback, reverse=False):
+        # callback(top, changes) runs on the writer's thread whenever the top n (an int, or a
+        # callable read on every update) changes; changes are (rank, slot or None) pairs.
+        # Returns a function that cancels the subscription.
+        size = n if callable(n) else (lambda: n)
+        with self._lock:
+            top = self._top(size(), reverse)
+            sub = [size, reverse, callback, top, self._value[top[-1]] if top else None]
+            self._subs.append(sub)
+        def cancel():
+            with self._lock:
+                if sub in self._subs: self._subs.remove(sub)
+        return cancel
+
+    def clear(self):
+        with self._lock:
+            self._values, self._slots, self._maxes, self._value = [], [], [], {}
+
+
+class RankedViews:
+    # The watchlist orderings kept live from the price book and alert index:
+    #   price           last traded price
+    #   pct_wc          percent change from the weekly close
+    #   alert_distance  percent distance to the nearest pending alert level
+    # A view is only maintained while in use: the first lookup builds it, release() drops it,
+    # so ticks pay for the ordering on screen and nothing else.
+    def __init__(self, book, alerts):
+        self.book = book
+        self.alerts = alerts
+        self.views = {"price": RankedView(self._price), "pct_wc": RankedView(self._pct_wc),
+                      "alert_distance": RankedView(self._alert_distance)}
+        self.active = {}
+
+    def __getitem__(self, name):
+        view = self.active.get(name)
+        if view is None:
+            view = self.views[name]
+            view.clear()
+            for slot in self.book.slots(): view.update(slot)
+            self.active[name] = view
+        return view
+
+    def release(self, name):
+        view = self.active.pop(name, None)
+        if view is not None: view.clear()
+
+    def _price(self, slot):
+        return self.book.ltp[slot] or None
+
+    def _pct_wc(self, slot):
+        ltp, wc = self.book.ltp[slot], self.book.wc[slot]
+        return (ltp - wc) / wc * 100.0 if ltp and wc else None
+
+    def _alert_distance(self, slot):
+        ltp = self.book.ltp[slot]
+        if not ltp: return None
+        level = self.alerts.nearest(self.book.tokens.token(slot), ltp)
+        return None if level is None else abs(level - ltp) / ltp * 100.0
+
+    def update(self, slot):
+        for view in list(self.active.values()): view.update(slot)
+
+    def discard(self, slot):
+        for view in list(self.active.values()): view.discard(slot)
+
+    def rebuild(self):
+        active = set(self.book.slots())
+        for view in list(self.active.values()):
+            for slot in [s for s in view._value if s not in active]: view.discard(slot)
+            for slot in active: view.update(slot)
+
+    def order(self, name, stocks, reverse=False):
+        # stocks in the view's order; ones the view leaves out keep their order at the end
+        by_slot = {self.book.slot_of(s['token']): s for s in stocks}
+        ordered = [by_slot.pop(slot) for slot in self[name].ordered(reverse) if slot in by_slot]
+        return ordered + [s for s in stocks if self.book.slot_of(s['token']) in by_slot]
@@ -0,0 +1,318 @@
+import bisect
+import math
+import re
+import time
+from array import array
+
+# op -> (rising side, event). Events are true only on the tick that crosses the level;
+# the others hold while the price stays on that side of it. pct_* levels are relative to
+# the token's weekly close.
+OPS = {"cross_up": (True, True), "cross_down": (False, True), "above": (True, False), "below": (False, False),
+       "pct_up": (True, False), "pct_down": (False, False)}
+OPTIONS = {"hysteresis": float, "cooldown": float, "once": None}
+_WORDS = re.compile(r"\(|\)|[^\s()]+")
+
+
+def parse(text, resolve=None):
+    # Rule language, keywords case-insensitive:
+    #   rule    := expr option*
+    #   expr    := term (OR term)*
+    #   term    := factor (AND factor)*
+    #   factor  := "(" expr ")" | SYMBOL op NUMBER
+    #   op      := cross_up | cross_down | above | below | pct_up | pct_down
+    #   option  := hysteresis PERCENT | cooldown SECONDS | once
+    # e.g. "RELIANCE-EQ cross_up 2950 AND TCS-EQ pct_up 0.5 cooldown 300". Symbols go through
+    # resolve(symbol) -> token; all-digit symbols are taken as tokens. Returns (tree,
+    # leaves, options): leaves are (token, op, value), tree nodes are a leaf index or
+    # ("and" | "or", [nodes]).
+    words = _WORDS.findall(text)
+    leaves, pos = [], 0
+
+    def peek():
+        return words[pos].lower() if pos < len(words) else None
+
+    def take(what):
+        nonlocal pos
+        if pos >= len(words): raise ValueError(f"Rule ends where {what} was expected: {text!r}")
+        pos += 1
+        return words[pos - 1]
+
+    def factor():
+        if peek() == "(":
+            take("(")
+            node = expr()
+            if take(")") != ")": raise ValueError(f"Missing ) in rule: {text!r}")
+            return node
+        symbol, op, value = take("a symbol"), take("an operator").lower(), take("a number")
+        if op not in OPS: raise ValueError(f"Unknown operator {op!r} in rule: {text!r}")
+        token = symbol if symbol.isdigit() else (resolve(symbol) if resolve else None)
+        if token is None: raise ValueError(f"Unknown symbol {symbol!r} in rule: {text!r}")
+        try: value = float(value)
+        except ValueError: raise ValueError(f"Bad number {value!r} in rule: {text!r}") from None
+        leaves.append((str(token), op, value))
+        return len(leaves) - 1
+
+    def chain(kind, part):
+        nodes = [part()]
+        while peek() == kind:
+            take(kind)
+            nodes.append(part())
+        return nodes[0] if len(nodes) == 1 else (kind, nodes)
+
+    def expr():
+        return chain("or", lambda: chain("and", factor))
+
+    tree = expr()
+    _check_events(tree, leaves, text)
+    options = {"hysteresis": 0.0, "cooldown": 0.0, "once": False}
+    while pos < len(words):
+        name = take("an option").lower()
+        if name not in OPTIONS: raise ValueError(f"Unexpected {name!r} in rule: {text!r}")
+        options[name] = OPTIONS[name](take("a number")) if OPTIONS[name] else True
+    return tree, leaves, options
+
+
+def _check_events(node, leaves, text):
+    # Whether node can only be true on the tick of a crossing. Crossings are events of one
+    # tick on one leaf, so an AND needing two of them at once could never fire.
+    if isinstance(node, int): return OPS[leaves[node][1]][1]
+    kind, children = node
+    needs = [_check_events(n, leaves, text) for n in children]
+    if kind == "or": return all(needs)
+    if sum(needs) > 1: raise ValueError(f"AND of two crossings can never fire, use above/below for one of them: {text!r}")
+    return any(needs)
+
+
+class _Rule:
+    __slots__ = ("id", "payload", "test", "leaves", "cooldown", "once", "value", "fired")
+
+    def __init__(self, uid, payload, test, leaves, cooldown, once):
+        self.id, self.payload, self.test, self.leaves = uid, payload, test, leaves
+        self.cooldown, self.once = cooldown, once
+        self.value = False
+        self.fired = -math.inf
+
+
+class _Plan:
+    # One token's leaf thresholds, sorted: `rise` holds the levels a rising price turns
+    # leaves on (or, for falling-side leaves, off) at, `fall` the same for a falling price
+    __slots__ = ("rise", "rise_leaf", "fall", "fall_leaf", "leaves")
+
+    def __init__(self):
+        self.rise, self.rise_leaf = array("d"), array("l")
+        self.fall, self.fall_leaf = array("d"), array("l")
+        self.leaves = set()
+
+
+class RuleBook:
+    # Rules compiled into per-token threshold plans. Every leaf is a two-level switch on
+    # one token's price: a rising-side leaf turns on at price >= level and off again below
+    # level * (1 - hysteresis%), a falling-side one mirrored. A tick from prev to price
+    # bisects the token's sorted thresholds once and walks only the leaves it crossed, so
+    # the cost per tick does not grow with the number of rules on the token. A rule fires
+    # when its expression goes from false to true, at most once per cooldown; the first
+    # price seen for a token only sets leaf states, so a level already passed never fires
+    # on arrival.
+    def __init__(self, wc=None):
+        self._wc = wc  # token -> weekly close, for pct_* leaves
+        self._plans = {}
+        self._rules = {}
+        self._last = {}
+        self._pct = {}  # token -> its pct_* leaves
+        self.on = bytearray()
+        self.rising = bytearray()
+        self.event = bytearray()
+        self.hysteresis = array("d")
+        self.rise_at = array("d")
+        self.fall_at = array("d")
+        self.leaf_rule = []
+        self.leaf_spec = []
+        self._free = []
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, uid):
+        return uid in self._rules
+
+    def add(self, uid, payload, tree, leaves, hysteresis=0.0, cooldown=0.0, once=False):
+        if uid in self._rules: self.remove(uid)
+        ids = [self._leaf(spec, hysteresis) for spec in leaves]
+        rule = _Rule(uid, payload, None if isinstance(tree, int) else self._compile(tree, ids), ids, cooldown, once)
+        for leaf in ids:
+            self.leaf_rule[leaf] = rule
+            self._place(leaf)
+        self._rules[uid] = rule
+        if rule.test is not None: rule.value = rule.test(self.on, -1)
+        return rule
+
+    def _compile(self, tree, ids):
+        # The expression becomes nested closures of (leaf states, leaf that just turned on):
+        # an event leaf is true only as that leaf, a state leaf while it is on. Each AND/OR
+        # node checks its own leaves with plain loops before calling into sub-expressions.
+        def build(node):
+            if isinstance(node, int):
+                leaf = ids[node]
+                if self.event[leaf]: return lambda on, edge: edge == leaf
+                return lambda on, edge: bool(on[leaf])
+            kind, children = node
+            events = [ids[n] for n in children if isinstance(n, int) and self.event[ids[n]]]
+            states = [ids[n] for n in children if isinstance(n, int) and not self.event[ids[n]]]
+            subs = [build(n) for n in children if not isinstance(n, int)]
+            if kind == "and":
+                def test(on, edge):
+                    for leaf in events:
+                        if edge != leaf: return False
+                    for leaf in states:
+                        if not on[leaf]: return False
+                    for sub in subs:
+                        if not sub(on, edge): return False
+                    return True
+            else:
+                def test(on, edge):
+                    for leaf in events:
+                        if edge == leaf: return True
+                    for leaf in states:
+                        if on[leaf]: return True
+                    for sub in subs:
+                        if sub(on, edge): return True
+                    return False
+            return test
+        return build(tree)
+
+    def _leaf(self, spec, hysteresis):
+        token, op, value = spec
+        rising, event = OPS[op]
+        if self._free: leaf = self._free.pop()
+        else:
+            leaf = len(self.on)
+            for column in (self.on, self.rising, self.event, self.hysteresis, self.rise_at, self.fall_at): column.append(0)
+            self.leaf_rule.append(None)
+            self.leaf_spec.append(None)
+        self.on[leaf], self.rising[leaf], self.event[leaf] = 0, rising, event
+        self.hysteresis[leaf] = hysteresis
+        self.leaf_spec[leaf] = spec
+        if op.startswith("pct"): self._pct.setdefault(token, set()).add(leaf)
+        return leaf
+
+    def _level(self, leaf):
+        token, op, value = self.leaf_spec[leaf]
+        if not op.startswith("pct"): return value
+        wc = self._wc(token) if self._wc else 0.0
+        if not wc: return None
+        return wc * (1 + value / 100.0) if op == "pct_up" else wc * (1 - value / 100.0)
+
+    def _place(self, leaf):
+        # Thresholds are stored as inclusive ">= x" on the rising side and "<= x" on the
+        # falling side; strict comparisons are moved one float step to fit
+        level = self._level(leaf)
+        if level is None: return
+        token = self.leaf_spec[leaf][0]
+        plan = self._plans.get(token)
+        if plan is None: plan = self._plans[token] = _Plan()
+        h = self.hysteresis[leaf] / 100.0
+        if self.rising[leaf]: rise, fall = level, math.nextafter(level * (1 - h), -math.inf)
+        else: rise, fall = math.nextafter(level * (1 + h), math.inf), level
+        self.rise_at[leaf], self.fall_at[leaf] = rise, fall
+        i = bisect.bisect_right(plan.rise, rise)
+        plan.rise.insert(i, rise)
+        plan.rise_leaf.insert(i, leaf)
+        i = bisect.bisect_right(plan.fall, fall)
+        plan.fall.insert(i, fall)
+        plan.fall_leaf.insert(i, leaf)
+        plan.leaves.add(leaf)
+        price = self._last.get(token)
+        if price is not None: self.on[leaf] = price >= level if self.rising[leaf] else price <= level
+
+    def _unplace(self, leaf):
+        token = self.leaf_spec[leaf][0]
+        plan = self._plans.get(token)
+        if plan is None or leaf not in plan.leaves: return
+        for levels, ids, at in ((plan.rise, plan.rise_leaf, self.rise_at[leaf]), (plan.fall, plan.fall_leaf, self.fall_at[leaf])):
+            i = bisect.bisect_left(levels, at)
+            while ids[i] != leaf: i += 1
+            del levels[i], ids[i]
+        plan.leaves.discard(leaf)
+        self.on[leaf] = 0
+        if not plan.leaves: del self._plans[token]
+
+    def remove(self, uid):
+        rule = self._rules.pop(uid, None)
+        if rule is None: return None
+        for leaf in rule.leaves:
+            self._unplace(leaf)
+            token, op, value = self.leaf_spec[leaf]
+            if op.startswith("pct"): self._pct[token].discard(leaf)
+            self.leaf_rule[leaf] = self.leaf_spec[leaf] = None
+            self._free.append(leaf)
+        return rule.payload
+
+    def retarget(self, token):
+        # Re-places pct_* leaves on a token after its weekly close changed
+        for leaf in self._pct.get(str(token), ()):
+            self._unplace(leaf)
+            self._place(leaf)
+
+    def evaluate(self, token, price, now=None):
+        # Payloads of the rules this price fires; rules marked once are removed
+        return [payload for _, payload in self.evaluate_batch(((token, price),), now)]
+
+    def _arm(self, plan, price):
+        # First price for a token: leaf states only, nothing fires
+        on, rising, rise_at, fall_at = self.on, self.rising, self.rise_at, self.fall_at
+        for leaf in plan.leaves:
+            on[leaf] = price >= rise_at[leaf] if rising[leaf] else price <= fall_at[leaf]
+        for leaf in plan.leaves:
+            rule = self.leaf_rule[leaf]
+            if rule.test is not None: rule.value = rule.test(on, -1)
+
+    def evaluate_batch(self, ticks, now=None):
+        # (token, payload) for every rule a batch of (token, price) ticks fires, in tick order.
+        # One pass with the columns bound to locals; the batch shares one clock reading for
+        # cooldowns. Rules marked once are removed as soon as they fire.
+        now = time.time() if now is None else now
+        last, plans, leaf_rule = self._last, self._plans, self.leaf_rule
+        on, side = self.on, self.rising
+        bisect_left, bisect_right = bisect.bisect_left, bisect.bisect_right
+        fired = []
+        for token, price in ticks:
+            prev = last.get(token)
+            last[token] = price
+            plan = plans.get(token)
+            if plan is None: continue
+            if prev is None:
+                self._arm(plan, price)
+                continue
+            if price > prev:
+                levels, rising = plan.rise, 1
+                i, j = bisect_right(levels, prev), bisect_right(levels, price)
+                if i == j: continue
+                ids = plan.rise_leaf[i:j]
+            elif price < prev:
+                levels, rising = plan.fall, 0
+                i, j = bisect_left(levels, price), bisect_left(levels, prev)
+                if i == j: continue
+                ids = plan.fall_leaf[i:j]
+            else: continue
+            done = None
+            for leaf in ids:
+                turn_on = side[leaf] == rising
+                if on[leaf] == turn_on: continue
+                on[leaf] = turn_on
+                rule = leaf_rule[leaf]
+                if rule.test is None: value = turn_on
+                elif not turn_on and not rule.value: continue  # AND/OR only: a leaf turning off can't make it true
+                else: value = rule.test(on, leaf if turn_on else -1)
+                if value and not rule.value and now - rule.fired >= rule.cooldown:
+                    rule.fired = now
+                    fired.append((token, rule.payload))
+                    if rule.once:
+                        if done is None: done = []
+                        done.append(rule.id)
+                rule.value = value
+            if done:
+                for uid in done: self.remove(uid)
+        return fired
+
+    def clear(self):
+        self.__init__(self._wc)
@@ -0,0 +1,188 @@
+import codecs
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+import time
+
+SCRIP_MASTER_URL = "https://margincalculator.angelone.in/OpenAPI_File/files/OpenAPIScripMaster.json"
+# SmartWebSocketV2 exchangeType per exch_seg
+EXCHANGE_TYPES = {"NSE": 1, "NFO": 2, "BSE": 3, "BFO": 4, "MCX": 5, "NCDEX": 7, "CDS": 13}
+SEGMENTS = tuple(EXCHANGE_TYPES)
+FIELDS = ("token", "symbol", "name", "expiry", "instrumenttype")
+
+# File layout: header | meta json | fixed-width records | string pool
+MAGIC, VERSION = b"TYSM", 1
+_HEADER = struct.Struct("<4sHII")                   # magic, version, record count, meta length
+_RECORD = struct.Struct("<" + "IH" * len(FIELDS) + "BI")  # (pool offset, length) per field, segment, lot size
+_SKIP = re.compile(r"[\s,\[]*")
+MAX_PENDING = 1 << 20
+
+
+def iter_json_array(chunks):
+    # Yields the objects of a top-level JSON array as the bytes arrive; only the
+    # unparsed tail of the current chunk is held in memory.
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    for chunk in chunks:
+        buf += text.decode(chunk)
+        pos = 0
+        while True:
+            pos = _SKIP.match(buf, pos).end()
+            if pos >= len(buf): break
+            if buf[pos] == "]": return
+            try: obj, pos = decoder.raw_decode(buf, pos)
+            except ValueError: break
+            yield obj
+        buf = buf[pos:]
+        if len(buf) > MAX_PENDING: raise ValueError("Scrip master record exceeds buffer limit")
+
+
+def segment_filter(segments):
+    wanted = set(segments)
+    def keep(s):
+        seg = s.get("exch_seg")
+        return seg in wanted and (seg != "NSE" or "-EQ" in s.get("symbol", ""))
+    return keep
+
+
+def write_cache(path, records, meta):
+    # Records and strings stream into temp files, so peak memory does not depend on the
+    # number of instruments. Repeated values (names, expiries, types) share one pool entry.
+    count = pool_size = 0
+    shared = {}
+    seg_index = {seg: i for i, seg in enumerate(SEGMENTS)}
+    with tempfile.TemporaryFile() as rec_f, tempfile.TemporaryFile() as pool_f:
+        for s in records:
+            fields = []
+            for name in FIELDS:
+                value = str(s.get(name) or "")
+                ref = shared.get(value) if name not in ("token", "symbol") else None
+                if ref is None:
+                    raw = value.encode()
+                    ref = (pool_size, len(raw))
+                    pool_f.write(raw)
+                    pool_size += len(raw)
+                    if name not in ("token", "symbol") and len(shared) < 65536: shared[value] = ref
+                fields += ref
+            try: lot = int(float(s.get("lotsize") or 1))
+            except ValueError: lot = 1
+            rec_f.write(_RECORD.pack(*fields, seg_index.get(s.get("exch_seg"), 255), lot))
+            count += 1
+        meta_raw = json.dumps(meta).encode()
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as out:
+                out.write(_HEADER.pack(MAGIC, VERSION, count, len(meta_raw)))
+                out.write(meta_raw)
+                rec_f.seek(0)
+                shutil.copyfileobj(rec_f, out)
+                pool_f.seek(0)
+                shutil.copyfileobj(pool_f, out)
+        except Exception:
+            _remove(tmp)
+            raise
+    return tmp
+
+
+def _remove(path):
+    try: os.remove(path)
+    except OSError: pass
+
+
+def _versions(path):
+    # (version, file) for every versioned cache of `path`: scripmaster.bin has
+    # scripmaster.<version>.bin, version being the write time in ns
+    folder, name = os.path.split(os.path.abspath(path))
+    root, ext = os.path.splitext(name)
+    out = []
+    for entry in os.listdir(folder):
+        version = entry[len(root) + 1:len(entry) - len(ext)] if entry.startswith(root + ".") and entry.endswith(ext) else ""
+        if version.isdigit(): out.append((int(version), os.path.join(folder, entry)))
+    return sorted(out)
+
+
+def latest_cache(path):
+    # Newest cache file for `path`, or None. The unversioned name is what older builds wrote.
+    versions = _versions(path)
+    if versions: return versions[-1][1]
+    return path if os.path.exists(path) else None
+
+
+def prune_caches(path, keep):
+    # Deletes every cache of `path` except `keep`. Only call once no table maps them any more
+    # (Windows will not delete a mapped file); one that still can't go is tried next time.
+    for _, old in _versions(path):
+        if os.path.abspath(old) != os.path.abspath(keep): _remove(old)
+    if os.path.exists(path) and os.path.abspath(path) != os.path.abspath(keep): _remove(path)
+
+
+class ScripTable:
+    # Read-only, memory-mapped view over the cache written by write_cache
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, meta_len = _HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"Unsupported scrip cache {path}")
+        self.meta = json.loads(self._mm[_HEADER.size:_HEADER.size + meta_len])
+        self._count = count
+        self._rec_at = _HEADER.size + meta_len
+        self._pool_at = self._rec_at + count * _RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._count: raise IndexError(i)
+        rec = _RECORD.unpack_from(self._mm, self._rec_at + i * _RECORD.size)
+        item = {name: self._str(rec[2 * n], rec[2 * n + 1]) for n, name in enumerate(FIELDS)}
+        item["exch_seg"] = SEGMENTS[rec[-2]] if rec[-2] < len(SEGMENTS) else ""
+        item["lotsize"] = rec[-1]
+        return item
+
+    def __iter__(self):
+        for i in range(self._count): yield self[i]
+
+    def _str(self, off, length):
+        start = self._pool_at + off
+        return self._mm[start:start + length].decode()
+
+    def field(self, i, name):
+        n = FIELDS.index(name)
+        off, length = struct.unpack_from("<IH", self._mm, self._rec_at + i * _RECORD.size + 6 * n)
+        return self._str(off, length)
+
+    def close(self):
+        self._mm.close()
+
+
+def sync_scrip_master(path, segments=("NSE",), current=None, timeout=60):
+    # Conditional GET against the cached ETag/Last-Modified; returns (table, changed)
+    import requests
+    headers = {}
+    meta = current.meta if current is not None else {}
+    if sorted(meta.get("segments", [])) == sorted(segments):
+        if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+    with requests.get(SCRIP_MASTER_URL, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == 304 and current is not None: return current, False
+        r.raise_for_status()
+        meta = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                "segments": list(segments), "fetched_at": time.time()}
+        keep = segment_filter(segments)
+        # A new file name every time: the current table stays mapped while the caller still
+        # serves searches from it, and Windows will not replace a mapped file. The caller
+        # closes it once the new table is in use, then prune_caches drops the old file.
+        root, ext = os.path.splitext(path)
+        target = f"{root}.{time.time_ns()}{ext}"
+        tmp = write_cache(target, (s for s in iter_json_array(r.iter_content(65536)) if keep(s)), meta)
+    try: os.replace(tmp, target)
+    finally: _remove(tmp)
+    return ScripTable(target), True
@@ -0,0 +1,89 @@
+import bisect
+import heapq
+from array import array
+from collections import Counter
+
+GRAM = 3
+HIGH = "\uffff"
+FUZZY_BUDGET = 1024  # posting entries a fuzzy query reads, rarest trigrams first
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class ScripSearch:
+    # Built once per scrip master load. Prefix queries bisect a sorted symbol array;
+    # substring and fuzzy queries go through a trigram posting index over symbol + name.
+    def __init__(self, table):
+        self.table = table
+        n = len(table)
+        self._symbols = [table.field(i, "symbol").upper() for i in range(n)]
+        self._names = [table.field(i, "name").upper() for i in range(n)]
+        self._order = sorted(range(n), key=self._symbols.__getitem__)
+        self._keys = [self._symbols[i] for i in self._order]
+        postings = {}
+        for i in range(n):
+            for g in _grams(self._symbols[i]) | _grams(self._names[i]):
+                p = postings.get(g)
+                if p is None: p = postings[g] = array("I")
+                p.append(i)
+        self._postings = postings
+        self._last = None
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def search(self, query, k=15):
+        return [self.table[i] for i in self.search_ids(query, k)]
+
+    def search_ids(self, query, k=15):
+        q = query.strip().upper()
+        if not q: return []
+        last = self._last
+        refine = last is not None and q.startswith(last[0])
+        # Prefix tier: lexicographic order inside the range already ranks shorter symbols first
+        lo, hi = (last[1], last[2]) if refine else (0, len(self._keys))
+        lo = bisect.bisect_left(self._keys, q, lo, hi)
+        hi = bisect.bisect_left(self._keys, q + HIGH, lo, hi)
+        results = self._order[lo:min(hi, lo + k)]
+        if len(results) >= k or len(q) < GRAM:
+            self._last = (q, lo, hi, None)
+            return results
+        # Substring tier is only needed once prefix matches run out; it is cached for refinement
+        if refine and last[3] is not None:
+            substr = [i for i in last[3] if q in self._symbols[i] or q in self._names[i]]
+        else:
+            substr = self._substring(q)
+        self._last = (q, lo, hi, substr)
+        seen = set(results)
+        rest = ((0 if q in self._symbols[i] else 1, len(self._symbols[i]), self._symbols[i], i) for i in substr if i not in seen)
+        results += [r[-1] for r in heapq.nsmallest(k - len(results), rest)]
+        if not results: results = self._fuzzy(q, k)
+        return results[:k]
+
+    def _substring(self, q):
+        lists = [self._postings.get(g) for g in _grams(q)]
+        if not lists or any(p is None for p in lists): return []
+        shortest = min(lists, key=len)
+        return [i for i in shortest if q in self._symbols[i] or q in self._names[i]]
+
+    def _fuzzy(self, q, k):
+        # Candidates share trigrams with the query, counted over its rarest trigrams until
+        # FUZZY_BUDGET postings are read; a common trigram says little and can fill the budget
+        # on its own, so it is cut short. Ranked by shared trigrams less the length difference
+        # (symbol without its -EQ style suffix against the query): a transposed pair of letters
+        # costs up to four trigrams, so the count alone would rank a shorter near-miss first.
+        grams = sorted((g for g in _grams(q) if g in self._postings), key=lambda g: len(self._postings[g]))
+        counts, budget = Counter(), FUZZY_BUDGET
+        for g in grams:
+            if budget <= 0: break
+            p = self._postings[g]
+            counts.update(p if len(p) <= budget else p[:budget])
+            budget -= len(p)
+        if not counts: return []
+        need = max(1, len(grams) // 3)
+        symbols, n = self._symbols, len(q)
+        best = heapq.nsmallest(k, ((abs(len(symbols[i].partition("-")[0]) - n) - c, -c, len(symbols[i]), i)
+                                   for i, c in counts.items() if c >= need))
+        return [r[-1] for r in best]
@@ -0,0 +1,152 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+STATE_DB = "tradeyantra.db"
+# Live-only stock fields (held on the price book now, kept here for older records);
+# everything else on a watchlist entry is persisted
+TRANSIENT_KEYS = {"ltp", "loading", "volume", "ohlc", "ltt", "prev_close"}
+
+_SCHEMA = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS watchlist (token TEXT PRIMARY KEY, position INTEGER, data TEXT);
+CREATE TABLE IF NOT EXISTS alerts (id TEXT PRIMARY KEY, token TEXT, symbol TEXT, price REAL, condition TEXT, created REAL);
+CREATE TABLE IF NOT EXISTS rules (id TEXT PRIMARY KEY, data TEXT, created REAL);
+CREATE TABLE IF NOT EXISTS alert_history (ts REAL, alert_id TEXT, token TEXT, symbol TEXT, price REAL, condition TEXT, ltp REAL);
+CREATE INDEX IF NOT EXISTS watchlist_position ON watchlist (position);
+CREATE INDEX IF NOT EXISTS alert_history_ts ON alert_history (ts);
+"""
+
+
+def stock_record(stock):
+    return {k: v for k, v in stock.items() if k not in TRANSIENT_KEYS and not k.endswith('_control')}
+
+
+class StateStore:
+    # Each mutation is one row-level statement queued to a writer thread, which commits
+    # whatever has accumulated as a single transaction. Reads use their own connection.
+    def __init__(self, path=STATE_DB, batch_window=0.05):
+        self.path = path
+        self.batch_window = batch_window
+        self._queue = queue.Queue()
+        self._writer = None
+        self._read_lock = threading.Lock()
+        self._read = sqlite3.connect(path, check_same_thread=False)
+        self._read.executescript(_SCHEMA)
+        self.writes = self.commits = 0
+
+    # Reads
+    def _query(self, sql, params=()):
+        with self._read_lock: return self._read.execute(sql, params).fetchall()
+
+    def is_empty(self):
+        return not self._query("SELECT 1 FROM settings LIMIT 1") and not self._query("SELECT 1 FROM watchlist LIMIT 1")
+
+    def load_settings(self):
+        return {k: json.loads(v) for k, v in self._query("SELECT key, value FROM settings")}
+
+    def load_watchlist(self):
+        return [json.loads(d) for (d,) in self._query("SELECT data FROM watchlist ORDER BY position")]
+
+    def load_alerts(self):
+        return [{"id": i, "token": t, "symbol": s, "price": p, "condition": c}
+                for i, t, s, p, c in self._query("SELECT id, token, symbol, price, condition FROM alerts ORDER BY created")] + \
+               [json.loads(d) for (d,) in self._query("SELECT data FROM rules ORDER BY created")]
+
+    def trigger_history(self, limit=100, since=None):
+        return self._query("SELECT ts, alert_id, token, symbol, price, condition, ltp FROM alert_history WHERE ts >= ? "
+                           "ORDER BY ts DESC LIMIT ?", (since or 0, limit))
+
+    # Writes
+    def _write(self, sql, params=(), many=False):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="state-writer", daemon=True)
+            self._writer.start()
+        self._queue.put((sql, params, many))
+
+    def put_setting(self, key, value):
+        self._write("INSERT OR REPLACE INTO settings VALUES (?, ?)", (key, json.dumps(value)))
+
+    def upsert_stock(self, stock):
+        # New tokens go to the end of the list; existing ones keep their position
+        self._write("INSERT INTO watchlist VALUES (?, (SELECT COALESCE(MAX(position) + 1, 0) FROM watchlist), ?) "
+                    "ON CONFLICT (token) DO UPDATE SET data = excluded.data",
+                    (str(stock['token']), json.dumps(stock_record(stock))))
+
+    def delete_stock(self, token):
+        self._write("DELETE FROM watchlist WHERE token = ?", (str(token),))
+
+    def add_alert(self, alert):
+        # Expression rules keep their whole dict (expression, symbol map); price alerts a row
+        if alert['condition'] == "RULE":
+            self._write("INSERT OR REPLACE INTO rules VALUES (?, ?, ?)", (alert['id'], json.dumps(alert), time.time()))
+            return
+        self._write("INSERT OR REPLACE INTO alerts VALUES (?, ?, ?, ?, ?, ?)",
+                    (alert['id'], str(alert['token']), alert['symbol'], alert['price'], alert['condition'], time.time()))
+
+    def add_alerts(self, alerts):
+        # Price alerts in bulk, as one queued statement
+        now = time.time()
+        self._write("INSERT OR REPLACE INTO alerts VALUES (?, ?, ?, ?, ?, ?)",
+                    [(a['id'], str(a['token']), a['symbol'], a['price'], a['condition'], now) for a in alerts], many=True)
+
+    def delete_alert(self, uid):
+        self._write("DELETE FROM alerts WHERE id = ?", (uid,))
+        self._write("DELETE FROM rules WHERE id = ?", (uid,))
+
+    def record_trigger(self, alert, ltp):
+        if not alert.get('repeat'): self.delete_alert(alert['id'])
+        self._write("INSERT INTO alert_history VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), alert['id'], str(alert['token']), alert['symbol'], alert['price'], alert['condition'], ltp))
+
+    def _write_loop(self):
+        db = sqlite3.connect(self.path)
+        db.executescript(_SCHEMA)
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                try: batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty: break
+            try:
+                with db:
+                    for sql, params, many in batch: (db.executemany if many else db.execute)(sql, params)
+                self.writes += len(batch)
+                self.commits += 1
+            except Exception:
+                # The transaction rolled back; redo it one statement at a time so only the
+                # statement that fails is lost
+                for sql, params, many in batch:
+                    try:
+                        with db: (db.executemany if many else db.execute)(sql, params)
+                        self.writes += 1
+                        self.commits += 1
+                    except Exception as e:
+                        print(f"State store write error: {e} in {sql!r} {params!r}"[:500])
+            for _ in batch: self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def import_config(self, config_file):
+        # One-off migration from the old config.json
+        if not os.path.exists(config_file) or not self.is_empty(): return False
+        try:
+            with open(config_file) as f: data = json.load(f)
+        except Exception as e:
+            print(f"Config migration skipped: {e}")
+            return False
+        for key, value in data.items():
+            if key != "watchlist": self.put_setting(key, value)
+        for stock in data.get("watchlist", []): self.upsert_stock(stock)
+        self.flush()
+        return True
@@ -0,0 +1,250 @@
+import json
+import random
+import threading
+
+import websocket
+
+MAX_TOKENS_PER_CONNECTION = 1000  # SmartAPI subscription limit per feed session
+MAX_CONNECTIONS = 3               # concurrent feed sessions allowed per client code
+FEED_MODE = 3                     # snap quote
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    # Full jitter, so shards dropped by the same outage don't reconnect in lockstep
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class FeedConnection:
+    # One SmartWebSocketV2 session and the tokens it carries. `assigned` is what this
+    # session should be subscribed to, `actual` what has been sent on the live socket.
+    def __init__(self, index):
+        self.index = index
+        self.assigned = {}  # token -> exchange type
+        self.actual = {}
+        self.sws = None
+        self.connected = False
+        self.closing = False
+        self.opened = 0
+        self.attempts = 0
+
+
+class SubscriptionManager:
+    # Keeps the feed subscribed to a desired token set. Changes to the set go out as
+    # subscribe/unsubscribe deltas; tokens beyond one session's limit are sharded onto extra
+    # sessions. Each session reconnects on its own with jittered backoff, resubscribes its
+    # tokens on open, and reports them to on_reconnect so the gap can be backfilled.
+    def __init__(self, connect, on_frame, on_status=None, on_reconnect=None, mode=FEED_MODE,
+                 per_connection=MAX_TOKENS_PER_CONNECTION, max_connections=MAX_CONNECTIONS,
+                 backoff=BACKOFF_BASE, max_backoff=BACKOFF_MAX):
+        self._connect = connect  # returns a new SmartWebSocketV2
+        self._on_frame = on_frame
+        self._on_status = on_status
+        self._on_reconnect = on_reconnect
+        self.mode = mode
+        self.per_connection = per_connection
+        self.max_connections = max_connections
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._conns = []
+        self._where = {}     # token -> FeedConnection
+        self._overflow = {}  # desired tokens with no room on any session
+        self._started = False
+        self.reconnects = 0
+
+    # Desired set
+
+    def set_desired(self, items):
+        # items: (token, exchange type) pairs; only the difference from the current set is sent
+        wanted = {str(token): et for token, et in items}
+        with self._lock:
+            for token in [t for t in list(self._where) + list(self._overflow) if t not in wanted]:
+                self._drop(token)
+            for token, et in wanted.items(): self._place(token, et)
+            self._sync_all()
+
+    def add(self, token, exchange_type):
+        with self._lock:
+            conn = self._place(str(token), exchange_type)
+            if conn: self._sync(conn)
+
+    def remove(self, token):
+        with self._lock:
+            if self._drop(str(token)): self._sync_all()
+
+    def _place(self, token, et):
+        conn = self._where.get(token)
+        if conn is not None:
+            if conn.assigned[token] != et: conn.assigned[token] = et
+            return conn
+        conn = next((c for c in self._conns if not c.closing and len(c.assigned) < self.per_connection), None)
+        if conn is None:
+            if len(self._conns) >= self.max_connections:
+                if token not in self._overflow:
+                    print(f"Feed: no room for {token}, {self.max_connections} x {self.per_connection} tokens in use")
+                self._overflow[token] = et
+                return None
+            conn = FeedConnection(len(self._conns))
+            self._conns.append(conn)
+            if self._started: self._spawn(conn)
+        self._overflow.pop(token, None)
+        conn.assigned[token] = et
+        self._where[token] = conn
+        return conn
+
+    def _drop(self, token):
+        if self._overflow.pop(token, None) is not None: return False
+        conn = self._where.pop(token, None)
+        if conn is None: return False
+        del conn.assigned[token]
+        # Freed room goes to tokens that were waiting for it
+        if self._overflow:
+            waiting, et = next(iter(self._overflow.items()))
+            self._place(waiting, et)
+        return True
+
+    def _sync_all(self):
+        for conn in list(self._conns):
+            if not conn.assigned and conn.index > 0: self._retire(conn)
+            else: self._sync(conn)
+
+    def _sync(self, conn):
+        if not conn.connected: return  # the whole assigned set goes out on open
+        subscribe = {t: et for t, et in conn.assigned.items() if conn.actual.get(t) != et}
+        unsubscribe = {t: et for t, et in conn.actual.items() if conn.assigned.get(t) != et}
+        try:
+            if unsubscribe:
+                self._send(conn, conn.sws.UNSUBSCRIBE_ACTION, unsubscribe)
+                for t in unsubscribe: del conn.actual[t]
+            if subscribe:
+                self._send(conn, conn.sws.SUBSCRIBE_ACTION, subscribe)
+                conn.actual.update(subscribe)
+        except Exception as e:
+            # The socket is going away; the reconnect resubscribes from `assigned`
+            print(f"Feed {conn.index}: subscription update failed: {e}")
+
+    def _send(self, conn, action, tokens):
+        # Sent directly: SmartWebSocketV2.subscribe/unsubscribe also append to a shared
+        # resubscribe dict that grows without bound and is corrupted by unsubscribe
+        groups = {}
+        for token, et in tokens.items(): groups.setdefault(et, []).append(token)
+        conn.sws.wsapp.send(json.dumps({"correlationID": f"ty{conn.index}", "action": action,
+                                        "params": {"mode": self.mode, "tokenList": [
+                                            {"exchangeType": et, "tokens": group} for et, group in groups.items()]}}))
+
+    def _retire(self, conn):
+        conn.closing = True
+        self._conns.remove(conn)
+        for i, c in enumerate(self._conns): c.index = i
+        if conn.sws:
+            try: conn.sws.close_connection()
+            except Exception: pass
+
+    # Connections
+
+    def start(self):
+        with self._lock:
+            if self._started: return self
+            self._started = True
+            self._stop.clear()
+            if not self._conns: self._conns.append(FeedConnection(0))
+            for conn in self._conns: self._spawn(conn)
+        self._status()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._started = False
+            for conn in self._conns:
+                conn.closing = True
+                conn.connected = False
+                conn.actual = {}
+                if conn.sws:
+                    try: conn.sws.close_connection()
+                    except Exception as e: print(f"Feed {conn.index}: close error: {e}")
+            self._conns = [FeedConnection(i) for i in range(len(self._conns))]
+            for token, conn in list(self._where.items()):
+                fresh = self._conns[conn.index]
+                fresh.assigned[token] = conn.assigned[token]
+                self._where[token] = fresh
+        self._status()
+
+    def _spawn(self, conn):
+        threading.Thread(target=self._run, args=(conn,), name=f"feed-{conn.index}", daemon=True).start()
+
+    def _run(self, conn):
+        while not self._stop.is_set() and not conn.closing:
+            try:
+                if conn.sws is None: conn.sws = self._socket(conn)
+                conn.sws.connect()  # returns once the socket closes
+            except Exception as e:
+                print(f"Feed {conn.index}: connect error: {e}")
+            with self._lock:
+                conn.connected = False
+                conn.actual = {}
+            if self._stop.is_set() or conn.closing: break
+            delay = backoff_delay(conn.attempts, self.backoff, self.max_backoff)
+            conn.attempts += 1
+            self._status()
+            print(f"Feed {conn.index}: reconnecting in {delay:.1f}s")
+            self._stop.wait(delay)
+
+    def _socket(self, conn):
+        sws = self._connect()
+        sws.input_request_dict = {}
+        def on_data(wsapp, data, data_type, continue_flag):
+            # Binary frames go straight to our decoder; text is only the heartbeat "pong"
+            if data_type == websocket.ABNF.OPCODE_BINARY: self._on_frame(data)
+        def on_error(wsapp, error):
+            print(f"Feed {conn.index}: error: {error}")
+        def on_close(wsapp, *args):
+            print(f"Feed {conn.index}: closed {' '.join(str(a) for a in args if a)}".rstrip())
+        # The library's own handlers retry with blocking sleeps and replay its resubscribe
+        # dict; this manager owns both, so they are replaced outright
+        sws._on_data = on_data
+        sws._on_open = lambda wsapp: self._opened(conn)
+        sws._on_error = on_error
+        sws._on_close = on_close
+        return sws
+
+    def _opened(self, conn):
+        with self._lock:
+            if conn.closing: return
+            conn.connected = True
+            conn.attempts = 0
+            conn.opened += 1
+            conn.actual = {}
+            self._sync(conn)
+            tokens = list(conn.actual)
+        print(f"Feed {conn.index}: connected, {len(tokens)} tokens")
+        self._status()
+        if conn.opened > 1:
+            self.reconnects += 1
+            if self._on_reconnect and tokens: self._on_reconnect(tokens)
+
+    # Status
+
+    def status(self):
+        conns = self._conns
+        up = sum(c.connected for c in conns)
+        if not self._started or not conns: return "DISCONNECTED"
+        if up == len(conns): return "CONNECTED"
+        if up: return "PARTIAL"
+        return "RECONNECTING" if any(c.opened for c in conns) else "CONNECTING"
+
+    def _status(self):
+        if self._on_status: self._on_status(self.status())
+
+    @property
+    def subscribed(self):
+        with self._lock: return {t for c in self._conns for t in c.actual}
+
+    def stats(self):
+        with self._lock:
+            return {"connections": len(self._conns), "connected": sum(c.connected for c in self._conns),
+                    "desired": len(self._where) + len(self._overflow), "subscribed": sum(len(c.actual) for c in self._conns),
+                    "overflow": len(self._overflow), "reconnects": self.reconnects}
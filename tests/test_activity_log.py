@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+import activity_log
+from activity_log import ActivityLog
+
+SYMBOLS = ["RELIANCE-EQ", "RELAXO-EQ", "TCS-EQ", "INFY-EQ", "AUTO"]
+
+
+def fill(log, count, start=0):
+    entries = []
+    for i in range(start, start + count):
+        entries.append(log.add(SYMBOLS[i * 7 % len(SYMBOLS)], f"message {i}", ts=1000.0 + i))
+    return entries
+
+
+def expected(entries, symbol="", since=None):
+    return [e for e in reversed(entries) if e[2].startswith(symbol) and (since is None or e[1] >= since)]
+
+
+def read_all(log, symbol="", since=None, limit=37):
+    out, offset = [], 0
+    while True:
+        page, more = log.page(offset, limit, symbol, since)
+        out += page
+        offset += limit
+        if not more: return out
+
+
+@pytest.mark.parametrize("symbol", ["", "REL", "RELIANCE-EQ", "tcs", "AUTO", "NOPE"])
+def test_pages_match_every_entry_across_ring_and_files(tmp_path, symbol):
+    log = ActivityLog(capacity=50, path=str(tmp_path / "activity.log"), max_bytes=8000, backups=5)
+    entries = fill(log, 600)
+    assert os.path.exists(tmp_path / "activity.log.1")
+    # Only what is still on disk (the oldest file may have rotated away) can be paged
+    oldest = read_all(log)[-1][0]
+    kept = [e for e in entries if e[0] >= oldest]
+    assert read_all(log, symbol) == expected(kept, symbol.upper())
+    assert read_all(log, symbol, since=1300.0) == expected(kept, symbol.upper(), 1300.0)
+    log.close()
+
+
+def test_previous_session_files_are_indexed_on_first_filter(tmp_path):
+    path = str(tmp_path / "activity.log")
+    first = ActivityLog(capacity=20, path=path, max_bytes=1 << 20)
+    entries = fill(first, 200)
+    first.close()
+
+    log = ActivityLog(capacity=20, path=path, max_bytes=1 << 20)
+    assert log._disk[0] is None
+    assert read_all(log, "TCS") == expected(entries, "TCS")
+    assert log._disk[0] is not None
+    # Later entries extend the index built from the old file
+    entries += fill(log, 100, start=200)
+    assert read_all(log, "INFY") == expected(entries, "INFY")
+    assert read_all(log, "") == expected(entries)
+    log.close()
+
+
+def test_index_follows_rotation(tmp_path):
+    log = ActivityLog(capacity=10, path=str(tmp_path / "activity.log"), max_bytes=3000, backups=2)
+    entries = fill(log, 40)
+    assert read_all(log, "AUTO") == expected(entries, "AUTO")
+    entries += fill(log, 80, start=40)
+    oldest = read_all(log)[-1][0]
+    kept = [e for e in entries if e[0] >= oldest]
+    assert read_all(log, "AUTO") == expected(kept, "AUTO")
+    assert read_all(log, "RELIANCE") == expected(kept, "RELIANCE")
+    log.close()
+
+
+def test_sequence_resumes_after_a_rotation_left_the_current_file_empty(tmp_path):
+    path = str(tmp_path / "activity.log")
+    first = ActivityLog(capacity=10, path=path, max_bytes=1 << 20, backups=2)
+    entries = fill(first, 50)
+    first.close()
+    os.replace(path, path + ".1")
+    open(path, "w").close()
+
+    log = ActivityLog(capacity=10, path=path, max_bytes=1 << 20, backups=2)
+    entries += fill(log, 30, start=50)
+    assert [e[0] for e in entries] == list(range(80))
+    assert read_all(log) == expected(entries)
+    assert read_all(log, "AUTO") == expected(entries, "AUTO")
+    log.close()
+
+
+@pytest.mark.parametrize("symbol", ["", "TCS"])
+def test_pages_from_disk_go_through_the_index(tmp_path, monkeypatch, symbol):
+    path = str(tmp_path / "activity.log")
+    first = ActivityLog(capacity=20, path=path, max_bytes=6000, backups=4)
+    entries = fill(first, 300)
+    first.close()
+
+    log = ActivityLog(capacity=20, path=path, max_bytes=6000, backups=4)
+    monkeypatch.setattr(activity_log, "_reverse_lines", None)
+    monkeypatch.setattr(activity_log, "SCAN_DEPTH", 0)
+    oldest = min(e[0] for e in read_all(log, limit=50))
+    kept = [e for e in entries if e[0] >= oldest]
+    want = expected(kept, symbol)
+    page, more = log.page(len(want) - 5, 10, symbol)
+    assert page == want[-5:] and not more
+    in_range = [e for e in want if 1150.0 <= e[1] <= 1200.0]
+    assert read_all(log, symbol, since=1150.0, limit=7) == [e for e in want if e[1] >= 1150.0]
+    page, _ = log.page(0, 100, symbol, since=1150.0, until=1200.0)
+    assert page == in_range
+    log.close()
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from api_scheduler import (PRIORITY_BACKGROUND, PRIORITY_BULK, PRIORITY_NORMAL, PRIORITY_USER, ApiScheduler,
+                           RateLimiter, TransientApiError)
+
+
+def blocked_scheduler(**kwargs):
+    # One worker held on a gate, so everything submitted meanwhile queues up
+    scheduler = ApiScheduler(workers=1, limiter=RateLimiter({}), **kwargs)
+    gate, started = threading.Event(), threading.Event()
+    scheduler.submit(lambda: (started.set(), gate.wait(5)))
+    assert started.wait(5)
+    return scheduler, gate
+
+
+def test_jobs_run_most_urgent_first_then_in_submit_order():
+    scheduler, gate = blocked_scheduler()
+    order = []
+    for name, priority in [("bg", PRIORITY_BACKGROUND), ("bulk1", PRIORITY_BULK), ("user", PRIORITY_USER),
+                           ("normal", PRIORITY_NORMAL), ("bulk2", PRIORITY_BULK)]:
+        scheduler.submit(order.append, name, priority=priority)
+    gate.set()
+    assert scheduler.join(5)
+    scheduler.stop()
+    assert order == ["user", "normal", "bulk1", "bulk2", "bg"]
+
+
+def test_same_key_is_coalesced_and_takes_the_more_urgent_priority():
+    scheduler, gate = blocked_scheduler()
+    order = []
+    assert scheduler.submit(order.append, "a", priority=PRIORITY_NORMAL, key="a")
+    assert scheduler.submit(order.append, "b", priority=PRIORITY_BULK, key="b")
+    assert not scheduler.submit(order.append, "a again", priority=PRIORITY_BULK, key="a")
+    assert not scheduler.submit(order.append, "b again", priority=PRIORITY_USER, key="b")
+    assert scheduler.stats()["depth"] == 2
+    gate.set()
+    assert scheduler.join(5)
+    scheduler.stop()
+    # The first submission's work runs once; "b" moved ahead of "a"
+    assert order == ["b", "a"]
+    stats = scheduler.stats()
+    assert stats["coalesced"] == 2 and stats["completed"] == 3 and stats["depth"] == 0
+
+
+def test_a_key_can_be_queued_again_once_it_ran():
+    scheduler = ApiScheduler(workers=1, limiter=RateLimiter({}))
+    ran = []
+    scheduler.submit(ran.append, 1, key="k")
+    assert scheduler.join(5)
+    assert scheduler.submit(ran.append, 2, key="k")
+    assert scheduler.join(5)
+    scheduler.stop()
+    assert ran == [1, 2]
+
+
+def test_transient_errors_are_retried_with_backoff():
+    scheduler = ApiScheduler(workers=1, limiter=RateLimiter({}), backoff=0.01, max_retries=2)
+    calls = []
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) < 3: raise TransientApiError("exceeding access rate")
+    def broken():
+        raise ValueError("bad symbol")
+    scheduler.submit(flaky)
+    scheduler.submit(broken)
+    assert scheduler.join(5)
+    scheduler.stop()
+    stats = scheduler.stats()
+    assert len(calls) == 3 and stats["retried"] == 2
+    assert stats["completed"] == 1 and stats["failed"] == 1
+
+
+def test_rate_limiter_spaces_calls_to_the_window():
+    limiter = RateLimiter({"candle": [(3, 0.3)]})
+    start = time.monotonic()
+    for _ in range(5): limiter.acquire("candle")
+    # Three go through at once, the next two wait for the bucket to refill at 10/s
+    assert 0.15 <= time.monotonic() - start < 1.0
+    assert limiter.acquire("unlimited") == 0.0
@@ -0,0 +1,81 @@
+import datetime
+
+import pytest
+
+from bars import IST, BarBuilder, bar_time, bucket
+from tick_decoder import MODE_LTP, MODE_QUOTE, TickDecoder, encode_frame
+
+FRIDAY, MONDAY = datetime.date(2026, 10, 9), datetime.date(2026, 10, 12)
+
+
+def at(day, hh, mm, ss=0):
+    return datetime.datetime.combine(day, datetime.time(hh, mm, ss), IST).timestamp()
+
+
+class FakeCandleStore:
+    def __init__(self):
+        self.rows = []
+
+    def put(self, token, interval, rows, replace=False):
+        self.rows += [(token, interval, row[0], replace) for row in rows]
+
+
+@pytest.fixture
+def feed():
+    decoder, store = TickDecoder(), FakeCandleStore()
+    bars = BarBuilder(decoder.tokens, lambda: store, flush_every=3600)
+
+    def tick(token, ts, ltp, mode=MODE_LTP, **kwargs):
+        bars.on_tick(decoder.decode(encode_frame(token, ltp, mode=mode, exchange_ts=int(ts * 1000), **kwargs)))
+
+    yield bars, tick, store
+    bars.stop()
+
+
+def test_intraday_bars_roll_over_on_bucket_boundaries(feed):
+    bars, tick, _ = feed
+    ohlc = (100.0, 105.0, 99.0, 98.0)
+    for ts, ltp, volume in [(at(MONDAY, 9, 15, 10), 100.0, 1000), (at(MONDAY, 9, 15, 40), 105.0, 1500),
+                            (at(MONDAY, 9, 16, 5), 101.0, 1800), (at(MONDAY, 9, 20), 99.0, 2000)]:
+        tick("2885", ts, ltp, mode=MODE_QUOTE, volume=volume, ohlc=ohlc)
+    t = at(MONDAY, 9, 15)
+    # Volume is the change in the cumulative day volume; the first tick of the day has none to diff against
+    assert bars.bars("2885", "1m", forming=False) == [(t, 100.0, 105.0, 100.0, 105.0, 500), (t + 60, 101.0, 101.0, 101.0, 101.0, 300)]
+    assert bars.bars("2885", "1m")[-1] == (t + 300, 99.0, 99.0, 99.0, 99.0, 200)
+    assert bars.bars("2885", "5m") == [(t, 100.0, 105.0, 100.0, 101.0, 800), (t + 300, 99.0, 99.0, 99.0, 99.0, 200)]
+    assert bars.bars("2885", "15m") == [(t, 100.0, 105.0, 99.0, 99.0, 1000)]
+    # The day bar takes the exchange's day OHLC and volume, with the last price as close
+    assert bars.bars("2885", "1D") == [(at(MONDAY, 0, 0), 100.0, 105.0, 99.0, 99.0, 2000)]
+
+
+def test_day_and_week_bars_roll_over_at_the_session_boundary(feed):
+    bars, tick, store = feed
+    tick("2885", at(FRIDAY, 9, 15), 100.0)
+    tick("2885", at(FRIDAY, 12, 0), 95.0)
+    tick("2885", at(FRIDAY, 15, 29, 30), 110.0)
+    tick("11536", at(FRIDAY, 9, 15), 50.0)  # no tick after 15:29: its close is not vouched for
+    tick("2885", at(MONDAY, 9, 15), 120.0)
+    tick("11536", at(MONDAY, 9, 15), 52.0)
+
+    week = bucket(at(FRIDAY, 9, 15), "1W")
+    assert datetime.datetime.fromtimestamp(week, IST).date() == datetime.date(2026, 10, 5)
+    assert bars.bars("2885", "1D", forming=False) == [(at(FRIDAY, 0, 0), 100.0, 110.0, 95.0, 110.0, 0)]
+    assert bars.bars("2885", "1W", forming=False) == [(week, 100.0, 110.0, 95.0, 110.0, 0)]
+    # The forming week is Monday's day bar so far
+    assert bars.bars("2885", "1W")[-1] == (bucket(at(MONDAY, 9, 15), "1W"), 120.0, 120.0, 120.0, 120.0, 0)
+
+    bars.flush()
+    day_rows = {(token, when) for token, interval, when, _ in store.rows if interval == "ONE_DAY"}
+    assert day_rows == {("2885", bar_time(at(FRIDAY, 0, 0)))}
+    assert ("2885", "ONE_WEEK", bar_time(week), False) in store.rows
+    assert bars.bars("11536", "1D", forming=False)[0][4] == 50.0
+
+
+def test_stale_bars_close_without_a_newer_tick(feed):
+    bars, tick, _ = feed
+    tick("2885", at(MONDAY, 9, 15, 10), 100.0)
+    bars.close_stale(at(MONDAY, 9, 16, 2))
+    assert bars.bars("2885", "1m", forming=False) == []
+    bars.close_stale(at(MONDAY, 9, 16, 6))
+    assert bars.bars("2885", "1m") == [(at(MONDAY, 9, 15), 100.0, 100.0, 100.0, 100.0, 0)]
+    assert bars.bars("2885", "5m", forming=False) == []
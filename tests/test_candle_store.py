@@ -0,0 +1,70 @@
+import datetime
+
+import pytest
+
+from candle_store import CandleStore
+
+D = datetime.date
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CandleStore(str(tmp_path / "candles.db"))
+    yield store
+    store.close()
+
+
+def test_coverage_merges_overlapping_and_adjacent_ranges(store):
+    store.mark_covered("2885", "ONE_DAY", D(2026, 1, 1), D(2026, 1, 5))
+    store.mark_covered("2885", "ONE_DAY", D(2026, 1, 10), D(2026, 1, 15))
+    store.mark_covered("2885", "ONE_DAY", D(2026, 1, 20), D(2026, 1, 25))
+    assert len(store.covered("2885", "ONE_DAY")) == 3
+    store.mark_covered("2885", "ONE_DAY", D(2026, 1, 6), D(2026, 1, 9))      # adjacent on both sides
+    store.mark_covered("2885", "ONE_DAY", D(2026, 1, 12), D(2026, 1, 14))    # inside one
+    store.mark_covered("2885", "ONE_DAY", D(2026, 1, 18), D(2026, 1, 27))    # over one
+    assert store.covered("2885", "ONE_DAY") == [(D(2026, 1, 1), D(2026, 1, 15)), (D(2026, 1, 18), D(2026, 1, 27))]
+    store.mark_covered("2885", "ONE_DAY", D(2025, 12, 30), D(2026, 1, 31))   # over everything
+    assert store.covered("2885", "ONE_DAY") == [(D(2025, 12, 30), D(2026, 1, 31))]
+    # Other tokens and intervals keep their own coverage
+    assert store.covered("2885", "ONE_MINUTE") == [] and store.covered("11536", "ONE_DAY") == []
+
+
+def test_missing_is_the_complement_of_coverage(store):
+    store.mark_covered("2885", "ONE_DAY", "2026-01-05", "2026-01-09")
+    store.mark_covered("2885", "ONE_DAY", "2026-01-15", "2026-01-20")
+    assert store.missing("2885", "ONE_DAY", D(2026, 1, 1), D(2026, 1, 31)) == \
+           [(D(2026, 1, 1), D(2026, 1, 4)), (D(2026, 1, 10), D(2026, 1, 14)), (D(2026, 1, 21), D(2026, 1, 31))]
+    assert store.missing("2885", "ONE_DAY", D(2026, 1, 6), D(2026, 1, 8)) == []
+    store.mark_covered("2885", "ONE_DAY", D(2026, 1, 9), D(2026, 1, 1))  # empty range, ignored
+    assert len(store.covered("2885", "ONE_DAY")) == 2
+
+
+def test_sync_fetches_only_gaps_in_request_sized_chunks(store):
+    requests = []
+    def fetch(params):
+        requests.append((params["fromdate"], params["todate"]))
+        day = params["fromdate"][:10]
+        return {"status": True, "data": [[f"{day}T09:15:00+05:30", 1.0, 2.0, 0.5, 1.5, 10]]}
+    store.mark_covered("2885", "ONE_MINUTE", D(2026, 2, 1), D(2026, 2, 10))
+    assert store.sync("2885", "NSE", "ONE_MINUTE", D(2026, 1, 1), D(2026, 2, 20), fetch) == 3
+    # 31 days before the covered stretch in 30-day requests, then the 10 days after it
+    assert requests == [("2026-01-01 09:15", "2026-01-30 15:30"), ("2026-01-31 09:15", "2026-01-31 15:30"),
+                        ("2026-02-11 09:15", "2026-02-20 15:30")]
+    assert store.covered("2885", "ONE_MINUTE") == [(D(2026, 1, 1), D(2026, 2, 20))]
+    assert store.sync("2885", "NSE", "ONE_MINUTE", D(2026, 1, 1), D(2026, 2, 20), fetch) == 0
+    assert [row[0] for row in store.candles("2885", "ONE_MINUTE")][0] == "2026-01-01T09:15:00"
+
+
+def test_failed_fetch_leaves_the_range_uncovered(store):
+    assert store.sync("2885", "NSE", "ONE_DAY", D(2026, 1, 1), D(2026, 1, 31), lambda params: {"status": False}) == 1
+    assert store.covered("2885", "ONE_DAY") == []
+
+
+def test_local_bars_never_overwrite_stored_candles(store):
+    store.put("2885", "ONE_DAY", [("2026-01-02T00:00:00", 10.0, 12.0, 9.0, 11.0, 100)])
+    store.put("2885", "ONE_DAY", [("2026-01-02T00:00:00", 1.0, 1.0, 1.0, 1.0, 1), ("2026-01-09T00:00:00", 11.0, 13.0, 10.0, 12.5, 50)],
+              replace=False)
+    assert store.candles("2885", "ONE_DAY") == [("2026-01-02T00:00:00", 10.0, 12.0, 9.0, 11.0, 100),
+                                                ("2026-01-09T00:00:00", 11.0, 13.0, 10.0, 12.5, 50)]
+    assert store.weekly_close("2885", D(2026, 1, 14)) == 12.5
+    assert store.last_close_before("2885", D(2026, 1, 9)) == ("2026-01-02T00:00:00", 11.0)
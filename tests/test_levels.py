@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from levels import LevelGenerator
+from price_book import PriceBook
+from tick_decoder import TokenTable
+
+# (token, last weekly close, ltp) as the watchlist had them one morning
+WATCHLIST = [("2885", 2987.35, 3001.10), ("11536", 4120.80, 4055.25), ("1594", 1452.60, 1452.60),
+             ("3045", 812.45, 790.05), ("1333", 1688.00, 1720.95), ("99926000", 24811.50, 24960.00),
+             ("3456", 3333.00, 3340.00), ("3499", 3333.05, 3300.00), ("10604", 12.35, 11.90), ("14977", 3.10, 40.0)]
+
+
+def baseline_369_levels(ltp, weekly_close):
+    # The original generator, kept as the reference
+    if weekly_close <= 0: return []
+    levels = []
+    pattern = [30, 60, 90] if weekly_close > 3333 else [3, 6, 9]
+    curr = weekly_close
+    for i in range(10):
+        curr += pattern[i % 3]
+        if curr > ltp: levels.append({"price": round(curr, 2), "type": "ABOVE"})
+    curr = weekly_close
+    for i in range(10):
+        curr -= pattern[i % 3]
+        if curr < ltp: levels.append({"price": round(curr, 2), "type": "BELOW"})
+    return levels
+
+
+def split(levels):
+    return [l["price"] for l in levels if l["type"] == "ABOVE"], [l["price"] for l in levels if l["type"] == "BELOW"]
+
+
+def fixed_set():
+    random.seed(3)
+    pairs = [(wc, ltp) for _, wc, ltp in WATCHLIST]
+    for _ in range(2000):
+        wc = round(random.uniform(1, 9000) / 0.05) * 0.05
+        pairs.append((round(wc, 2), round(wc * random.uniform(0.8, 1.2) / 0.05) * 0.05))
+    # A price sitting exactly on a level is where the generators differ on purpose (below)
+    return [(wc, round(ltp, 2)) for wc, ltp in pairs if all(abs(l["price"] - round(ltp, 2)) > 0.001 for l in baseline_369_levels(ltp, wc))]
+
+
+def test_for_price_matches_the_baseline():
+    gen = LevelGenerator()
+    pairs = fixed_set()
+    assert len(pairs) > 1900
+    for wc, ltp in pairs:
+        assert gen.for_price(ltp, wc) == split(baseline_369_levels(ltp, wc)), (wc, ltp)
+
+
+def test_watchlist_levels_match_the_baseline_and_skip_unchanged():
+    book = PriceBook(TokenTable())
+    book.load([{"token": token, "symbol": token} for token, _, _ in WATCHLIST])
+    for token, wc, ltp in WATCHLIST:
+        slot = book.slot_of(token)
+        book.set_wc(slot, wc)
+        book.set_ltp(slot, ltp)
+    gen = LevelGenerator()
+    tokens = [token for token, _, _ in WATCHLIST]
+    out = gen.levels(book, tokens)
+    assert [(token, above, below) for token, above, below in out] == \
+           [(token, *split(baseline_369_levels(ltp, wc))) for token, wc, ltp in WATCHLIST]
+    assert gen.levels(book, tokens, changed_only=True) == []
+    book.set_ltp(book.slot_of("2885"), 3020.0)  # crosses 2987.35 + 3 + 6 + 9 + 3 + 6
+    assert [token for token, _, _ in gen.levels(book, tokens, changed_only=True)] == ["2885"]
+
+
+def test_a_price_on_a_level_is_not_given_it_again():
+    above, below = LevelGenerator().for_price(1470.6, 1452.6)  # 1452.6 + 3 + 6 + 9
+    assert 1470.6 not in above and 1470.6 not in below
+    assert above[0] == 1473.6 and below[0] == 1449.6
+
+
+@pytest.mark.parametrize("patterns, steps, wc, expected", [
+    (((0, (5,)),), 3, 100.0, ([105.0, 110.0, 115.0], [95.0, 90.0, 85.0])),
+    (((1000, (50, 100)), (0, (1, 2))), 4, 2000.0, ([2050.0, 2150.0, 2200.0, 2300.0], [1950.0, 1850.0, 1800.0, 1700.0])),
+])
+def test_configured_patterns(patterns, steps, wc, expected):
+    assert LevelGenerator(patterns, steps).for_price(wc, wc) == expected
@@ -0,0 +1,125 @@
+import json
+import time
+
+import pytest
+
+from fakes import FakeTelegramServer
+from notifier import MAX_MESSAGE_LEN, SEPARATOR, TelegramDispatcher, pack_messages, truncate_html
+
+
+@pytest.fixture
+def telegram():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(FakeTelegramServer(**kwargs).start())
+        return servers[-1]
+
+    yield start
+    for server in servers: server.stop()
+
+
+def dispatcher_for(server, tmp_path, **kwargs):
+    kwargs.setdefault("window", 0.3)
+    return TelegramDispatcher(base_url=server.url, outbox=str(tmp_path / "outbox.jsonl"), **kwargs)
+
+
+def test_pack_messages_respects_limit():
+    texts = [f"alert {i} " + "x" * 90 for i in range(200)]
+    messages = pack_messages(texts)
+    assert all(len(m) <= MAX_MESSAGE_LEN for m in messages)
+    assert [t for m in messages for t in m.split(SEPARATOR)] == texts
+    assert pack_messages(["y" * (MAX_MESSAGE_LEN + 10)]) == ["y" * MAX_MESSAGE_LEN]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("<b>" + "x" * 30 + "</b>", "<b>" + "x" * 17 + "</b>"),
+    ("x" * 22 + "<i>y</i>", "x" * 22),
+    ("x" * 21 + "&amp;" + "y" * 10, "x" * 21),
+    ("<b>bold</b> <a href=\"https://t.me/x\">link text here</a>", "<b>bold</b> "),
+    ("<b>a <i>" + "z" * 30 + "</i></b>", "<b>a <i>zzzzzzzz</i></b>"),
+])
+def test_truncate_html_never_cuts_a_tag_or_entity(text, expected):
+    assert truncate_html(text, 24) == expected
+    assert len(truncate_html(text, 24)) <= 24
+
+
+def test_burst_is_batched_throttled_and_delivered_once(telegram, tmp_path):
+    server = telegram(throttle_first=3, retry_after=0.2)
+    dispatcher = dispatcher_for(server, tmp_path)
+    alerts = [f"🔔 <b>ALERT!</b> SYM{i} hit level {i}" for i in range(1000)]
+    for i, text in enumerate(alerts):
+        assert dispatcher.send("TOKEN", "chat-a" if i % 4 else "chat-b", text)
+    assert dispatcher.flush(30)
+    dispatcher.stop()
+
+    texts = [t for body in server.received for t in body["text"].split(SEPARATOR)]
+    assert sorted(texts) == sorted(alerts)
+    # Batched: a handful of full-size messages per chat, not one request per alert
+    assert len(server.received) < 20
+    assert all(len(body["text"]) <= MAX_MESSAGE_LEN for body in server.received)
+    assert {body["chat_id"] for body in server.received} == {"chat-a", "chat-b"}
+    # Every 429 was waited out and retried, none of it ended up in the outbox
+    assert dispatcher.throttled == server.throttled == 3
+    assert dispatcher.requests == server.requests == len(server.received) + 3
+    stats = dispatcher.stats()
+    assert stats["sent_alerts"] == 1000 and stats["sent_messages"] == len(server.received)
+    assert stats["persisted"] == 0 and stats["dropped"] == 0
+    assert not (tmp_path / "outbox.jsonl").exists()
+
+
+def test_rejected_chat_is_dropped_not_sent(telegram, tmp_path):
+    server = telegram(throttle_first=0, reject={"bad"})
+    dispatcher = dispatcher_for(server, tmp_path)
+    for i in range(10):
+        dispatcher.send("TOKEN", "bad" if i % 2 else "good", f"alert {i}")
+    assert dispatcher.flush(10)
+    dispatcher.stop()
+
+    stats = dispatcher.stats()
+    assert stats["sent_alerts"] == 5 and stats["dropped_alerts"] == 5 and stats["dropped"] == 1
+    assert stats["persisted"] == 0
+    assert [body["chat_id"] for body in server.received] == ["good"]
+
+
+def test_endless_throttling_falls_back_to_outbox(telegram, tmp_path):
+    server = telegram(throttle_first=1000, retry_after=0.01)
+    dispatcher = dispatcher_for(server, tmp_path, window=0.05, max_throttled=3, redeliver_every=3600)
+    dispatcher.send("TOKEN", "chat", "alert 1")
+    assert dispatcher.flush(10)
+    dispatcher.stop()
+
+    assert dispatcher.throttled == 4 and dispatcher.persisted == 1 and not server.received
+    lines = (tmp_path / "outbox.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["text"] for line in lines] == ["alert 1"]
+
+
+def test_long_throttle_goes_to_outbox_without_waiting(telegram, tmp_path):
+    server = telegram(throttle_first=1000, retry_after=600)
+    dispatcher = dispatcher_for(server, tmp_path, window=0.05, max_retry_after=5, redeliver_every=3600)
+    start = time.monotonic()
+    dispatcher.send("TOKEN", "chat", "alert 1")
+    assert dispatcher.flush(10)
+    dispatcher.stop()
+
+    assert time.monotonic() - start < 5
+    assert dispatcher.throttled == 1 and dispatcher.persisted == 1
+    lines = (tmp_path / "outbox.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["text"] for line in lines] == ["alert 1"]
+
+
+def test_outbox_is_redelivered_on_its_own_thread(telegram, tmp_path):
+    server = telegram(throttle_first=0)
+    outbox = tmp_path / "outbox.jsonl"
+    outbox.write_text("".join(json.dumps({"bot": "TOKEN", "chat": "chat", "text": f"old {i}", "ts": 0}) + "\n"
+                              for i in range(3)), encoding="utf-8")
+    dispatcher = dispatcher_for(server, tmp_path, window=0.05, redeliver_every=3600)
+    dispatcher.send("TOKEN", "chat", "new")
+    assert dispatcher.flush(10)
+    end = time.monotonic() + 10
+    while dispatcher.redelivered < 3 and time.monotonic() < end: time.sleep(0.01)
+    dispatcher.stop()
+
+    assert sorted(body["text"] for body in server.received) == ["new", "old 0", "old 1", "old 2"]
+    assert dispatcher.sent_alerts == 1 and dispatcher.redelivered == 3
+    assert not outbox.exists()
@@ -0,0 +1,244 @@
+import re
+
+import pytest
+
+from alert_index import AlertIndex
+from rules import RuleBook, parse
+
+
+def resolve(symbol):
+    return {"RELIANCE-EQ": "2885", "TCS-EQ": "11536"}.get(symbol.upper())
+
+
+def book_with(text, wc=None, uid="r1"):
+    book = RuleBook(wc)
+    tree, leaves, options = parse(text, resolve)
+    book.add(uid, uid, tree, leaves, **options)
+    return book
+
+
+def feed(book, token, prices, start=0.0, step=1.0):
+    # Every price's fired payloads, one second apart
+    return [book.evaluate(token, price, start + i * step) for i, price in enumerate(prices)]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("RELIANCE-EQ cross_up", "ends where a number"),
+    ("RELIANCE-EQ jumps 10", "Unknown operator"),
+    ("INFY-EQ above 10", "Unknown symbol"),
+    ("RELIANCE-EQ above ten", "Bad number"),
+    ("(RELIANCE-EQ above 10", "ends where )"),
+    ("(RELIANCE-EQ above 10 TCS-EQ", "Missing )"),
+    ("RELIANCE-EQ above 10 cooldown", "ends where a number"),
+    ("RELIANCE-EQ above 10 forever", "Unexpected 'forever'"),
+])
+def test_parse_errors(text, message):
+    with pytest.raises(ValueError, match=re.escape(message)): parse(text, resolve)
+
+
+def test_parse_tree_and_options():
+    tree, leaves, options = parse("reliance-eq CROSS_UP 2950 and (TCS-EQ pct_up 0.5 OR 99 below 10) "
+                                  "hysteresis 1 Cooldown 300 once", resolve)
+    assert leaves == [("2885", "cross_up", 2950.0), ("11536", "pct_up", 0.5), ("99", "below", 10.0)]
+    assert tree == ("and", [0, ("or", [1, 2])])
+    assert options == {"hysteresis": 1.0, "cooldown": 300.0, "once": True}
+
+
+def test_first_price_only_arms():
+    book = book_with("RELIANCE-EQ above 100")
+    assert feed(book, "2885", [150, 160]) == [[], []]
+    assert feed(book, "2885", [90, 101], start=10) == [[], ["r1"]]
+
+
+def test_cross_fires_on_the_crossing_tick_only():
+    book = book_with("RELIANCE-EQ cross_up 100")
+    assert feed(book, "2885", [90, 95, 100, 105, 110, 99, 120]) == [[], [], ["r1"], [], [], [], ["r1"]]
+
+
+def test_jump_over_several_levels_fires_each_once():
+    book = RuleBook()
+    for uid, level in (("a", 101), ("b", 102), ("c", 103), ("d", 110)):
+        tree, leaves, options = parse(f"2885 cross_up {level}")
+        book.add(uid, uid, tree, leaves, **options)
+    book.evaluate("2885", 100, 0)
+    assert sorted(book.evaluate("2885", 105, 1)) == ["a", "b", "c"]
+    assert book.evaluate("2885", 109, 2) == []
+
+
+def test_hysteresis_rearms_only_after_pulling_back():
+    book = book_with("RELIANCE-EQ cross_up 100 hysteresis 1")
+    # 99.5 is inside the 1% band below 100, so the leaf stays on and 100 again is no new cross
+    assert feed(book, "2885", [95, 100, 99.5, 100.5, 98.9, 100]) == [[], ["r1"], [], [], [], ["r1"]]
+
+
+def test_falling_side_hysteresis():
+    book = book_with("RELIANCE-EQ cross_down 100 hysteresis 2")
+    assert feed(book, "2885", [105, 100, 101.5, 99, 102.1, 100]) == [[], ["r1"], [], [], [], ["r1"]]
+
+
+def test_cooldown_suppresses_refires():
+    book = book_with("RELIANCE-EQ cross_up 100 cooldown 60")
+    prices = [90, 101, 90, 101, 90, 101]
+    fired = [book.evaluate("2885", price, now) for price, now in zip(prices, (0, 10, 20, 30, 40, 71))]
+    assert fired == [[], ["r1"], [], [], [], ["r1"]]
+
+
+def test_once_removes_the_rule():
+    book = book_with("RELIANCE-EQ cross_up 100 once")
+    assert feed(book, "2885", [90, 101]) == [[], ["r1"]]
+    assert "r1" not in book and len(book) == 0
+    assert feed(book, "2885", [90, 101], start=10) == [[], []]
+
+
+def test_cross_symbol_and_needs_the_other_side_true():
+    book = book_with("RELIANCE-EQ cross_up 100 AND TCS-EQ above 3000")
+    book.evaluate("11536", 2900, 0)
+    assert feed(book, "2885", [90, 101, 90], start=1) == [[], [], []]
+    book.evaluate("11536", 3100, 5)
+    # TCS turning on is a state change, not the event, so nothing fires until RELIANCE crosses again
+    assert book.evaluate("11536", 3200, 6) == []
+    assert book.evaluate("2885", 101, 7) == ["r1"]
+
+
+def test_cross_symbol_or_fires_from_either_token():
+    book = book_with("RELIANCE-EQ above 100 OR TCS-EQ below 3000")
+    book.evaluate("2885", 90, 0)
+    book.evaluate("11536", 3100, 0)
+    assert book.evaluate("11536", 2990, 1) == ["r1"]
+    # Already true: RELIANCE joining in does not fire it again
+    assert book.evaluate("2885", 101, 2) == []
+    assert book.evaluate("11536", 3100, 3) == []
+    assert book.evaluate("2885", 90, 4) == []
+    assert book.evaluate("2885", 101, 5) == ["r1"]
+
+
+def test_nested_expression():
+    book = book_with("RELIANCE-EQ cross_up 100 AND (TCS-EQ above 3000 OR TCS-EQ below 2000)")
+    book.evaluate("11536", 2500, 0)
+    assert feed(book, "2885", [90, 101]) == [[], []]
+    book.evaluate("11536", 1900, 2)
+    assert feed(book, "2885", [90, 101], start=3) == [[], ["r1"]]
+
+
+def test_retarget_after_weekly_close_change():
+    wc = {"2885": 100.0}
+    book = book_with("RELIANCE-EQ pct_up 5", wc=wc.get)
+    assert feed(book, "2885", [100, 104, 105.5]) == [[], [], ["r1"]]
+    book.evaluate("2885", 100, 3)
+    wc["2885"] = 110.0
+    book.retarget("2885")
+    # 105.5 was 5% over the old close; against 110 the level is now 115.5
+    assert feed(book, "2885", [105.5, 115, 116], start=4) == [[], [], ["r1"]]
+
+
+def test_pct_leaf_waits_for_a_weekly_close():
+    wc = {}
+    book = book_with("RELIANCE-EQ pct_down 10", wc=wc.get)
+    assert feed(book, "2885", [100, 80]) == [[], []]
+    wc["2885"] = 100.0
+    book.retarget("2885")
+    assert feed(book, "2885", [95, 89], start=2) == [[], ["r1"]]
+
+
+def test_remove_and_readd_replace_the_rule():
+    book = book_with("RELIANCE-EQ cross_up 100")
+    book.evaluate("2885", 90, 0)
+    tree, leaves, options = parse("RELIANCE-EQ cross_up 200", resolve)
+    book.add("r1", "r1", tree, leaves, **options)
+    assert book.evaluate("2885", 150, 1) == []
+    assert book.evaluate("2885", 201, 2) == ["r1"]
+    assert book.remove("r1") == "r1" and book.remove("r1") is None
+    assert book.evaluate("2885", 90, 3) == [] and book.evaluate("2885", 300, 4) == []
+
+
+def test_alert_index_price_alerts_fire_once():
+    index = AlertIndex([{"id": "a", "symbol": "X", "token": "1", "price": 100.0, "condition": "ABOVE"},
+                        {"id": "b", "symbol": "X", "token": "1", "price": 90.0, "condition": "BELOW"}])
+    assert index.nearest("1", 97) == 100.0 and index.contains("1", 90.0, "BELOW")
+    assert index.pop_triggered("1", 95) == []
+    assert [a["id"] for a in index.pop_triggered("1", 100)] == ["a"]
+    assert index.pop_triggered("1", 95) == [] and index.pop_triggered("1", 101) == []
+    assert len(index) == 1 and not index.contains("1", 100.0)
+    assert index.nearest("1", 97) == 90.0
+
+
+def test_alert_index_levels_fire_once_passed_however_the_price_got_there():
+    index = AlertIndex([{"id": "a", "symbol": "X", "token": "1", "price": 100.0, "condition": "ABOVE"},
+                        {"id": "b", "symbol": "X", "token": "1", "price": 90.0, "condition": "BELOW"}])
+    # First price seen, already past the level (e.g. after a pause or reconnect)
+    assert [a["id"] for a in index.pop_triggered("1", 105)] == ["a"]
+    # Added while the price is already beyond it: fires on the next tick
+    index.add({"id": "c", "symbol": "X", "token": "1", "price": 104.0, "condition": "ABOVE"})
+    index.add({"id": "d", "symbol": "X", "token": "1", "price": 110.0, "condition": "ABOVE"})
+    assert [a["id"] for a in index.pop_triggered("1", 105)] == ["c"]
+    fired = index.pop_triggered_batch([("1", 80), ("1", 111)])
+    assert [(token, a["id"]) for token, a in fired] == [("1", "b"), ("1", "d")]
+    assert len(index) == 0 and not index._keys and not index._books
+
+
+def test_alert_index_replacing_a_rule_with_a_level_drops_the_rule():
+    rule = {"id": "a", "symbol": "X", "token": "1", "price": 0.0, "condition": "RULE", "expr": "1 cross_up 100", "tokens": {}}
+    index = AlertIndex([rule])
+    index.add({"id": "a", "symbol": "X", "token": "1", "price": 120.0, "condition": "ABOVE"})
+    assert "a" not in index.rules and len(index) == 1
+    index.pop_triggered("1", 90)
+    assert index.pop_triggered("1", 101) == []
+
+
+def test_alert_index_rule_alerts_repeat():
+    rule = {"id": "r", "symbol": "RELIANCE-EQ", "token": "2885", "price": 0.0, "condition": "RULE",
+            "expr": "RELIANCE-EQ cross_up 100 AND TCS-EQ pct_up 1", "tokens": {"RELIANCE-EQ": "2885", "TCS-EQ": "11536"}}
+    wc = {"11536": 3000.0}
+    index = AlertIndex([rule], wc=wc.get)
+    index.pop_triggered("11536", 3100)
+    index.pop_triggered("2885", 90)
+    assert index.pop_triggered("2885", 101) == [rule]
+    index.pop_triggered("2885", 90)
+    assert index.pop_triggered("2885", 101) == [rule] and len(index) == 1
+    wc["11536"] = 3100.0
+    index.retarget("11536")
+    index.pop_triggered("2885", 90)
+    assert index.pop_triggered("2885", 101) == []
+
+
+def test_alert_index_readding_an_id_replaces_the_alert():
+    index = AlertIndex([{"id": "a", "symbol": "X", "token": "1", "price": 100.0, "condition": "ABOVE"}])
+    index.add({"id": "a", "symbol": "X", "token": "1", "price": 90.0, "condition": "BELOW"})
+    assert len(index) == 1 and index.nearest("1", 97) == 90.0
+    assert not index.contains("1", 100.0) and index.contains("1", 90.0, "BELOW")
+    index.add({"id": "a", "symbol": "X", "token": "1", "price": 120.0, "condition": "ABOVE"})
+    assert index.nearest("1", 97) == 120.0 and not index.contains("1", 90.0)
+    assert index.remove("a") is not None and index.nearest("1", 97) is None and not index._keys
+
+
+@pytest.mark.parametrize("text", [
+    "RELIANCE-EQ cross_up 1 AND TCS-EQ cross_up 2",
+    "RELIANCE-EQ cross_up 1 AND (TCS-EQ cross_down 2 OR TCS-EQ cross_up 3)",
+    "(RELIANCE-EQ cross_up 1 AND TCS-EQ above 2) AND TCS-EQ cross_down 3",
+])
+def test_and_of_crossings_is_rejected(text):
+    with pytest.raises(ValueError, match="can never fire"): parse(text, resolve)
+
+
+def test_and_of_crossing_and_either_is_accepted():
+    tree, leaves, options = parse("RELIANCE-EQ cross_up 1 AND (TCS-EQ cross_up 2 OR TCS-EQ above 3)", resolve)
+    assert tree == ("and", [0, ("or", [1, 2])])
+
+
+def test_evaluate_batch_reports_the_firing_token():
+    book = RuleBook()
+    for uid, text in (("a", "1 cross_up 100"), ("b", "2 cross_down 50"), ("c", "1 cross_up 105 once")):
+        tree, leaves, options = parse(text)
+        book.add(uid, uid, tree, leaves, **options)
+    assert book.evaluate_batch([("1", 99), ("2", 51)], 0) == []
+    assert book.evaluate_batch([("1", 106), ("2", 49), ("3", 1)], 1) == [("1", "a"), ("1", "c"), ("2", "b")]
+    assert "c" not in book and len(book) == 2
+
+
+def test_alert_index_skips_stored_rules_that_no_longer_parse():
+    bad = {"id": "r", "symbol": "X", "token": "1", "price": 0.0, "condition": "RULE",
+           "expr": "1 cross_up 1 AND 2 cross_up 2", "tokens": {}}
+    good = {"id": "a", "symbol": "X", "token": "1", "price": 100.0, "condition": "ABOVE"}
+    index = AlertIndex([bad, good])
+    assert len(index) == 1 and index.contains("1", 100.0)
+    with pytest.raises(ValueError): index.add(bad)
@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+import requests
+
+import scrip_master
+from scrip_master import ScripTable, latest_cache, prune_caches, sync_scrip_master, write_cache
+
+INSTRUMENTS = [
+    {"token": "2885", "symbol": "RELIANCE-EQ", "name": "RELIANCE", "expiry": "", "instrumenttype": "", "exch_seg": "NSE", "lotsize": "1"},
+    {"token": "11536", "symbol": "TCS-EQ", "name": "TCS", "expiry": "", "instrumenttype": "", "exch_seg": "NSE", "lotsize": "1"},
+    {"token": "99926000", "symbol": "Nifty 50", "name": "NIFTY", "expiry": "", "instrumenttype": "AMXIDX", "exch_seg": "NSE", "lotsize": "1"},
+    {"token": "35001", "symbol": "NIFTY26NOVFUT", "name": "NIFTY", "expiry": "26NOV2026", "instrumenttype": "FUTIDX", "exch_seg": "NFO", "lotsize": "75"},
+]
+
+
+class FakeResponse:
+    def __init__(self, records, status=200, fail_after=None):
+        self.status_code = status
+        self.headers = {"ETag": '"v2"'}
+        self._body = json.dumps(records).encode()
+        self._fail_after = fail_after
+
+    def iter_content(self, size):
+        for i in range(0, len(self._body), 16):
+            if self._fail_after is not None and i >= self._fail_after: raise requests.ConnectionError("reset")
+            yield self._body[i:i + 16]
+
+    def raise_for_status(self):
+        if self.status_code >= 400: raise requests.HTTPError(str(self.status_code))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def cache(tmp_path):
+    path = str(tmp_path / "scripmaster.bin")
+    os.replace(write_cache(path, INSTRUMENTS[:2], {"segments": ["NSE"], "etag": '"v1"'}), path)
+    return path
+
+
+def test_table_round_trip(cache):
+    table = ScripTable(cache)
+    assert len(table) == 2 and table.meta["etag"] == '"v1"'
+    assert table[0]["symbol"] == "RELIANCE-EQ" and table[1]["lotsize"] == 1 and table.field(1, "token") == "11536"
+    table.close()
+
+
+def test_sync_writes_a_new_file_and_leaves_the_old_table_mapped(cache, monkeypatch):
+    monkeypatch.setattr(requests, "get", lambda *a, **k: FakeResponse(INSTRUMENTS))
+    current = ScripTable(cache)
+    table, changed = sync_scrip_master(cache, ("NSE", "NFO"), current)
+    assert changed and table.path != cache
+    # Searches still running on the old table keep working until it is closed
+    assert [s["symbol"] for s in current] == ["RELIANCE-EQ", "TCS-EQ"]
+    # Index rows of Nifty 50 are not equities, so the NSE filter drops them
+    assert [s["symbol"] for s in table] == ["RELIANCE-EQ", "TCS-EQ", "NIFTY26NOVFUT"]
+    assert latest_cache(cache) == table.path
+    current.close()
+    prune_caches(cache, table.path)
+    assert sorted(os.listdir(os.path.dirname(cache))) == [os.path.basename(table.path)]
+
+    monkeypatch.setattr(requests, "get", lambda *a, **k: FakeResponse(INSTRUMENTS[:1]))
+    newer, changed = sync_scrip_master(cache, ("NSE",), table)
+    assert latest_cache(cache) == newer.path and len(newer) == 1
+    table.close()
+    newer.close()
+
+
+def test_not_modified_keeps_the_current_table(cache, monkeypatch):
+    seen = {}
+    def get(url, headers=None, **kwargs):
+        seen.update(headers)
+        return FakeResponse([], status=304)
+    monkeypatch.setattr(requests, "get", get)
+    current = ScripTable(cache)
+    assert sync_scrip_master(cache, ("NSE",), current) == (current, False)
+    assert seen == {"If-None-Match": '"v1"'}
+    current.close()
+
+
+def test_failed_download_leaves_no_temp_file(cache, monkeypatch):
+    monkeypatch.setattr(requests, "get", lambda *a, **k: FakeResponse(INSTRUMENTS, fail_after=64))
+    current = ScripTable(cache)
+    with pytest.raises(requests.ConnectionError): sync_scrip_master(cache, ("NSE",), current)
+    assert os.listdir(os.path.dirname(cache)) == ["scripmaster.bin"]
+    assert latest_cache(cache) == cache
+    current.close()
+
+
+def test_failed_replace_leaves_no_temp_file(cache, monkeypatch):
+    monkeypatch.setattr(requests, "get", lambda *a, **k: FakeResponse(INSTRUMENTS))
+    def replace(src, dst):
+        raise PermissionError(dst)
+    monkeypatch.setattr(scrip_master.os, "replace", replace)
+    with pytest.raises(PermissionError): sync_scrip_master(cache, ("NSE",), None)
+    assert os.listdir(os.path.dirname(cache)) == ["scripmaster.bin"]
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from scrip_master import ScripTable, write_cache
+from scrip_search import ScripSearch
+
+SYMBOLS = [("RELIANCE-EQ", "RELIANCE"), ("RELIANCE26NOVFUT", "RELIANCE"), ("BAINCE-EQ", "BAINCE"),
+           ("RELAXO-EQ", "RELAXO"), ("RELINFRA-EQ", "RELINFRA"), ("ADANIPOWER-EQ", "ADANIPOWER"),
+           ("ADANIPORTS-EQ", "ADANIPORTS"), ("TATAPOWER-EQ", "TATAPOWER"), ("SBIN-EQ", "SBIN")]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "scripmaster.bin")
+    records = ({"token": str(i), "symbol": s, "name": n, "exch_seg": "NSE", "lotsize": "1"} for i, (s, n) in enumerate(SYMBOLS))
+    os.replace(write_cache(path, records, {}), path)
+    table = ScripTable(path)
+    yield ScripSearch(table)
+    table.close()
+
+
+def symbols(index, query):
+    return [s["symbol"] for s in index.search(query)]
+
+
+def test_prefix_ranks_shorter_symbols_first(index):
+    assert symbols(index, "RELI") == ["RELIANCE-EQ", "RELIANCE26NOVFUT", "RELINFRA-EQ"]
+
+
+def test_substring_after_prefix(index):
+    assert symbols(index, "POWER") == ["TATAPOWER-EQ", "ADANIPOWER-EQ"]
+
+
+@pytest.mark.parametrize("query, first", [("RELAINCE", "RELIANCE-EQ"), ("ADANIPOWRE", "ADANIPOWER-EQ"), ("TATAPWOER", "TATAPOWER-EQ")])
+def test_fuzzy_ranks_transposed_letters_first(index, query, first):
+    assert symbols(index, query)[0] == first
+
+
+def test_incremental_typing_matches_fresh_search(index):
+    for j in range(1, len("ADANIPOWRE") + 1):
+        typed = symbols(index, "ADANIPOWRE"[:j])
+        index._last = None
+        assert typed == symbols(index, "ADANIPOWRE"[:j])
@@ -0,0 +1,21 @@
+from store import StateStore
+
+
+def test_failing_statement_only_loses_itself(tmp_path, capsys):
+    store = StateStore(str(tmp_path / "state.db"), batch_window=0.2)
+    store.put_setting("theme", "dark")
+    store.add_alert({"id": "a1", "token": "2885", "symbol": "RELIANCE-EQ", "price": 2500.0, "condition": "ABOVE"})
+    store._write("INSERT INTO missing_table VALUES (?)", (1,))
+    store.put_setting("interval", 5)
+    store.flush()
+    assert store.load_settings() == {"theme": "dark", "interval": 5}
+    assert [a["id"] for a in store.load_alerts()] == ["a1"]
+    assert store.writes == 3
+    assert "missing_table" in capsys.readouterr().out
+
+
+def test_batch_commits_once(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"), batch_window=0.2)
+    for i in range(5): store.put_setting(f"k{i}", i)
+    store.flush()
+    assert store.commits == 1 and store.writes == 5
@@ -0,0 +1,84 @@
+import json
+
+from subscriptions import SubscriptionManager
+
+
+class FakeSocket:
+    SUBSCRIBE_ACTION, UNSUBSCRIBE_ACTION = 1, 0
+
+    def __init__(self, sent):
+        self.wsapp = self
+        self.sent = sent
+        self.closed = False
+
+    def send(self, text):
+        self.sent.append(json.loads(text))
+
+    def close_connection(self):
+        self.closed = True
+
+
+def manager(**kwargs):
+    sent, reconnected = [], []
+    mgr = SubscriptionManager(None, lambda frame: None, on_reconnect=reconnected.append, **kwargs)
+    return mgr, sent, reconnected
+
+
+def open_all(mgr, sent):
+    # What a socket opening does, without the network
+    for conn in mgr._conns:
+        if not conn.connected:
+            conn.sws = FakeSocket(sent)
+            mgr._opened(conn)
+
+
+def changes(sent):
+    # (action, sorted (exchange type, token) pairs) per message sent, oldest first
+    out = [(m["action"], sorted((g["exchangeType"], t) for g in m["params"]["tokenList"] for t in g["tokens"])) for m in sent]
+    sent.clear()
+    return out
+
+
+def test_tokens_shard_across_sessions_and_overflow_waits_for_room():
+    mgr, sent, _ = manager(per_connection=3, max_connections=2)
+    mgr.set_desired([(str(t), 1) for t in range(7)])
+    assert [sorted(c.assigned) for c in mgr._conns] == [["0", "1", "2"], ["3", "4", "5"]]
+    assert mgr.stats()["overflow"] == 1 and mgr.stats()["desired"] == 7
+    mgr.remove("4")
+    assert sorted(mgr._conns[1].assigned) == ["3", "5", "6"] and mgr.stats()["overflow"] == 0
+
+
+def test_only_differences_are_sent():
+    mgr, sent, _ = manager()
+    mgr.set_desired([("2885", 1), ("11536", 1), ("35001", 2)])
+    open_all(mgr, sent)
+    assert changes(sent) == [(1, [(1, "11536"), (1, "2885"), (2, "35001")])]
+    mgr.set_desired([("11536", 1), ("35001", 2), ("1594", 1)])
+    assert changes(sent) == [(0, [(1, "2885")]), (1, [(1, "1594")])]
+    mgr.set_desired([("11536", 1), ("35001", 2), ("1594", 1)])
+    assert changes(sent) == []
+    # A changed exchange type is an unsubscribe of the old pair and a subscribe of the new
+    mgr.add("35001", 4)
+    assert changes(sent) == [(0, [(2, "35001")]), (1, [(4, "35001")])]
+    assert mgr.subscribed == {"11536", "35001", "1594"}
+
+
+def test_empty_extra_session_is_retired():
+    mgr, sent, _ = manager(per_connection=2)
+    mgr.set_desired([("1", 1), ("2", 1), ("3", 1), ("4", 1)])
+    open_all(mgr, sent)
+    extra = mgr._conns[1].sws
+    mgr.set_desired([("1", 1), ("2", 1)])
+    assert len(mgr._conns) == 1 and extra.closed
+    assert mgr.stats()["subscribed"] == 2
+
+
+def test_reopened_session_resubscribes_and_reports_tokens():
+    mgr, sent, reconnected = manager()
+    mgr.set_desired([("2885", 1), ("11536", 1)])
+    open_all(mgr, sent)
+    conn = mgr._conns[0]
+    conn.connected, conn.actual = False, {}
+    mgr._opened(conn)
+    assert changes(sent)[-1] == (1, [(1, "11536"), (1, "2885")])
+    assert sorted(reconnected[0]) == ["11536", "2885"] and mgr.reconnects == 1
@@ -0,0 +1,64 @@
+import pytest
+
+from tick_decoder import (LTP_PACKET_SIZE, MODE_LTP, MODE_QUOTE, MODE_SNAP_QUOTE, QUOTE_PACKET_SIZE,
+                          SNAP_QUOTE_PACKET_SIZE, TickDecoder, decode_limits, encode_frame)
+
+
+@pytest.mark.parametrize("mode, size", [(MODE_LTP, LTP_PACKET_SIZE), (MODE_QUOTE, QUOTE_PACKET_SIZE),
+                                        (MODE_SNAP_QUOTE, SNAP_QUOTE_PACKET_SIZE)])
+def test_frame_sizes(mode, size):
+    assert (LTP_PACKET_SIZE, QUOTE_PACKET_SIZE, SNAP_QUOTE_PACKET_SIZE) == (51, 123, 379)
+    assert len(encode_frame("2885", 1234.5, mode=mode)) == size
+
+
+def test_ltp_frame():
+    decoder = TickDecoder()
+    tick = decoder.decode(encode_frame("2885", 1234.55, mode=MODE_LTP, exchange=1, sequence=7, exchange_ts=1_700_000_000_000))
+    assert decoder.tokens.token(tick.token_id) == "2885"
+    assert (tick.mode, tick.exchange, tick.sequence, tick.exchange_ts, tick.ltp) == (MODE_LTP, 1, 7, 1_700_000_000_000, 1234.55)
+    assert (tick.volume, tick.open, tick.close, tick.last_trade_ts, tick.depth) == (0, 0.0, 0.0, 0, None)
+    assert decoder.decode_ltp(encode_frame("2885", 99.05, mode=MODE_LTP)) == (tick.token_id, 99.05)
+
+
+def test_quote_frame():
+    tick = TickDecoder().decode(encode_frame("11536", 3500.25, mode=MODE_QUOTE, volume=123456,
+                                             ohlc=(3400.0, 3550.5, 3390.75, 3420.1)))
+    assert tick.mode == MODE_QUOTE and tick.ltp == 3500.25 and tick.volume == 123456
+    assert (tick.open, tick.high, tick.low, tick.close) == (3400.0, 3550.5, 3390.75, 3420.1)
+    assert tick.depth is None and tick.last_trade_ts == 0
+
+
+def test_snap_quote_frame_with_depth():
+    depth = [(1, 100.5, 10, 2), (1, 100.0, 20, 3), (0, 101.0, 5, 1), (0, 0.0, 0, 0)]
+    frame = encode_frame("1594", 100.75, mode=MODE_SNAP_QUOTE, volume=9, ohlc=(99.0, 102.0, 98.5, 99.5),
+                         last_trade_ts=1_700_000_123, depth=depth)
+    decoder = TickDecoder()
+    tick = decoder.decode(frame)
+    assert tick.mode == MODE_SNAP_QUOTE and tick.ltp == 100.75 and tick.last_trade_ts == 1_700_000_123
+    assert tick.depth.bids == [(100.5, 10, 2), (100.0, 20, 3)] and tick.depth.asks == [(101.0, 5, 1)]
+    assert decoder.decode(frame, with_depth=False).depth is None
+    assert decode_limits(frame) == (0.0, 0.0, 0.0, 0.0)
+
+
+def test_short_and_truncated_frames():
+    decoder = TickDecoder()
+    assert decoder.decode(b"\x01" * 50) is None and decoder.decode_ltp(b"") is None
+    # A quote header cut short decodes as its LTP part
+    tick = decoder.decode(encode_frame("2885", 10.0, mode=MODE_QUOTE)[:100])
+    assert tick.ltp == 10.0 and tick.volume == 0
+
+
+def test_tokens_are_interned():
+    decoder = TickDecoder()
+    ids = [decoder.decode(encode_frame(token, 1.0, mode=MODE_LTP)).token_id for token in ("2885", "11536", "2885")]
+    assert ids[0] == ids[2] != ids[1] and len(decoder.tokens) == 2
+    assert decoder.tokens.find("11536") == ids[1] and decoder.tokens.find("999") is None
+
+
+def test_decode_batch_columns():
+    frames = [encode_frame("2885", 10.0, mode=MODE_LTP, exchange_ts=5),
+              encode_frame("11536", 20.0, mode=MODE_QUOTE, volume=3, ohlc=(1.0, 2.0, 0.5, 1.5)), b"short"]
+    batch = TickDecoder().decode_batch(frames)
+    assert len(batch) == 2
+    assert list(batch.ltp) == [10.0, 20.0] and list(batch.exchange_ts) == [5, 0]
+    assert list(batch.volume) == [0, 3] and list(batch.high) == [0.0, 2.0]
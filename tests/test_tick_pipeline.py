@@ -0,0 +1,96 @@
+import time
+
+from tick_decoder import MODE_LTP, TickDecoder, encode_frame
+from tick_pipeline import TickPipeline, ltp_tick
+
+
+def make_pipeline(**kwargs):
+    batches = []
+    pipeline = TickPipeline(TickDecoder(), batches.append, **kwargs)
+    return pipeline, batches
+
+
+def test_newest_tick_per_token_is_delivered():
+    pipeline, batches = make_pipeline()
+    for i in range(100):
+        for token in ("2885", "11536", "1594"):
+            pipeline.push_frame(encode_frame(token, 100.0 + i + int(token) % 7, sequence=i))
+    assert pipeline.drain() == 3
+
+    assert len(batches) == 1
+    tokens = pipeline.decoder.tokens
+    latest = {tokens.token(t.token_id): (t.ltp, t.sequence) for t in batches[0]}
+    assert latest == {"2885": (199.0 + 2885 % 7, 99), "11536": (199.0 + 11536 % 7, 99), "1594": (199.0 + 1594 % 7, 99)}
+    stats = pipeline.stats()
+    assert stats["received"] == 300 and stats["delivered"] == 3 and stats["conflated"] == 297
+    assert stats["batches"] == 1 and stats["pending"] == 0
+    assert pipeline.drain() == 0 and pipeline.batches == 1
+
+
+def test_conflation_only_counts_ticks_waiting_for_the_evaluator():
+    pipeline, batches = make_pipeline()
+    pipeline.push_frame(encode_frame("1", 10.0, mode=MODE_LTP))
+    pipeline.drain()
+    pipeline.push_frame(encode_frame("1", 11.0, mode=MODE_LTP))
+    pipeline.push_frame(encode_frame("2", 20.0, mode=MODE_LTP))
+    pipeline.push_frame(encode_frame("1", 12.0, mode=MODE_LTP))
+    pipeline.drain()
+
+    assert [[t.ltp for t in batch] for batch in batches] == [[10.0], [12.0, 20.0]]
+    assert (pipeline.received, pipeline.delivered, pipeline.conflated) == (4, 3, 1)
+
+
+def test_malformed_frames_and_handler_errors_are_counted():
+    def handler(batch):
+        raise RuntimeError("boom")
+
+    pipeline = TickPipeline(TickDecoder(), handler)
+    assert pipeline.push_frame(b"\x01" * 10) is None
+    pipeline.push_frame(encode_frame("1", 10.0))
+    assert pipeline.drain() == 1
+    assert (pipeline.malformed, pipeline.errors, pipeline.delivered) == (1, 1, 1)
+
+
+def test_lag_stats_measure_time_from_receive_to_drain():
+    pipeline, _ = make_pipeline()
+    now = time.perf_counter()
+    pipeline.push(ltp_tick(0, 10.0), recv_ts=now - 0.5)
+    pipeline.push(ltp_tick(1, 20.0), recv_ts=now - 0.1)
+    pipeline.drain()
+
+    stats = pipeline.stats()
+    # The batch's lag is its oldest tick's; the average is over every delivered tick
+    assert 500 <= stats["lag_last_ms"] < 600
+    assert stats["lag_max_ms"] == stats["lag_last_ms"]
+    assert 300 <= stats["lag_avg_ms"] < 400
+
+    pipeline.push(ltp_tick(0, 11.0), recv_ts=time.perf_counter())
+    pipeline.drain()
+    assert pipeline.stats()["lag_last_ms"] < 100
+    assert pipeline.stats()["lag_max_ms"] >= 500
+
+
+def test_slots_grow_past_capacity():
+    pipeline, batches = make_pipeline(capacity=2)
+    for token_id in range(10): pipeline.push(ltp_tick(token_id, float(token_id)))
+    pipeline.drain()
+    assert sorted(t.token_id for t in batches[0]) == list(range(10))
+
+
+def test_evaluator_thread_drains_in_the_background():
+    pipeline, batches = make_pipeline()
+    pipeline.start()
+    try:
+        for i in range(1000): pipeline.push_frame(encode_frame(str(i % 50), 100.0 + i))
+        end = time.monotonic() + 5
+        while pipeline.stats()["pending"] and time.monotonic() < end: time.sleep(0.01)
+    finally:
+        pipeline.stop()
+
+    assert pipeline.received == 1000
+    assert pipeline.delivered + pipeline.conflated == 1000
+    newest = {}
+    for batch in batches:
+        for tick in batch: newest[tick.token_id] = tick.ltp
+    assert newest == {pipeline.decoder.tokens.find(str(t)): 100.0 + 950 + t for t in range(50)}
+
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import engine
+from engine import state
+from tick_decoder import MODE_QUOTE, encode_frame
+from tick_recorder import TickLog, TickRecorder, replay_session
+
+START = 1_760_000_000.0
+
+
+def record(path, prices):
+    rec = TickRecorder(path)
+    for i, price in enumerate(prices):
+        rec.write(encode_frame("1001", price, mode=MODE_QUOTE, volume=i, ohlc=(price, price, price, price)), START + i * 0.5)
+    rec.close()
+
+
+def test_recorded_frames_read_back(tmp_path):
+    path = str(tmp_path / "session.ticks")
+    record(path, [100.0, 101.0])
+    log = TickLog(path)
+    assert [(ts, len(frame)) for ts, frame in log] == [(START, 123), (START + 0.5, 123)]
+    log.close()
+
+
+def test_replay_leaves_live_state_alone(tmp_path):
+    path = str(tmp_path / "session.ticks")
+    record(path, [100.0, 100.5, 101.5, 99.0])
+    state.levels.forget()
+    live = (state.alerts, state.book, state.bars, state.levels, engine.store)
+    watchlist = [{"symbol": "SYM-EQ", "token": "1001", "exch_seg": "NSE", "ltp": 0.0, "wc": 100.0}]
+    alerts = [{"id": "up", "symbol": "SYM-EQ", "token": "1001", "price": 101.0, "condition": "ABOVE"}]
+    threads = {t.name for t in threading.enumerate()}
+    report = replay_session(path, watchlist, alerts, batch_ms=100.0, generate_levels=True)
+
+    assert report["frames"] == 4
+    # Bars are folded on the evaluator thread from the ticks it was handed
+    assert report["bars"]["ticks"] == report["pipeline"]["delivered"] > 0
+    assert [(symbol, condition) for _, symbol, condition, _, _ in report["fired"]][0] == ("SYM-EQ", "ABOVE")
+    assert (state.alerts, state.book, state.bars, state.levels, engine.store) == live
+    assert state.bars.ticks == 0 and not state.levels._seen
+    # The scratch bar builder's flush thread is stopped with it
+    time.sleep(0.05)
+    assert "bar-flush" in threads or "bar-flush" not in {t.name for t in threading.enumerate()}
@@ -0,0 +1,153 @@
+import struct
+from array import array
+from collections import namedtuple
+
+# SmartWebSocketV2 binary packet layout (little endian). Prices are in paise.
+MODE_LTP, MODE_QUOTE, MODE_SNAP_QUOTE = 1, 2, 3
+TOKEN_SLICE = slice(2, 27)
+LTP_PACKET_SIZE, QUOTE_PACKET_SIZE, SNAP_QUOTE_PACKET_SIZE = 51, 123, 379
+
+_HEADER = struct.Struct("<bb25xqqq")         # mode, exchange, (token), sequence, exchange ts, ltp
+_QUOTE = struct.Struct("<qqqddqqqq")         # ltq, avg price, volume, total buy qty, total sell qty, open, high, low, close
+_SNAP = struct.Struct("<qqd")                # last traded ts, open interest, OI change %
+_LTP = struct.Struct("<q")
+_LEVEL = struct.Struct("<hqqh")               # best five depth entry: flag, qty, price, orders (x 10)
+_DEPTH_AT = QUOTE_PACKET_SIZE + 24
+_LIMITS_AT = _DEPTH_AT + 10 * _LEVEL.size
+_LIMITS = struct.Struct("<qqqq")             # upper circuit, lower circuit, 52w high, 52w low
+
+Tick = namedtuple("Tick", "token_id mode exchange sequence exchange_ts ltp ltq avg_price volume "
+                          "total_buy_qty total_sell_qty open high low close last_trade_ts oi depth")
+Depth = namedtuple("Depth", "bids asks")
+_EMPTY = (0, 0.0, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+
+class TokenTable:
+    # Maps the raw 25-byte token field to small integer ids. Lookups hash a memoryview
+    # slice of the frame, so the hot path never builds a str or bytes for the token.
+    def __init__(self):
+        self._ids = {}
+        self._tokens = []
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def register(self, token):
+        key = str(token).encode().ljust(25, b"\x00")
+        tid = self._ids.get(key)
+        if tid is None:
+            tid = self._ids[key] = len(self._tokens)
+            self._tokens.append(str(token))
+        return tid
+
+    def find(self, token):
+        # Id of an already registered token, or None
+        return self._ids.get(str(token).encode().ljust(25, b"\x00"))
+
+    def lookup(self, raw):
+        tid = self._ids.get(raw)
+        if tid is None:
+            return self.register(bytes(raw).rstrip(b"\x00").decode())
+        return tid
+
+    def token(self, tid):
+        return self._tokens[tid]
+
+
+class TickDecoder:
+    def __init__(self, tokens=None):
+        self.tokens = tokens or TokenTable()
+
+    def decode(self, frame, with_depth=True):
+        if type(frame) is not bytes: frame = bytes(frame)
+        size = len(frame)
+        if size < LTP_PACKET_SIZE: return None
+        mode, exchange, seq, exch_ts, ltp = _HEADER.unpack_from(frame)
+        tid = self.tokens.lookup(memoryview(frame)[TOKEN_SLICE])
+        if mode < MODE_QUOTE or size < QUOTE_PACKET_SIZE:
+            return Tick(tid, mode, exchange, seq, exch_ts, ltp / 100.0, *_EMPTY, 0, 0, None)
+        ltq, avg, volume, tbq, tsq, o, h, l, c = _QUOTE.unpack_from(frame, LTP_PACKET_SIZE)
+        ltt = oi = 0
+        depth = None
+        if mode == MODE_SNAP_QUOTE and size >= SNAP_QUOTE_PACKET_SIZE:
+            ltt, oi, _ = _SNAP.unpack_from(frame, QUOTE_PACKET_SIZE)
+            if with_depth: depth = decode_depth(frame)
+        return Tick(tid, mode, exchange, seq, exch_ts, ltp / 100.0, ltq, avg / 100.0, volume, tbq, tsq,
+                    o / 100.0, h / 100.0, l / 100.0, c / 100.0, ltt, oi, depth)
+
+    def decode_ltp(self, frame):
+        # Fast path for the tick loop: (token id, ltp) only
+        if type(frame) is not bytes: frame = bytes(frame)
+        if len(frame) < LTP_PACKET_SIZE: return None
+        return self.tokens.lookup(memoryview(frame)[TOKEN_SLICE]), _LTP.unpack_from(frame, 43)[0] / 100.0
+
+    def decode_batch(self, frames):
+        batch = TickBatch()
+        lookup = self.tokens.lookup
+        for frame in frames:
+            if type(frame) is not bytes: frame = bytes(frame)
+            size = len(frame)
+            if size < LTP_PACKET_SIZE: continue
+            mode, _, _, exch_ts, ltp = _HEADER.unpack_from(frame)
+            batch.token_id.append(lookup(memoryview(frame)[TOKEN_SLICE]))
+            batch.exchange_ts.append(exch_ts)
+            batch.ltp.append(ltp / 100.0)
+            if mode >= MODE_QUOTE and size >= QUOTE_PACKET_SIZE:
+                _, _, volume, _, _, o, h, l, c = _QUOTE.unpack_from(frame, LTP_PACKET_SIZE)
+                batch.volume.append(volume)
+                batch.open.append(o / 100.0)
+                batch.high.append(h / 100.0)
+                batch.low.append(l / 100.0)
+                batch.close.append(c / 100.0)
+            else:
+                batch.volume.append(0)
+                batch.open.append(0.0)
+                batch.high.append(0.0)
+                batch.low.append(0.0)
+                batch.close.append(0.0)
+        return batch
+
+
+class TickBatch:
+    __slots__ = ("token_id", "exchange_ts", "ltp", "volume", "open", "high", "low", "close")
+
+    def __init__(self):
+        self.token_id = array("i")
+        self.exchange_ts = array("q")
+        self.ltp = array("d")
+        self.volume = array("q")
+        self.open = array("d")
+        self.high = array("d")
+        self.low = array("d")
+        self.close = array("d")
+
+    def __len__(self):
+        return len(self.token_id)
+
+
+def decode_depth(frame):
+    bids, asks = [], []
+    for flag, qty, price, orders in _LEVEL.iter_unpack(memoryview(frame)[_DEPTH_AT:_LIMITS_AT]):
+        if qty: (bids if flag == 1 else asks).append((price / 100.0, qty, orders))
+    return Depth(bids, asks)
+
+
+def decode_limits(frame):
+    if len(frame) < SNAP_QUOTE_PACKET_SIZE: return None
+    return tuple(v / 100.0 for v in _LIMITS.unpack_from(frame, _LIMITS_AT))
+
+
+def encode_frame(token, ltp, mode=MODE_SNAP_QUOTE, exchange=1, sequence=0, exchange_ts=0, volume=0,
+                 ohlc=(0.0, 0.0, 0.0, 0.0), last_trade_ts=0, depth=()):
+    # Builds a feed-compatible packet; used by the benchmarks and the replay tools
+    paise = lambda v: int(round(v * 100))
+    out = bytearray(SNAP_QUOTE_PACKET_SIZE if mode == MODE_SNAP_QUOTE else QUOTE_PACKET_SIZE if mode == MODE_QUOTE else LTP_PACKET_SIZE)
+    struct.pack_into("<bb25sqqq", out, 0, mode, exchange, str(token).encode(), sequence, exchange_ts, paise(ltp))
+    if mode >= MODE_QUOTE:
+        _QUOTE.pack_into(out, LTP_PACKET_SIZE, 0, paise(ltp), volume, 0.0, 0.0, *map(paise, ohlc))
+    if mode == MODE_SNAP_QUOTE:
+        _SNAP.pack_into(out, QUOTE_PACKET_SIZE, last_trade_ts, 0, 0.0)
+        levels = list(depth)[:10] + [(0, 0.0, 0, 0)] * (10 - min(len(depth), 10))
+        for i, (flag, price, qty, orders) in enumerate(levels):
+            _LEVEL.pack_into(out, _DEPTH_AT + i * _LEVEL.size, flag, qty, paise(price), orders)
+    return bytes(out)
@@ -0,0 +1,111 @@
+import threading
+import time
+from array import array
+
+import metrics
+from tick_decoder import Tick
+
+_BLANK = (0, 0.0, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0, 0, None)
+
+
+def ltp_tick(token_id, ltp):
+    # Tick for sources that only carry a price (REST quote backfill)
+    return Tick(token_id, 1, 0, 0, 0, ltp, *_BLANK)
+
+
+class TickPipeline:
+    # The websocket reader only decodes into a latest-value-per-token slot (slot == interned
+    # token id); an evaluator thread drains the changed slots in batches. A tick that lands on a
+    # slot still waiting for the evaluator replaces it and counts as conflated.
+    def __init__(self, decoder, handler, capacity=1024, min_interval=0.0):
+        self.decoder = decoder
+        self.handler = handler
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._latest = [None] * capacity
+        self._recv = array("d", bytes(8 * capacity))
+        self._pending = bytearray(capacity)
+        self._dirty = []
+        self._thread = None
+        self._running = False
+        self.received = self.conflated = self.delivered = self.batches = self.malformed = self.errors = 0
+        self.lag_max = self.lag_last = self.lag_total = 0.0
+
+    def _grow(self, slot):
+        extra = max(slot + 1, 2 * len(self._pending)) - len(self._pending)
+        self._latest.extend([None] * extra)
+        self._recv.extend(array("d", bytes(8 * extra)))
+        self._pending.extend(bytes(extra))
+
+    def push_frame(self, frame, recv_ts=None):
+        recv_ts = time.perf_counter() if recv_ts is None else recv_ts
+        tick = self.decoder.decode(frame, with_depth=False)
+        if tick is None:
+            self.malformed += 1
+            return None
+        self.push(tick, recv_ts)
+        return tick
+
+    def push(self, tick, recv_ts=None):
+        slot = tick.token_id
+        with self._lock:
+            if slot >= len(self._pending): self._grow(slot)
+            self._latest[slot] = tick
+            self._recv[slot] = time.perf_counter() if recv_ts is None else recv_ts
+            self.received += 1
+            if self._pending[slot]:
+                self.conflated += 1
+                return
+            self._pending[slot] = 1
+            self._dirty.append(slot)
+            if len(self._dirty) == 1: self._wake.set()
+
+    def drain(self):
+        with self._lock:
+            if not self._dirty: return 0
+            slots, self._dirty = self._dirty, []
+            batch, stamps = [], []
+            for slot in slots:
+                self._pending[slot] = 0
+                batch.append(self._latest[slot])
+                stamps.append(self._recv[slot])
+        now = time.perf_counter()
+        lag = now - min(stamps)
+        self.lag_last = lag
+        self.lag_max = max(self.lag_max, lag)
+        self.lag_total += sum(now - t for t in stamps)
+        observe = metrics.TICK_LAG.observe
+        for t in stamps: observe(now - t)
+        self.delivered += len(batch)
+        self.batches += 1
+        try: self.handler(batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"Tick evaluator error: {e}")
+        return len(batch)
+
+    def start(self):
+        if self._running: return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="tick-evaluator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        self._wake.set()
+        if self._thread: self._thread.join(timeout)
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(0.5)
+            self._wake.clear()
+            self.drain()
+            if self.min_interval: time.sleep(self.min_interval)
+
+    def stats(self):
+        return {"received": self.received, "delivered": self.delivered, "conflated": self.conflated,
+                "batches": self.batches, "malformed": self.malformed, "errors": self.errors,
+                "pending": len(self._dirty), "lag_last_ms": self.lag_last * 1e3, "lag_max_ms": self.lag_max * 1e3,
+                "lag_avg_ms": self.lag_total / self.delivered * 1e3 if self.delivered else 0.0}
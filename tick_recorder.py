@@ -0,0 +1,183 @@
+import argparse
+import datetime
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+TICK_LOG_MAGIC = b"TYTICKS1"
+_RECORD = struct.Struct("<dH")  # receive ts (epoch seconds), frame length; the raw frame follows
+
+
+class TickRecorder:
+    # Appends raw feed frames with their receive time. Buffered; a crash loses at most the
+    # buffer and leaves a truncated last record, which the reader skips.
+    def __init__(self, path, buffer_size=1 << 16):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "ab", buffering=buffer_size)
+        if new: self._file.write(TICK_LOG_MAGIC)
+        self.frames = 0
+
+    def write(self, frame, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            if self._file is None: return
+            self._file.write(_RECORD.pack(ts, len(frame)))
+            self._file.write(frame)
+            self.frames += 1
+
+    def flush(self):
+        with self._lock:
+            if self._file: self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file: self._file.close()
+            self._file = None
+
+
+class TickLog:
+    # Memory-mapped reader; iterating yields (receive ts, frame bytes)
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        if self._mm[:len(TICK_LOG_MAGIC)] != TICK_LOG_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a tick log")
+
+    def __iter__(self):
+        mm, size, unpack, offset = self._mm, self.size, _RECORD.unpack_from, len(TICK_LOG_MAGIC)
+        while offset + _RECORD.size <= size:
+            ts, n = unpack(mm, offset)
+            offset += _RECORD.size
+            if offset + n > size: return
+            yield ts, mm[offset:offset + n]
+            offset += n
+
+    def close(self):
+        if self._mm: self._mm.close()
+        self._file.close()
+
+
+class DryRunNotifier:
+    # Stands in for the Telegram dispatcher during replay
+    def __init__(self):
+        self.messages = []
+
+    def send(self, bot_token, chat_id, text):
+        self.messages.append(text)
+        return True
+
+    def flush(self, timeout=0):
+        return True
+
+    def stop(self, timeout=0):
+        pass
+
+    def stats(self):
+        return {"queued": 0, "enqueued": len(self.messages), "sent_alerts": len(self.messages)}
+
+
+def replay_session(path, watchlist, alerts=(), speed=0.0, batch_ms=100.0, generate_levels=False, notifier=None):
+    # Feeds a recording through the live path: decoder -> TickPipeline -> the engine's tick
+    # evaluator -> check_alerts -> notifier. speed is a multiple of real time; 0 runs as fast
+    # as possible. The pipeline is drained every batch_ms of recorded time, so conflation
+    # matches a live evaluator that keeps up at that cadence. Engine state (alerts, book, bar
+    # builder, level generator), store, activity log and notifier are swapped for scratch
+    # copies for the duration, so a replay leaves the live session as it found it.
+    import engine
+    from alert_index import AlertIndex
+    from activity_log import ActivityLog
+    from bars import BarBuilder
+    from levels import LevelGenerator
+    from price_book import PriceBook
+    from ranked_views import RankedViews
+    from store import StateStore
+    from tick_decoder import TickDecoder
+    from tick_pipeline import TickPipeline
+
+    state = engine.state
+    saved = (engine.store, engine.telegram, state.alerts, state.watchlist, state.decoder, state.book, state.views, state.activity,
+             state.bars, state.levels, state.is_paused)
+    scratch = tempfile.TemporaryDirectory()
+    notifier = notifier or DryRunNotifier()
+    fired, clock = [], [0.0]
+    def on_fire(stock, alert):
+        fired.append((clock[0], stock['symbol'], alert['condition'], alert['price'], state.book.ltp_of(stock['token'])))
+    log = TickLog(path)
+    try:
+        engine.store = StateStore(os.path.join(scratch.name, "replay.db"))
+        engine.telegram = notifier
+        state.alerts = AlertIndex(list(alerts), wc=lambda token: state.book.wc_of(token))
+        state.decoder = TickDecoder()
+        state.book = PriceBook(state.decoder.tokens)
+        state.watchlist = state.book.load([dict(s) for s in watchlist])
+        state.views = RankedViews(state.book, state.alerts)
+        state.activity = ActivityLog(path=None)
+        state.bars = BarBuilder(state.decoder.tokens)  # no candle store: replayed bars are not saved
+        state.levels = LevelGenerator(state.levels.patterns, state.levels.steps)
+        state.is_paused = False
+        engine.alert_listeners.append(on_fire)
+        pipeline = TickPipeline(state.decoder, engine.make_tick_evaluator())
+        batch = batch_ms / 1000.0
+        frames, batches, first_ts, boundary = 0, 0, None, None
+        started = time.perf_counter()
+        for ts, frame in log:
+            if first_ts is None: first_ts, boundary = ts, ts + batch
+            if ts >= boundary:
+                clock[0] = boundary
+                if pipeline.drain():
+                    batches += 1
+                    if generate_levels and batches == 1: engine.generate_alerts(changed_only=False)
+                boundary = ts + batch
+                if speed > 0:
+                    ahead = (ts - first_ts) / speed - (time.perf_counter() - started)
+                    if ahead > 0: time.sleep(ahead)
+            pipeline.push_frame(frame)
+            frames += 1
+        if frames:
+            clock[0] = ts
+            pipeline.drain()
+        elapsed = time.perf_counter() - started
+        return {"frames": frames, "span_s": (ts - first_ts) if frames else 0.0, "elapsed_s": elapsed,
+                "fired": fired, "notifications": len(getattr(notifier, "messages", ())),
+                "remaining_alerts": len(state.alerts), "pipeline": pipeline.stats(), "bars": state.bars.stats()}
+    finally:
+        log.close()
+        engine.alert_listeners.remove(on_fire)
+        engine.store.flush()
+        state.bars.stop()
+        (engine.store, engine.telegram, state.alerts, state.watchlist, state.decoder, state.book, state.views, state.activity,
+         state.bars, state.levels, state.is_paused) = saved
+        scratch.cleanup()
+
+
+def format_report(report):
+    lines = [f"Replayed {report['frames']} frames covering {report['span_s'] / 60:.1f} min in {report['elapsed_s']:.2f} s "
+             f"({report['span_s'] / report['elapsed_s'] if report['elapsed_s'] else 0:.0f}x real time)",
+             f"{len(report['fired'])} levels fired, {report['remaining_alerts']} still armed, "
+             f"{report['pipeline']['conflated']} ticks conflated"]
+    for ts, symbol, condition, price, ltp in report['fired']:
+        when = datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        lines.append(f"  {when}  {symbol:<20} {condition:<5} {price:>10.2f}  ltp {ltp:.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Replay a recorded tick log through the alert path (dry run)")
+    p.add_argument("log", help="tick log written by TickRecorder")
+    p.add_argument("--speed", type=float, default=0.0, help="multiple of real time; 0 = as fast as possible")
+    p.add_argument("--batch-ms", type=float, default=100.0, help="recorded time between evaluator drains")
+    p.add_argument("--levels", action="store_true", help="generate 3-6-9 levels from saved weekly closes after the first batch")
+    p.add_argument("--no-saved-alerts", action="store_true", help="ignore alerts saved in the state store")
+    args = p.parse_args()
+    from store import StateStore, STATE_DB
+    saved_store = StateStore(STATE_DB)
+    report = replay_session(args.log, saved_store.load_watchlist(), [] if args.no_saved_alerts else saved_store.load_alerts(),
+                            speed=args.speed, batch_ms=args.batch_ms, generate_levels=args.levels)
+    print(format_report(report))
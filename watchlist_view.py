@@ -0,0 +1,107 @@
+import flet as ft
+
+ROW_HEIGHT = 64
+ROW_SPACING = 10
+OVERSCAN = 8
+WINDOW_ROWS = 24  # rows materialised before the first scroll event reports the viewport size
+
+
+class WatchlistRows:
+    # Row controls cached by token. Only a window of rows around the scroll position is
+    # attached to the ListView; spacers stand in for the rest so the scrollbar stays true.
+    # Prices are read from the price book at paint time.
+    def __init__(self, on_remove, book):
+        self.on_remove = on_remove
+        self.book = book
+        self.order = []
+        self._stocks = {}
+        self._rows = {}
+        self._live = set()
+        self._first = 0
+        self._count = WINDOW_ROWS
+        self._top = ft.Container(height=0, visible=False)
+        self._bottom = ft.Container(height=0, visible=False)
+        self.list_view = ft.ListView(expand=True, spacing=ROW_SPACING, on_scroll=self._on_scroll, on_scroll_interval=50)
+
+    def _row(self, stock):
+        row = self._rows.get(stock['token'])
+        if row is None:
+            ltp = ft.Text("", weight="bold", color="#48BB78", size=15)
+            wc = ft.Text("", size=10, color="#A0AEC0")
+            box = ft.Container(
+                content=ft.Row([
+                    ft.Column([ft.Text(stock['symbol'], weight="bold", size=14), ft.Text(stock['token'], size=10, color="#A0AEC0")]),
+                    ft.Row([
+                        ft.Column([ltp, wc], alignment="end"),
+                        ft.IconButton("delete", icon_color="#F56565", on_click=lambda e, t=stock['token']: self.on_remove(t))
+                    ])
+                ], alignment="spaceBetween"),
+                height=ROW_HEIGHT, padding=12, bgcolor="#222844", border_radius=8, border=ft.border.all(1, "#2D3748")
+            )
+            row = self._rows[stock['token']] = (box, ltp, wc)
+        self._paint(stock, row)
+        return row[0]
+
+    def _paint(self, stock, row):
+        changed = []
+        slot = self.book.slot_of(stock['token'])
+        ltp, wc = (self.book.ltp[slot], self.book.wc[slot]) if slot is not None else (0.0, 0.0)
+        ltp_val = f"₹{ltp:.2f}"
+        wc_val = f"WC: {wc:.2f}"
+        if row[1].value != ltp_val:
+            row[1].value = ltp_val
+            changed.append(row[1])
+        if row[2].value != wc_val:
+            row[2].value = wc_val
+            changed.append(row[2])
+        return changed
+
+    def set_order(self, stocks, update=True):
+        # Filter/sort result: existing row controls are reordered, never rebuilt
+        self._stocks = {s['token']: s for s in stocks}
+        self.order = [s['token'] for s in stocks]
+        self._render_window(update)
+
+    def window_end(self):
+        # Rows up to the bottom of the attached window, i.e. the top-N worth watching
+        return self._first + self._count
+
+    def forget(self, token):
+        self._rows.pop(token, None)
+
+    def _render_window(self, update=True):
+        stride = ROW_HEIGHT + ROW_SPACING
+        n = len(self.order)
+        first = max(0, min(self._first, n - self._count))
+        last = min(n, first + self._count)
+        self._top.visible = first > 0
+        self._top.height = max(0, first * stride - ROW_SPACING)
+        self._bottom.visible = last < n
+        self._bottom.height = max(0, (n - last) * stride - ROW_SPACING)
+        window = self.order[first:last]
+        self._live = set(window)
+        self.list_view.controls = [self._top] + [self._row(self._stocks[t]) for t in window] + [self._bottom]
+        if update:
+            try: self.list_view.update()
+            except: pass
+
+    def _on_scroll(self, e):
+        stride = ROW_HEIGHT + ROW_SPACING
+        first = max(0, int(e.pixels // stride) - OVERSCAN)
+        count = int((e.viewport_dimension or 0) // stride) + 2 * OVERSCAN
+        if abs(first - self._first) >= OVERSCAN // 2 or count > self._count:
+            self._first = first
+            self._count = max(count, WINDOW_ROWS)
+            self._render_window()
+
+    def flush(self, dirty):
+        # Drains the tick path's dirty tokens; returns only the controls whose text changed
+        changed = []
+        while dirty:
+            try: token = dirty.pop()
+            except KeyError: break
+            # A removed stock can still be dirty (and live) until the next set_order
+            row = self._rows.get(token)
+            if row is not None and token in self._live:
+                changed += self._paint(self._stocks[token], row)
+        return changed